@@ -0,0 +1,131 @@
+"""
+Teste de carga da API (src/api.py) com conexões keep-alive concorrentes.
+
+Uso:
+    python benchmarks/carga_api.py                         # sobe a API com dados sintéticos
+    python benchmarks/carga_api.py --url http://127.0.0.1:8766 --conexoes 100 --duracao 20
+
+Sem --url, dados sintéticos de ~5.570 municípios são publicados em uma pasta
+temporária e a API roda em um processo separado. As requisições se dividem entre
+/municipios/<cod>, /ranking?uf=<UF> e /municipios, metade delas com If-None-Match
+(respostas 304), e todas aceitando gzip.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent
+sys.path.insert(0, str(RAIZ.parent / 'src'))
+
+import api  # noqa: E402
+import indice_municipios  # noqa: E402
+import iqe  # noqa: E402
+
+
+def publicar_sinteticos(diretorio, n_municipios=5_570, semente=0):
+    rng = np.random.default_rng(semente)
+    ufs = list(indice_municipios.SIGLAS_UF)
+    codigos = np.array([rng.choice(ufs) * 100_000 + i for i in range(n_municipios)])
+    df = pd.DataFrame({'cod_municipio': codigos, 'nome_municipio': [f'Município {i}' for i in range(n_municipios)]})
+    for variavel in iqe.VARIAVEIS_IQE:
+        df[variavel] = rng.normal(size=n_municipios)
+    k = len(iqe.VARIAVEIS_IQE)
+    modelo = {'variaveis': iqe.VARIAVEIS_IQE, 'medias': [0.0] * k, 'desvios': [1.0] * k, 'pesos': [1 / k] * k,
+              'cargas': [0.7] * k}
+    df['IQE'] = df[iqe.VARIAVEIS_IQE].to_numpy() @ np.array(modelo['pesos'])
+    modelo['minimo'], modelo['maximo'] = df['IQE'].min(), df['IQE'].max()
+    df['IQE'] = (df['IQE'] - modelo['minimo']) / (modelo['maximo'] - modelo['minimo']) * 9 + 1
+    recomendacoes = pd.DataFrame({'cod_municipio': codigos, 'Melhoria_Estimada_IQE': rng.uniform(0, 0.5, n_municipios)})
+    api.publicar_dados_api(df, modelo, recomendacoes, diretorio=diretorio)
+    return codigos
+
+
+def _servir(diretorio, porta):
+    asyncio.run(api.ServidorAPI(diretorio).servir_para_sempre(porta=porta))
+
+
+async def _cliente(host, porta, caminhos, fim, latencias, contagem):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    etags = {}
+    try:
+        while time.perf_counter() < fim:
+            caminho = random.choice(caminhos)
+            condicional = f'If-None-Match: {etags[caminho]}\r\n' if caminho in etags and random.random() < 0.5 else ''
+            inicio = time.perf_counter()
+            escritor.write(f'GET {caminho} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: gzip\r\n{condicional}\r\n'.encode())
+            cabecalho = (await leitor.readuntil(b'\r\n\r\n')).decode('latin-1')
+            tamanho = 0
+            for linha in cabecalho.split('\r\n')[1:]:
+                nome, _, valor = linha.partition(':')
+                if nome.lower() == 'content-length':
+                    tamanho = int(valor)
+                elif nome.lower() == 'etag':
+                    etags[caminho] = valor.strip()
+            if tamanho:
+                await leitor.readexactly(tamanho)
+            latencias.append(time.perf_counter() - inicio)
+            status = cabecalho.split(' ', 2)[1]
+            contagem[status] = contagem.get(status, 0) + 1
+    finally:
+        escritor.close()
+
+
+async def carregar(url, caminhos, conexoes, duracao):
+    partes = urlsplit(url)
+    latencias, contagem = [], {}
+    fim = time.perf_counter() + duracao
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente(partes.hostname, partes.port, caminhos, fim, latencias, contagem)
+                           for _ in range(conexoes)))
+    return latencias, contagem, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='API já em execução (padrão: sobe uma com dados sintéticos).')
+    parser.add_argument('--conexoes', type=int, default=50)
+    parser.add_argument('--duracao', type=float, default=10.0, help='Segundos de carga (padrão: 10).')
+    args = parser.parse_args()
+
+    processo, temporario = None, None
+    if args.url:
+        url = args.url.rstrip('/')
+        codigos = list(range(2500000, 2500100))
+    else:
+        temporario = Path(tempfile.mkdtemp(prefix='carga_api_'))
+        codigos = publicar_sinteticos(temporario).tolist()
+        porta = 18766
+        processo = multiprocessing.Process(target=_servir, args=(temporario, porta), daemon=True)
+        processo.start()
+        time.sleep(1.5)
+        url = f'http://127.0.0.1:{porta}'
+
+    ufs = sorted(set(indice_municipios.SIGLAS_UF.values()))
+    caminhos = ([f'/municipios/{codigo}' for codigo in codigos[:2000]] + [f'/ranking?uf={uf}' for uf in ufs] +
+                ['/municipios', '/ranking', '/recomendacoes?limite=20', '/pesos'])
+    try:
+        latencias, contagem, tempo = asyncio.run(carregar(url, caminhos, args.conexoes, args.duracao))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            shutil.rmtree(temporario, ignore_errors=True)
+    latencias = np.array(latencias) * 1e3
+    print(f"{len(latencias):,} requisições em {tempo:.1f} s: {len(latencias) / tempo:,.0f} req/s "
+          f"com {args.conexoes} conexões")
+    print(f"Latência (ms): p50 {np.percentile(latencias, 50):.2f}, p99 {np.percentile(latencias, 99):.2f}, "
+          f"máx {latencias.max():.2f}")
+    print(f"Status: {dict(sorted(contagem.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmarks de todas as etapas, de extract.* a iqe e investment_model, contra as
+fixtures sintéticas servidas localmente (sem acesso ao INEP ou ao IBGE).
+
+Uso:
+    python benchmarks/executar.py                          # tamanhos pequeno e medio
+    python benchmarks/executar.py --tamanhos completo      # ~5.570 municípios e 180 mil escolas
+    python benchmarks/executar.py --gravar-referencia      # atualiza as saídas de referência
+
+Para cada tamanho, cada etapa roda uma vez com o cache vazio (tempo "frio", que
+inclui o download do servidor local) e depois --repeticoes vezes com o cache
+preenchido (tempo "quente", o menor de todos). As saídas são comparadas com as
+de referência gravadas em benchmarks/referencia/<tamanho>/ e a agregação do censo
+em blocos é comparada com a leitura do arquivo inteiro em memória.
+"""
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent
+sys.path.insert(0, str(RAIZ.parent / 'src'))
+sys.path.insert(0, str(RAIZ))
+
+import cache  # noqa: E402
+import extract  # noqa: E402
+import fixtures  # noqa: E402
+import generate_simulated_data  # noqa: E402
+import investment_model  # noqa: E402
+import iqe  # noqa: E402
+import servidor  # noqa: E402
+import staging  # noqa: E402
+import transform  # noqa: E402
+
+
+# Tamanho -> (municípios, escolas do censo, amostras do histórico do modelo)
+TAMANHOS = {
+    'pequeno': (300, 10_000, 1_000),
+    'medio': (1_500, 60_000, 5_000),
+    'completo': (5_570, 180_000, 20_000),
+}
+DIRETORIO_FIXTURES = RAIZ / '.fixtures'
+DIRETORIO_REFERENCIA = RAIZ / 'referencia'
+DIRETORIO_RESULTADOS = RAIZ / 'resultados'
+
+# Tolerância das comparações numéricas com a referência
+TOLERANCIA_RELATIVA = 1e-9
+
+
+def _municipios_todos(contexto):
+    """Base com todos os municípios da DTB mais recente, para medir o IQE em escala."""
+    df_dtb = contexto['extract.ler_dtb']
+    recente = df_dtb[df_dtb['ano'] == df_dtb['ano'].max()]
+    return pd.DataFrame({
+        'cod_municipio': recente['id_mundv'].astype(int),
+        'nome_municipio': recente['ds_mun'],
+        'ds_uf': recente['ds_uf'].astype(str),
+    })
+
+
+def _fontes(contexto):
+    return {
+        'saeb': contexto['extract.pt_mt_saeb'],
+        'aprovacao': contexto['extract.aprov_ideb'],
+        'infraestrutura': contexto['extract.gerar_indice_infraestrutura_municipal'],
+        'inse': contexto['extract.processar_inse'],
+        'afd': contexto['extract.extrair_afd'],
+    }
+
+
+def _treinar(contexto, n_amostras):
+    historico = generate_simulated_data.gerar_dados_sinteticos(num_amostras=n_amostras)
+    X, y = investment_model.engenharia_de_atributos(historico)
+    return investment_model.treinar_modelo_preditivo(X, y)
+
+
+def _edicoes_ideb():
+    """Edições anteriores do IDEB (séries históricas da planilha), usadas pelo painel."""
+    edicoes = [extract.ler_ideb_edicao(ano) for ano in fixtures.SERIES_IDEB]
+    for ano, df in zip(fixtures.SERIES_IDEB, edicoes):
+        df.insert(0, 'ano', ano)
+    return pd.concat(edicoes, ignore_index=True)
+
+
+def etapas(n_amostras):
+    """Etapas na ordem de execução: nome -> função que recebe as saídas anteriores."""
+    return {
+        'extract.ler_ia': lambda ctx: extract.ler_ia(),
+        'extract.ler_dtb': lambda ctx: extract.ler_dtb(),
+        'extract.pt_mt_saeb': lambda ctx: extract.pt_mt_saeb(),
+        'extract.aprov_ideb': lambda ctx: extract.aprov_ideb(),
+        'extract.gerar_indice_infraestrutura_municipal': lambda ctx: extract.gerar_indice_infraestrutura_municipal(),
+        'extract.gerar_indice_infraestrutura_municipal (em memória)':
+            lambda ctx: extract.gerar_indice_infraestrutura_municipal(modo_streaming=False),
+        'extract.ler_ideb_edicao (2019 e 2021)': lambda ctx: _edicoes_ideb(),
+        'extract.processar_inse': lambda ctx: extract.processar_inse(),
+        'extract.extrair_afd': lambda ctx: extract.extrair_afd(),
+        'transform.criar_base_de_analise_completa': lambda ctx: transform.criar_base_de_analise_completa(),
+        'iqe.calcular_iqe': lambda ctx: iqe.calcular_iqe(ctx['transform.criar_base_de_analise_completa']),
+        'iqe.calcular_iqe (todos os municípios)': lambda ctx: iqe.calcular_iqe(
+            transform.consolidar_base_de_analise(_municipios_todos(ctx), _fontes(ctx))),
+        'investment_model.treinar_modelo_preditivo': lambda ctx: _treinar(ctx, n_amostras),
+        'investment_model.gerar_recomendacoes_investimento': lambda ctx: investment_model.gerar_recomendacoes_investimento(
+            ctx['investment_model.treinar_modelo_preditivo'], ctx['iqe.calcular_iqe (todos os municípios)']),
+    }
+
+
+def _preparar_rodada():
+    # Sem isso, a segunda leitura do IDEB na mesma execução não seria medida
+    extract._planilhas_ideb.clear()
+
+
+def _normalizar(df):
+    df = df.reset_index(drop=True)
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype(str)
+    return df.sort_values(list(df.columns[:2])).reset_index(drop=True)
+
+
+def comparar(obtido, esperado):
+    """Retorna None se os DataFrames são numericamente equivalentes, ou a diferença encontrada."""
+    try:
+        pd.testing.assert_frame_equal(_normalizar(obtido), _normalizar(esperado), check_dtype=False,
+                                      check_exact=False, rtol=TOLERANCIA_RELATIVA, atol=1e-12)
+    except AssertionError as e:
+        return str(e).splitlines()[0] if str(e) else 'diferente'
+    return None
+
+
+def _arquivo_referencia(tamanho, etapa):
+    nome = etapa.replace(' ', '_').replace('(', '').replace(')', '').replace('ó', 'o').replace('í', 'i')
+    return DIRETORIO_REFERENCIA / tamanho / f'{nome}.parquet'
+
+
+def executar_tamanho(tamanho, repeticoes, gravar_referencia, verboso):
+    n_municipios, n_escolas, n_amostras = TAMANHOS[tamanho]
+    # Cache e staging redirecionados antes de tudo: nada é gravado em data/
+    trabalho = Path(tempfile.mkdtemp(prefix=f'benchmark_{tamanho}_'))
+    cache.definir_diretorio_cache(trabalho / 'cache')
+    staging.DIRETORIO_STAGING = trabalho / 'staging'
+    pasta_fixtures = fixtures.gerar_fixtures(DIRETORIO_FIXTURES / tamanho, n_municipios, n_escolas)
+    servidor_local, url_base = servidor.iniciar_servidor(pasta_fixtures)
+    cache.definir_espelho(url_base)
+    cache.zerar_estatisticas()
+
+    contexto, linhas = {}, []
+    try:
+        for etapa, funcao in etapas(n_amostras).items():
+            tempos = []
+            for rodada in range(repeticoes + 1):
+                _preparar_rodada()
+                saida_console = contextlib.nullcontext() if verboso else contextlib.redirect_stdout(io.StringIO())
+                inicio = time.perf_counter()
+                with saida_console:
+                    resultado = funcao(contexto)
+                tempos.append(time.perf_counter() - inicio)
+                if rodada == 0:
+                    contexto[etapa] = resultado
+
+            resultado = contexto[etapa]
+            equivalencia = 'não se aplica'
+            if isinstance(resultado, pd.DataFrame):
+                referencia = _arquivo_referencia(tamanho, etapa)
+                if gravar_referencia:
+                    referencia.parent.mkdir(parents=True, exist_ok=True)
+                    _normalizar(resultado).to_parquet(referencia, index=False)
+                    equivalencia = 'referência gravada'
+                elif referencia.exists():
+                    diferenca = comparar(resultado, pd.read_parquet(referencia))
+                    equivalencia = 'ok' if diferenca is None else f'DIFERENTE: {diferenca}'
+                else:
+                    equivalencia = 'sem referência'
+            linhas.append({
+                'tamanho': tamanho,
+                'etapa': etapa,
+                'frio_s': round(tempos[0], 3),
+                'quente_s': round(min(tempos[1:]), 3) if repeticoes else None,
+                'linhas': len(resultado) if isinstance(resultado, pd.DataFrame) else None,
+                'equivalencia': equivalencia,
+            })
+
+        # A agregação em blocos do censo deve reproduzir a leitura do arquivo inteiro
+        diferenca = comparar(contexto['extract.gerar_indice_infraestrutura_municipal'],
+                             contexto['extract.gerar_indice_infraestrutura_municipal (em memória)'])
+        linhas.append({'tamanho': tamanho, 'etapa': 'censo: blocos x memória', 'frio_s': None, 'quente_s': None,
+                       'linhas': None, 'equivalencia': 'ok' if diferenca is None else f'DIFERENTE: {diferenca}'})
+    finally:
+        servidor_local.shutdown()
+        cache.definir_espelho(None)
+        shutil.rmtree(trabalho, ignore_errors=True)
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', nargs='+', choices=list(TAMANHOS), default=['pequeno', 'medio'])
+    parser.add_argument('--repeticoes', type=int, default=2, help='Rodadas com o cache preenchido (padrão: 2).')
+    parser.add_argument('--gravar-referencia', action='store_true', help='Grava as saídas atuais como referência.')
+    parser.add_argument('--verboso', action='store_true', help='Mostra a saída das funções medidas.')
+    args = parser.parse_args()
+    if not args.verboso:
+        warnings.simplefilter('ignore')
+
+    linhas = []
+    for tamanho in args.tamanhos:
+        print(f"\n=== Tamanho '{tamanho}' ===")
+        linhas_tamanho = executar_tamanho(tamanho, args.repeticoes, args.gravar_referencia, args.verboso)
+        print(pd.DataFrame(linhas_tamanho).drop(columns='tamanho').to_string(index=False))
+        linhas.extend(linhas_tamanho)
+
+    DIRETORIO_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    arquivo = DIRETORIO_RESULTADOS / f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    arquivo.write_text(json.dumps(linhas, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\nResultados gravados em {arquivo}")
+
+    falhas = [linha for linha in linhas if str(linha['equivalencia']).startswith('DIFERENTE')]
+    if falhas:
+        print(f"\n{len(falhas)} etapa(s) com saída diferente da referência.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Geração de fixtures sintéticas no formato exato dos arquivos do INEP e do IBGE.
+
+Os arquivos são gravados em uma árvore que espelha host e caminho das URLs de
+extract.py (ex.: <destino>/download.inep.gov.br/dados_abertos/...), para serem
+servidos pelo servidor local de servidor.py com cache.definir_espelho().
+
+Os indicadores de cada município derivam de uma mesma "qualidade" latente, de
+modo que a análise fatorial do IQE encontra um fator com cargas plausíveis.
+"""
+import io
+import json
+import sys
+import zipfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import extract  # noqa: E402
+import indice_municipios  # noqa: E402
+
+
+NOMES_UF = {
+    11: 'Rondônia', 12: 'Acre', 13: 'Amazonas', 14: 'Roraima', 15: 'Pará', 16: 'Amapá', 17: 'Tocantins',
+    21: 'Maranhão', 22: 'Piauí', 23: 'Ceará', 24: 'Rio Grande do Norte', 25: 'Paraíba', 26: 'Pernambuco',
+    27: 'Alagoas', 28: 'Sergipe', 29: 'Bahia', 31: 'Minas Gerais', 32: 'Espírito Santo', 33: 'Rio de Janeiro',
+    35: 'São Paulo', 41: 'Paraná', 42: 'Santa Catarina', 43: 'Rio Grande do Sul', 50: 'Mato Grosso do Sul',
+    51: 'Mato Grosso', 52: 'Goiás', 53: 'Distrito Federal',
+}
+CODIGOS_UF = {sigla: codigo for codigo, sigla in indice_municipios.SIGLAS_UF.items()}
+
+# Total de colunas das planilhas reais (as posições lidas pelo extract ficam no meio delas)
+COLUNAS_PLANILHA_IDEB = 110
+REDES_IDEB = ['Estadual', 'Municipal', 'Pública']
+# Edições anteriores na série histórica da planilha: ano -> posições da aprovação e da nota
+SERIES_IDEB = {2019: (63, 99), 2021: (65, 101)}
+# Incrementar quando o conteúdo das fixtures mudar, para regerar as já gravadas
+VERSAO_FIXTURES = 2
+
+
+def _caminho_da_url(destino, url):
+    partes = urlsplit(url)
+    caminho = Path(destino) / partes.netloc / partes.path.lstrip('/')
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def _xlsx_em_bytes(linhas, titulo='Sheet1'):
+    """Grava linhas (listas) em um xlsx em memória, com o openpyxl em modo write_only."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    for linha in linhas:
+        ws.append(linha)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _gravar_zip(caminho, arquivos):
+    with zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+        for nome, conteudo in arquivos.items():
+            z.writestr(nome, conteudo)
+
+
+def _nomes_do_ia():
+    """Nomes e UFs dos municípios de atuação do IA, para que o cruzamento com a DTB funcione."""
+    # Leitura direta da planilha: extract.ler_ia() gravaria no cache e no staging do projeto
+    abas = extract._ler_abas_ia(extract.ARQUIVO_IA) if extract.ARQUIVO_IA.exists() else []
+    if not abas:
+        return []
+    df_ia = pd.concat(abas, ignore_index=True)
+    nomes = (df_ia['ds_mun'].astype(str)
+             .str.replace('- MIXING CENTER', '', regex=False)
+             .str.replace('*', '', regex=False)
+             .str.strip().str.title())
+    pares = pd.DataFrame({'nome': nomes, 'sg_uf': df_ia['sg_uf'].astype(str).str.strip().str.upper()})
+    pares['chave'] = extract.normalizar_nome(pares['nome']) + '|' + pares['sg_uf']
+    return list(pares.drop_duplicates('chave')[['nome', 'sg_uf']].itertuples(index=False, name=None))
+
+
+def gerar_municipios(n_municipios, rng):
+    """
+    Universo de municípios: os do IA mais municípios fictícios distribuídos pelas UFs.
+
+    Returns:
+        pd.DataFrame: codigo, nome, id_uf, sg_uf, nome_uf, rgi e a qualidade latente.
+    """
+    reais = _nomes_do_ia()
+    ufs = np.array(sorted(NOMES_UF))
+    ufs_ficticias = rng.choice(ufs, size=max(n_municipios - len(reais), 0))
+    linhas = [(CODIGOS_UF[sigla], nome) for nome, sigla in reais]
+    linhas += [(int(uf), f'Município Sintético {i:05d}') for i, uf in enumerate(ufs_ficticias)]
+
+    df = pd.DataFrame(linhas, columns=['id_uf', 'nome'])
+    # Código de 7 dígitos: UF (2) + sequencial (4) + dígito verificador (1)
+    sequencial = df.groupby('id_uf').cumcount() + 1
+    df['codigo'] = df['id_uf'] * 100000 + sequencial * 10 + (sequencial % 10)
+    df['sg_uf'] = df['id_uf'].map(indice_municipios.SIGLAS_UF)
+    df['nome_uf'] = df['id_uf'].map(NOMES_UF)
+    df['rgi'] = 'Região Imediata ' + (df['id_uf'] * 100 + sequencial // 20).astype(str)
+    df['qualidade'] = rng.normal(size=len(df))
+    return df
+
+
+def gerar_dtb(destino, municipios):
+    colunas = ['UF', 'Nome_UF', 'Região Geográfica Intermediária', 'Nome Região Geográfica Intermediária',
+               'Região Geográfica Imediata', 'Nome Região Geográfica Imediata', 'Município',
+               'Código Município Completo', 'Nome_Município']
+    dados = [
+        [int(m.id_uf), m.nome_uf, int(m.id_uf) * 100 + 1, f'Intermediária {m.id_uf}', int(m.id_uf) * 10000 + 1,
+         m.rgi, str(m.codigo)[2:], str(m.codigo), m.nome]
+        for m in municipios.itertuples()
+    ]
+    for info in extract.ARQUIVOS_DTB:
+        preambulo = [['Divisão Territorial Brasileira'], [f"DTB {info['ano']}"], [], [], [], []] \
+            if info['ano'] in (2022, 2023, 2024) else []
+        # Conteúdo xlsx com o nome .xls do arquivo real: o pandas detecta o formato pelo conteúdo
+        conteudo = _xlsx_em_bytes(preambulo + [colunas] + dados)
+        _gravar_zip(_caminho_da_url(destino, info['url']), {info['caminho_interno_zip']: conteudo})
+
+
+def gerar_ideb(destino, municipios, rng, rng_series):
+    """
+    Planilha de divulgação do IDEB. As séries de SERIES_IDEB saem de rng_series, para
+    que os valores da edição atual não mudem com elas.
+    """
+    cabecalho = [f'COL_{i}' for i in range(COLUNAS_PLANILHA_IDEB)]
+    cabecalho[:4] = ['SG_UF', 'CO_MUNICIPIO', 'NO_MUNICIPIO', 'REDE']
+    cabecalho[extract.COLUNAS_IDEB['taxa_aprovacao']] = f'VL_APROVACAO_{extract.EDICAO_IDEB}_SI_4'
+    cabecalho[extract.COLUNAS_IDEB['nota_saeb']] = f'VL_NOTA_MEDIA_{extract.EDICAO_IDEB}'
+    for ano, (posicao_aprovacao, posicao_nota) in SERIES_IDEB.items():
+        cabecalho[posicao_aprovacao] = f'VL_APROVACAO_{ano}_SI_4'
+        cabecalho[posicao_nota] = f'VL_NOTA_MEDIA_{ano}'
+    linhas = [['Ministério da Educação'], ['INEP'], ['IDEB - Resultados e Metas'], [],
+              ['Anos Iniciais do Ensino Fundamental'], [], ['Fonte: Saeb e Censo Escolar'], [], [], cabecalho]
+    for m in municipios.itertuples():
+        for rede in REDES_IDEB:
+            linha = [None] * COLUNAS_PLANILHA_IDEB
+            linha[:4] = [m.sg_uf, int(m.codigo), m.nome.upper(), rede]
+            # Valores ausentes aparecem como '-' na planilha real
+            aprovacao = 92 + 4 * m.qualidade + rng.normal(0, 2)
+            nota = 5.2 + 0.6 * m.qualidade + rng.normal(0, 0.3)
+            linha[extract.COLUNAS_IDEB['taxa_aprovacao']] = '-' if rng.random() < 0.03 else round(min(aprovacao, 100), 1)
+            linha[extract.COLUNAS_IDEB['nota_saeb']] = '-' if rng.random() < 0.03 else round(nota, 2)
+            # Edições anteriores um pouco abaixo da atual
+            for ano, (posicao_aprovacao, posicao_nota) in SERIES_IDEB.items():
+                atraso = (extract.EDICAO_IDEB - ano) / 2
+                aprovacao = 92 - atraso + 4 * m.qualidade + rng_series.normal(0, 2)
+                nota = 5.2 - 0.15 * atraso + 0.6 * m.qualidade + rng_series.normal(0, 0.3)
+                linha[posicao_aprovacao] = '-' if rng_series.random() < 0.05 else round(min(aprovacao, 100), 1)
+                linha[posicao_nota] = '-' if rng_series.random() < 0.05 else round(nota, 2)
+            linhas.append(linha)
+    conteudo = _xlsx_em_bytes(linhas)
+    _gravar_zip(_caminho_da_url(destino, extract.URL_IDEB_ANOS_INICIAIS), {extract.CAMINHO_IDEB_NO_ZIP: conteudo})
+
+
+def gerar_censo(destino, municipios, n_escolas, rng):
+    escolas_por_municipio = rng.multinomial(n_escolas - len(municipios), np.ones(len(municipios)) / len(municipios)) + 1
+    indices = np.repeat(np.arange(len(municipios)), escolas_por_municipio)
+    m = municipios.iloc[indices].reset_index(drop=True)
+    probabilidade = 1 / (1 + np.exp(-(m['qualidade'].to_numpy() + 0.5)))
+
+    df = pd.DataFrame({
+        'NU_ANO_CENSO': 2024,
+        'NO_REGIAO': 'Região',
+        'SG_UF': m['sg_uf'],
+        'NO_MUNICIPIO': m['nome'],
+        'CO_MUNICIPIO': m['codigo'],
+        'NO_ENTIDADE': 'ESCOLA ' + pd.Series(np.arange(len(m))).astype(str),
+        'CO_ENTIDADE': 11000000 + np.arange(len(m)),
+        'TP_DEPENDENCIA': rng.integers(1, 5, len(m)),
+    })
+    for coluna in extract.MAPA_INDICADORES_NEGATIVOS:
+        df[coluna] = (rng.random(len(m)) > probabilidade).astype('float')
+    for coluna in extract.MAPA_INDICADORES_POSITIVOS:
+        df[coluna] = (rng.random(len(m)) < probabilidade).astype('float')
+    # Escolas paralisadas não informam a infraestrutura
+    ausentes = rng.random(len(m)) < 0.02
+    df.loc[ausentes, list(extract.MAPA_INDICADORES_NEGATIVOS) + list(extract.MAPA_INDICADORES_POSITIVOS)] = np.nan
+    df['QT_SALAS_UTILIZADAS'] = rng.integers(1, 30, len(m))
+    df['QT_SALAS_UTILIZA_CLIMATIZADAS'] = (df['QT_SALAS_UTILIZADAS'] * probabilidade * rng.random(len(m))).round()
+
+    conteudo = df.to_csv(sep=';', index=False, encoding='latin-1', float_format='%.0f').encode('latin-1')
+    _gravar_zip(_caminho_da_url(destino, extract.URL_CENSO_ESCOLAR), {extract.CAMINHO_CENSO_NO_ZIP: conteudo})
+
+
+def gerar_inse(destino, municipios, rng):
+    cabecalho = ['NU_ANO_SAEB', 'CO_UF', 'SG_UF', 'NO_UF', 'CO_MUNICIPIO', 'NO_MUNICIPIO',
+                 'TP_TIPO_REDE', 'TP_LOCALIZACAO', 'QTD_ALUNOS_INSE', 'MEDIA_INSE', 'INSE_CLASSIFICACAO']
+    linhas = [cabecalho]
+    for m in municipios.itertuples():
+        for rede in (2, 3):
+            media = 4.8 + 0.4 * m.qualidade + rng.normal(0, 0.15)
+            linhas.append([2021, int(m.id_uf), m.sg_uf, m.nome_uf, int(m.codigo), m.nome.upper(),
+                           rede, 1, int(rng.integers(20, 5000)), round(media, 2), 'Nível IV'])
+    caminho = _caminho_da_url(destino, extract.URL_INSE)
+    caminho.write_bytes(_xlsx_em_bytes(linhas, titulo=extract.ABA_INSE))
+
+
+def gerar_afd(destino, municipios, rng):
+    cabecalho = ['NU_ANO_CENSO', 'NO_REGIAO', 'SG_UF', 'CO_MUNICIPIO', 'NO_MUNICIPIO', 'NO_CATEGORIA',
+                 'NO_DEPENDENCIA', 'ED_INF_CAT_1', 'ED_INF_CAT_2', 'ED_INF_CAT_3', 'ED_INF_CAT_4',
+                 'ED_INF_CAT_5', 'FUN_CAT_1', 'FUN_CAT_2', 'FUN_CAT_3']
+    linhas = [['Indicador de Adequação da Formação Docente'], ['Brasil 2024'], [], [], [], [], [], cabecalho]
+    for m in municipios.itertuples():
+        for localizacao in ('Urbana', 'Rural'):
+            infantil = 60 + 10 * m.qualidade + rng.normal(0, 4)
+            fundamental = 62 + 10 * m.qualidade + rng.normal(0, 4)
+            outros = rng.uniform(0, 20, 6).round(1).tolist()
+            linhas.append([2024, 'Região', m.sg_uf, int(m.codigo), m.nome.upper(), localizacao, 'Total',
+                           round(float(np.clip(infantil, 0, 100)), 1), *outros[:4],
+                           round(float(np.clip(fundamental, 0, 100)), 1), *outros[4:]])
+    _gravar_zip(_caminho_da_url(destino, extract.URL_AFD), {extract.CAMINHO_AFD_NO_ZIP: _xlsx_em_bytes(linhas)})
+
+
+def gerar_fixtures(destino, n_municipios=5570, n_escolas=180_000, semente=42):
+    """
+    Gera todas as fixtures em destino. Se destino já contém fixtures geradas com os
+    mesmos parâmetros, nada é refeito.
+
+    Returns:
+        pathlib.Path: O diretório destino.
+    """
+    destino = Path(destino)
+    parametros = {'n_municipios': n_municipios, 'n_escolas': n_escolas, 'semente': semente,
+                  'versao': VERSAO_FIXTURES}
+    arquivo_parametros = destino / 'parametros.json'
+    if arquivo_parametros.exists() and json.loads(arquivo_parametros.read_text()) == parametros:
+        return destino
+
+    print(f"-> Gerando fixtures com {n_municipios} municípios e {n_escolas} escolas em {destino}...")
+    rng = np.random.default_rng(semente)
+    municipios = gerar_municipios(n_municipios, rng)
+    gerar_dtb(destino, municipios)
+    gerar_ideb(destino, municipios, rng, np.random.default_rng([semente, 1]))
+    gerar_censo(destino, municipios, n_escolas, rng)
+    gerar_inse(destino, municipios, rng)
+    gerar_afd(destino, municipios, rng)
+    arquivo_parametros.write_text(json.dumps(parametros))
+    return destino
+
+
+if __name__ == "__main__":
+    pasta = sys.argv[1] if len(sys.argv) > 1 else Path(__file__).parent / '.fixtures' / 'completo'
+    gerar_fixtures(pasta)
@@ -0,0 +1,93 @@
+"""
+Servidor HTTP local que faz o papel de download.inep.gov.br e geoftp.ibge.gov.br.
+
+Serve os arquivos de um diretório com ETag, Last-Modified, respostas 304 e
+requisições Range/If-Range, o suficiente para exercitar todo o caminho do cache
+(revalidação e retomada de downloads) sem acesso à internet.
+"""
+import os
+import sys
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ManipuladorFixtures(SimpleHTTPRequestHandler):
+
+    def log_message(self, formato, *args):
+        pass  # Mantém a saída dos benchmarks limpa
+
+    def do_GET(self):
+        caminho = self.translate_path(self.path)
+        if not os.path.isfile(caminho):
+            self.send_error(404)
+            return
+        estado = os.stat(caminho)
+        etag = f'"{estado.st_size:x}-{int(estado.st_mtime_ns):x}"'
+        ultima_modificacao = formatdate(estado.st_mtime, usegmt=True)
+
+        if self.headers.get('If-None-Match') == etag or self._nao_modificado(estado):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        inicio, fim = 0, estado.st_size - 1
+        intervalo = self.headers.get('Range')
+        validador = self.headers.get('If-Range')
+        parcial = intervalo is not None and validador in (None, etag, ultima_modificacao)
+        if parcial:
+            inicio = int(intervalo.split('=')[1].split('-')[0])
+            if inicio >= estado.st_size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{estado.st_size}')
+                self.end_headers()
+                return
+
+        self.send_response(206 if parcial else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(fim - inicio + 1))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', ultima_modificacao)
+        self.send_header('Accept-Ranges', 'bytes')
+        if parcial:
+            self.send_header('Content-Range', f'bytes {inicio}-{fim}/{estado.st_size}')
+        self.end_headers()
+        with open(caminho, 'rb') as f:
+            f.seek(inicio)
+            while bloco := f.read(1024 * 1024):
+                self.wfile.write(bloco)
+
+    def _nao_modificado(self, estado):
+        desde = self.headers.get('If-Modified-Since')
+        if not desde or self.headers.get('If-None-Match'):
+            return False
+        try:
+            return int(estado.st_mtime) <= parsedate_to_datetime(desde).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+def iniciar_servidor(diretorio, porta=0):
+    """
+    Sobe o servidor em uma thread de fundo.
+
+    Returns:
+        tuple: (servidor, URL base), ex.: (ThreadingHTTPServer, 'http://127.0.0.1:54321').
+               Use servidor.shutdown() para encerrá-lo.
+    """
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), partial(ManipuladorFixtures, directory=str(diretorio)))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://127.0.0.1:{servidor.server_address[1]}'
+
+
+if __name__ == "__main__":
+    diretorio = sys.argv[1]
+    porta = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    servidor, url = iniciar_servidor(diretorio, porta)
+    print(f"Servindo {diretorio} em {url} (Ctrl+C para encerrar). Use PORTAL_ESPELHO={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,399 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+import arquivos
+import indice_municipios
+
+
+# Dados servidos pela API, publicados pelo estágio 'api' do pipeline em um único
+# arquivo de arrays (gravado de forma atômica) e recarregados pelo servidor sozinho
+DIRETORIO_API = Path(__file__).parent.parent / 'data' / 'api'
+ARQUIVO_DADOS_API = 'dados_api.npz'
+PORTA_PADRAO = 8766
+
+# Respostas menores que isso não compensam o gzip
+TAMANHO_MINIMO_GZIP = 1024
+# Bytes de respostas prontas guardados por versão dos dados; acima disso saem as usadas há mais tempo
+MAXIMO_BYTES_RESPOSTAS = 64 * 1024 * 1024
+# Parâmetros lidos por cada rota: só eles entram na chave das respostas guardadas
+PARAMETROS_ROTAS = {'/ranking': ('uf', 'limite', 'ordem'), '/recomendacoes': ('uf', 'limite')}
+LIMITE_PADRAO = 50
+TAMANHO_MAXIMO_CABECALHO = 16 * 1024
+
+
+def _diretorio(diretorio):
+    return Path(diretorio) if diretorio is not None else DIRETORIO_API
+
+
+def publicar_dados_api(df_iqe, modelo_iqe, df_recomendacoes=None, investimento_simulado=100000, diretorio=None):
+    """
+    Grava o IQE, as variáveis, a contribuição de cada variável, os pesos do modelo e
+    as recomendações de investimento como arrays contíguos para a API. O servidor em
+    execução passa a usá-los na próxima verificação, sem reiniciar.
+
+    Args:
+        df_iqe (pd.DataFrame): Saída de iqe.calcular_iqe().
+        modelo_iqe (dict): Modelo usado no IQE (iqe.ajustar_modelo_iqe()).
+        df_recomendacoes (pd.DataFrame, opcional): Saída de
+            investment_model.gerar_recomendacoes_investimento().
+        investimento_simulado (float): Investimento usado nas recomendações.
+
+    Returns:
+        Path: Arquivo gravado.
+    """
+    df = df_iqe.dropna(subset=['IQE']).sort_values('IQE', ascending=False).reset_index(drop=True)
+    variaveis = list(modelo_iqe['variaveis'])
+    valores = df[variaveis].to_numpy(dtype='float64')
+    # Pontos da escala de 1 a 10 que cada variável soma (ou tira) em relação à média
+    escala = 9 / (modelo_iqe['maximo'] - modelo_iqe['minimo'])
+    contribuicoes = ((valores - np.asarray(modelo_iqe['medias'])) / np.asarray(modelo_iqe['desvios'])
+                     * np.asarray(modelo_iqe['pesos']) * escala)
+    melhoria = np.full(len(df), np.nan)
+    if df_recomendacoes is not None and not df_recomendacoes.empty:
+        por_codigo = dict(zip(df_recomendacoes['cod_municipio'].astype('int64'), df_recomendacoes['Melhoria_Estimada_IQE']))
+        melhoria = np.array([por_codigo.get(codigo, np.nan) for codigo in df['cod_municipio'].astype('int64')])
+    codigos = df['cod_municipio'].to_numpy(dtype='int64')
+
+    destino = _diretorio(diretorio) / ARQUIVO_DADOS_API
+    with arquivos.escrita_atomica(destino, sufixo='.npz') as temporario:
+        np.savez(temporario,
+                 codigos=codigos,
+                 nomes=df['nome_municipio'].astype(str).to_numpy(dtype='U'),
+                 ufs=np.array([indice_municipios.SIGLAS_UF.get(codigo // 100_000, '') for codigo in codigos.tolist()]),
+                 iqe=df['IQE'].to_numpy(dtype='float64'),
+                 variaveis=np.array(variaveis),
+                 valores=np.ascontiguousarray(valores),
+                 contribuicoes=np.ascontiguousarray(contribuicoes),
+                 melhoria=melhoria,
+                 pesos=np.asarray(modelo_iqe['pesos'], dtype='float64'),
+                 cargas=np.asarray(modelo_iqe['cargas'], dtype='float64'),
+                 investimento_simulado=np.float64(investimento_simulado),
+                 gerado_em=np.int64(time.time()))
+    return destino
+
+
+def _serializar(conteudo):
+    return json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _valor(numero, casas=4):
+    return None if np.isnan(numero) else round(float(numero), casas)
+
+
+class _Resposta:
+    """Corpo pronto (e a variante gzip) de uma URL, com o ETag do conteúdo."""
+    __slots__ = ('status', 'corpo', 'corpo_gzip', 'etag', 'tamanho')
+
+    def __init__(self, status, conteudo):
+        self.status = status
+        self.corpo = _serializar(conteudo)
+        self.corpo_gzip = gzip.compress(self.corpo, compresslevel=6, mtime=0) if len(self.corpo) >= TAMANHO_MINIMO_GZIP else None
+        self.etag = hashlib.blake2b(self.corpo, digest_size=12).hexdigest()
+        self.tamanho = len(self.corpo) + len(self.corpo_gzip or b'')
+
+
+class _Loja:
+    """
+    Uma versão publicada dos dados, em colunas: só leitura depois de montada e
+    trocada de uma vez na recarga. As respostas de cada URL são montadas na primeira
+    requisição e guardadas junto com a versão, então recarregar também as descarta.
+    As guardadas somam no máximo MAXIMO_BYTES_RESPOSTAS (LRU).
+    """
+
+    def __init__(self, arquivo):
+        self.versao = _versao(arquivo)
+        with np.load(arquivo) as dados:
+            self.codigos = dados['codigos']
+            self.nomes = dados['nomes'].tolist()
+            self.ufs = dados['ufs']
+            self.iqe = dados['iqe']
+            self.variaveis = dados['variaveis'].tolist()
+            self.valores = dados['valores']
+            self.contribuicoes = dados['contribuicoes']
+            self.melhoria = dados['melhoria']
+            self.pesos = dados['pesos']
+            self.cargas = dados['cargas']
+            self.investimento_simulado = float(dados['investimento_simulado'])
+            self.gerado_em = int(dados['gerado_em'])
+        # O arquivo já vem ordenado pelo IQE: a posição é a linha + 1
+        self.posicao = np.arange(1, len(self.codigos) + 1)
+        self.linhas = {codigo: i for i, codigo in enumerate(self.codigos.tolist())}
+        self.linhas_uf = {uf: np.flatnonzero(self.ufs == uf) for uf in np.unique(self.ufs).tolist()}
+        self.posicao_uf = np.empty(len(self.codigos), dtype='int64')
+        for linhas in self.linhas_uf.values():
+            self.posicao_uf[linhas] = np.arange(1, len(linhas) + 1)
+        ordem = np.argsort(-np.nan_to_num(self.melhoria, nan=-np.inf), kind='stable')
+        self.ordem_melhoria = ordem[~np.isnan(self.melhoria[ordem])]
+        self.respostas = OrderedDict()
+        self.bytes_respostas = 0
+
+    def guardar(self, chave, resposta):
+        self.respostas[chave] = resposta
+        self.bytes_respostas += resposta.tamanho
+        while self.bytes_respostas > MAXIMO_BYTES_RESPOSTAS and len(self.respostas) > 1:
+            _, descartada = self.respostas.popitem(last=False)
+            self.bytes_respostas -= descartada.tamanho
+
+    def resumo(self, i):
+        return {'cod': int(self.codigos[i]), 'nome': self.nomes[i], 'uf': str(self.ufs[i]),
+                'iqe': _valor(self.iqe[i]), 'posicao': int(self.posicao[i])}
+
+    def detalhe(self, i):
+        melhoria = self.melhoria[i]
+        return {
+            **self.resumo(i),
+            'posicao_uf': int(self.posicao_uf[i]),
+            'variaveis': {variavel: _valor(valor) for variavel, valor in zip(self.variaveis, self.valores[i])},
+            'contribuicoes': {variavel: _valor(valor) for variavel, valor in zip(self.variaveis, self.contribuicoes[i])},
+            'recomendacao': None if np.isnan(melhoria) else {
+                'investimento_simulado': self.investimento_simulado,
+                'melhoria_estimada_iqe': _valor(melhoria, 6),
+                'retorno_por_real': float(f'{melhoria / self.investimento_simulado:.4g}'),
+            },
+        }
+
+
+def _versao(arquivo):
+    estado = os.stat(arquivo)
+    return estado.st_mtime_ns, estado.st_size
+
+
+_MOTIVOS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+def _bytes_http(status, linhas):
+    cabecalhos = ''.join(f'{linha}\r\n' for linha in linhas)
+    return f'HTTP/1.1 {status} {_MOTIVOS[status]}\r\n{cabecalhos}\r\n'.encode('latin-1')
+
+
+def _etag_corresponde(if_none_match, etags):
+    """
+    Avalia um If-None-Match: '*' ou uma lista de ETags separadas por vírgula. A
+    comparação é fraca (RFC 9110): o prefixo W/ é ignorado e o valor entre aspas
+    deve ser igual a um de etags.
+    """
+    for item in if_none_match.split(','):
+        item = item.strip()
+        if item == '*':
+            return True
+        if item.startswith('W/'):
+            item = item[2:]
+        if len(item) >= 2 and item[0] == item[-1] == '"' and item[1:-1] in etags:
+            return True
+    return False
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _inteiro(parametros, nome, padrao, minimo=1, maximo=None):
+    valor = parametros.get(nome, [None])[0]
+    if valor is None:
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ErroRequisicao(400, f"Parâmetro '{nome}' deve ser um inteiro.") from None
+    if valor < minimo or (maximo is not None and valor > maximo):
+        raise ErroRequisicao(400, f"Parâmetro '{nome}' fora do intervalo permitido.")
+    return valor
+
+
+def _linhas_uf(loja, parametros):
+    uf = parametros.get('uf', [None])[0]
+    if uf is None:
+        return None
+    uf = uf.upper()
+    if uf not in loja.linhas_uf:
+        raise ErroRequisicao(404, f"UF '{uf}' sem municípios nos dados.")
+    return loja.linhas_uf[uf]
+
+
+def _montar(loja, caminho, parametros):
+    """Conteúdo de uma rota. Só roda na primeira requisição de cada URL por versão dos dados."""
+    partes = [parte for parte in caminho.split('/') if parte]
+    if partes == ['municipios']:
+        return {'cod': loja.codigos.tolist(), 'nome': loja.nomes, 'uf': loja.ufs.tolist(),
+                'iqe': [_valor(v) for v in loja.iqe], 'posicao': loja.posicao.tolist()}
+    if len(partes) == 2 and partes[0] == 'municipios':
+        linha = loja.linhas.get(int(partes[1])) if partes[1].isdigit() else None
+        if linha is None:
+            raise ErroRequisicao(404, f"Município '{partes[1]}' não encontrado.")
+        return loja.detalhe(linha)
+    if partes == ['ranking']:
+        linhas = _linhas_uf(loja, parametros)
+        linhas = np.arange(len(loja.codigos)) if linhas is None else linhas
+        if parametros.get('ordem', ['desc'])[0] == 'asc':
+            linhas = linhas[::-1]
+        limite = _inteiro(parametros, 'limite', LIMITE_PADRAO)
+        return {'total': int(len(linhas)), 'municipios': [loja.resumo(i) for i in linhas[:limite].tolist()]}
+    if partes == ['recomendacoes']:
+        linhas = loja.ordem_melhoria
+        filtro = _linhas_uf(loja, parametros)
+        if filtro is not None:
+            linhas = linhas[np.isin(linhas, filtro)]
+        limite = _inteiro(parametros, 'limite', LIMITE_PADRAO)
+        return {'investimento_simulado': loja.investimento_simulado, 'total': int(len(linhas)),
+                'municipios': [{**loja.resumo(i), 'melhoria_estimada_iqe': _valor(loja.melhoria[i], 6)}
+                               for i in linhas[:limite].tolist()]}
+    if partes == ['pesos']:
+        return {'variaveis': loja.variaveis, 'pesos': [_valor(v, 6) for v in loja.pesos],
+                'cargas': [_valor(v, 6) for v in loja.cargas]}
+    raise ErroRequisicao(404, f"Rota '{caminho}' não existe. Use /municipios, /municipios/<cod>, /ranking, "
+                              f"/recomendacoes, /pesos ou /saude.")
+
+
+class ServidorAPI:
+    """
+    API HTTP somente leitura sobre os dados publicados por publicar_dados_api(),
+    em asyncio e sem dependências além da biblioteca padrão e do numpy.
+
+    Rotas (GET): /municipios, /municipios/<cod>, /ranking?uf=PB&limite=50&ordem=asc,
+    /recomendacoes?uf=PB&limite=50, /pesos e /saude. Cada resposta é montada uma
+    vez por versão dos dados e servida do cache com ETag (If-None-Match -> 304) e
+    gzip quando o cliente aceita. A cada 'intervalo_verificacao' segundos o arquivo
+    publicado é conferido; se mudou, a nova versão é carregada fora do laço de
+    eventos e trocada de uma vez, e requisições em andamento terminam com a anterior.
+
+    Exemplo:
+        servidor = ServidorAPI()
+        asyncio.run(servidor.servir_para_sempre())
+    """
+
+    def __init__(self, diretorio=None, intervalo_verificacao=1.0):
+        self.arquivo = _diretorio(diretorio) / ARQUIVO_DADOS_API
+        self.intervalo_verificacao = intervalo_verificacao
+        self.loja = _Loja(self.arquivo)
+        self.requisicoes = 0
+
+    async def recarregar(self, forcar=False):
+        """Carrega a versão publicada se o arquivo mudou. Retorna True se recarregou."""
+        try:
+            versao = _versao(self.arquivo)
+        except FileNotFoundError:
+            return False
+        if not forcar and versao == self.loja.versao:
+            return False
+        loja = await asyncio.get_running_loop().run_in_executor(None, _Loja, self.arquivo)
+        self.loja = loja
+        print(f"[api] Dados recarregados de {self.arquivo} ({len(loja.codigos)} municípios).")
+        return True
+
+    async def _verificar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.intervalo_verificacao)
+            try:
+                await self.recarregar()
+            except Exception as e:  # Um arquivo ruim não derruba o servidor: fica a versão anterior
+                print(f"[api] Falha ao recarregar os dados: {e}")
+
+    def resposta(self, alvo):
+        """Resposta pronta para um alvo de requisição ('/ranking?uf=PB')."""
+        loja = self.loja
+        url = urlsplit(alvo)
+        parametros = parse_qs(url.query)
+        caminho = url.path.rstrip('/') or '/'
+        # Parâmetros que a rota ignora não criam novas entradas no cache
+        chave = (caminho, tuple((nome, parametros[nome][0]) for nome in PARAMETROS_ROTAS.get(caminho, ())
+                                if nome in parametros))
+        resposta = loja.respostas.get(chave)
+        if resposta is not None:
+            loja.respostas.move_to_end(chave)
+            return resposta
+        if chave[0] == '/saude':
+            return _Resposta(200, {'gerado_em': loja.gerado_em, 'municipios': len(loja.codigos),
+                                   'requisicoes': self.requisicoes})
+        try:
+            resposta = _Resposta(200, _montar(loja, unquote(chave[0]), parametros))
+        except ErroRequisicao as e:
+            resposta = _Resposta(e.status, {'erro': str(e)})
+        loja.guardar(chave, resposta)
+        return resposta
+
+    async def _atender(self, leitor, escritor):
+        try:
+            while True:
+                try:
+                    cabecalho = await leitor.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                linhas = cabecalho.decode('latin-1').split('\r\n')
+                try:
+                    metodo, alvo, protocolo = linhas[0].split(' ')
+                except ValueError:
+                    escritor.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    return
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                manter = (cabecalhos.get('connection', '').lower() != 'close' if protocolo == 'HTTP/1.1'
+                          else cabecalhos.get('connection', '').lower() == 'keep-alive')
+                # Rotas só de leitura: um corpo eventual é descartado
+                tamanho_corpo = cabecalhos.get('content-length', '0')
+                if tamanho_corpo.isdigit() and int(tamanho_corpo) > 0:
+                    await leitor.readexactly(int(tamanho_corpo))
+                self.requisicoes += 1
+                escritor.write(self._http(metodo, alvo, cabecalhos, manter))
+                await escritor.drain()
+                if not manter:
+                    return
+        finally:
+            escritor.close()
+
+    def _http(self, metodo, alvo, cabecalhos, manter):
+        linhas = [f"Connection: {'keep-alive' if manter else 'close'}"]
+        if metodo not in ('GET', 'HEAD'):
+            return _bytes_http(405, linhas + ['Allow: GET, HEAD', 'Content-Length: 0'])
+        resposta = self.resposta(alvo)
+        usar_gzip = resposta.corpo_gzip is not None and 'gzip' in cabecalhos.get('accept-encoding', '')
+        linhas += [f'ETag: "{resposta.etag}{"-gzip" if usar_gzip else ""}"', 'Cache-Control: no-cache',
+                   'Vary: Accept-Encoding', 'Access-Control-Allow-Origin: *']
+        # As variantes com e sem gzip têm o mesmo conteúdo: qualquer uma revalida a resposta
+        if resposta.status == 200 and _etag_corresponde(cabecalhos.get('if-none-match', ''),
+                                                        (resposta.etag, f'{resposta.etag}-gzip')):
+            return _bytes_http(304, linhas)
+        corpo = resposta.corpo_gzip if usar_gzip else resposta.corpo
+        linhas += ['Content-Type: application/json; charset=utf-8', f'Content-Length: {len(corpo)}']
+        if usar_gzip:
+            linhas.append('Content-Encoding: gzip')
+        inicio = _bytes_http(resposta.status, linhas)
+        return inicio if metodo == 'HEAD' else inicio + corpo
+
+    async def iniciar(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        """Abre o socket e começa a verificar novas publicações. Retorna o asyncio.Server."""
+        servidor = await asyncio.start_server(self._atender, host, porta, limit=TAMANHO_MAXIMO_CABECALHO, backlog=1024)
+        if self.intervalo_verificacao is not None:
+            self._tarefa_recarga = asyncio.create_task(self._verificar_periodicamente())
+        return servidor
+
+    async def servir_para_sempre(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        servidor = await self.iniciar(host, porta)
+        print(f"API em http://{host}:{servidor.sockets[0].getsockname()[1]} (Ctrl+C para encerrar)")
+        async with servidor:
+            await servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pipeline
+
+    # Uso: python api.py [porta]   (publica os dados mais recentes e sobe a API)
+    pipeline.obter('api')
+    try:
+        asyncio.run(ServidorAPI().servir_para_sempre(porta=int(sys.argv[1]) if len(sys.argv) > 1 else PORTA_PADRAO))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def escrita_atomica(destino, sufixo=''):
+    """
+    Caminho temporário, na pasta de destino, para gravar um arquivo que só substitui
+    destino (com os.replace) quando o bloco termina sem erro: quem lê destino vê sempre
+    o arquivo anterior inteiro ou o novo inteiro. Se o bloco falha, o temporário é apagado.
+
+    O nome temporário é oculto e único por processo e thread, então gravações
+    simultâneas do mesmo arquivo não se atropelam.
+
+    Args:
+        destino (str ou Path): Arquivo final. A pasta é criada se não existir.
+        sufixo (str): Fim do nome temporário, para bibliotecas que o exigem
+            (ex.: '.npz', senão o np.savez o acrescenta).
+
+    Exemplo:
+        with arquivos.escrita_atomica(destino) as temporario:
+            df.to_parquet(temporario, index=False)
+    """
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f'.{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp{sufixo}')
+    try:
+        yield temporario
+        os.replace(temporario, destino)
+    except BaseException:
+        temporario.unlink(missing_ok=True)
+        raise
+
+
+def gravar_atomico(destino, dados, encoding='utf-8'):
+    """Grava bytes ou texto em destino com escrita_atomica(). Retorna o caminho gravado."""
+    with escrita_atomica(destino) as temporario:
+        if isinstance(dados, str):
+            temporario.write_text(dados, encoding=encoding)
+        else:
+            temporario.write_bytes(dados)
+    return Path(destino)
+
+
+def gravar_json(destino, conteudo, **opcoes):
+    """Grava conteudo em JSON com escrita_atomica(); opcoes vão para json.dumps. Retorna o caminho gravado."""
+    return gravar_atomico(destino, json.dumps(conteudo, **opcoes))
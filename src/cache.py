@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+import arquivos
+
+
+# Diretório padrão do cache; pode ser trocado pela variável de ambiente PORTAL_CACHE_DIR
+DIRETORIO_CACHE = Path(os.environ.get('PORTAL_CACHE_DIR', Path(__file__).parent.parent / 'data' / 'cache'))
+
+# Em modo offline nenhuma requisição é feita: só o que já está no cache é servido
+MODO_OFFLINE = os.environ.get('PORTAL_OFFLINE', '0').lower() in ('1', 'true', 'sim')
+
+# Espelho local das fontes (ex.: o servidor dos benchmarks): http://127.0.0.1:8000 faz
+# https://download.inep.gov.br/a/b.zip ser buscado em http://127.0.0.1:8000/download.inep.gov.br/a/b.zip
+ESPELHO = os.environ.get('PORTAL_ESPELHO', '').rstrip('/') or None
+
+# Tamanho dos blocos gravados em disco durante o download
+TAMANHO_BLOCO = 1024 * 1024
+
+_trava = threading.Lock()
+_estatisticas = {}
+# Uma trava por URL: downloads simultâneos do mesmo arquivo esperam o primeiro terminar
+_travas_url = {}
+
+
+class CacheIndisponivel(requests.exceptions.RequestException):
+    """
+    Levantada quando o modo offline está ativo e a URL pedida não está no cache.
+    Herda de RequestException para que os laços de nova tentativa existentes
+    tratem a ausência do arquivo como uma falha de download comum.
+    """
+
+
+class DownloadIncompleto(requests.exceptions.RequestException):
+    """
+    Levantada quando o arquivo recebido não tem o tamanho anunciado pelo servidor
+    ou o SHA-256 esperado. O trecho já baixado é mantido para ser retomado.
+    """
+
+
+def definir_modo_offline(ativo=True):
+    """Liga ou desliga o modo offline (somente leitura do cache)."""
+    global MODO_OFFLINE
+    MODO_OFFLINE = ativo
+
+
+def definir_diretorio_cache(diretorio):
+    """Troca o diretório do cache (útil para rodar contra um servidor local de testes)."""
+    global DIRETORIO_CACHE
+    DIRETORIO_CACHE = Path(diretorio)
+
+
+def definir_espelho(url_base):
+    """Redireciona todos os downloads para um espelho local (None desliga o redirecionamento)."""
+    global ESPELHO
+    ESPELHO = url_base.rstrip('/') if url_base else None
+
+
+def _aplicar_espelho(url):
+    if ESPELHO is None:
+        return url
+    partes = urlsplit(url)
+    return f"{ESPELHO}/{partes.netloc}{partes.path}"
+
+
+def _caminho_indice():
+    return DIRETORIO_CACHE / 'indice.json'
+
+
+def _caminho_objeto(sha256):
+    # Endereçamento por conteúdo: o nome do arquivo é o próprio hash
+    return DIRETORIO_CACHE / 'objetos' / sha256[:2] / sha256
+
+
+def _carregar_indice():
+    caminho = _caminho_indice()
+    if not caminho.exists():
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _salvar_indice(indice):
+    arquivos.gravar_json(_caminho_indice(), indice, ensure_ascii=False, indent=2)
+
+
+def _registrar(fonte, evento):
+    with _trava:
+        contagem = _estatisticas.setdefault(fonte, {'hits': 0, 'misses': 0, 'revalidados': 0})
+        contagem[evento] += 1
+
+
+def _caminho_parcial(url):
+    return DIRETORIO_CACHE / 'parciais' / hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _tamanho_total(response, ja_baixado):
+    """Tamanho final esperado do arquivo, ou None se o servidor não informar."""
+    if response.headers.get('Content-Encoding'):
+        return None  # Content-Length se refere aos bytes comprimidos
+    if response.status_code == 206:
+        # Content-Range: bytes 1000-1999/2000
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    comprimento = response.headers.get('Content-Length')
+    return ja_baixado + int(comprimento) if comprimento and comprimento.isdigit() else None
+
+
+def _transferir(cliente, url, cabecalhos, timeout, fonte, sha256_esperado=None):
+    """
+    Baixa a URL em blocos direto para um arquivo parcial em disco, retomando com
+    Range um download interrompido anteriormente, e move o resultado para o
+    armazenamento endereçado por conteúdo.
+
+    Returns:
+        tuple: (response, sha256, caminho do objeto) ou (response, None, None) se a
+               resposta não trouxe um corpo a ser gravado (ex.: 304).
+    """
+    parcial = _caminho_parcial(url)
+    metadados_parcial = parcial.with_suffix('.json')
+    ja_baixado = parcial.stat().st_size if parcial.exists() else 0
+    validador = None
+    if ja_baixado and metadados_parcial.exists():
+        validador = json.loads(metadados_parcial.read_text(encoding='utf-8')).get('validador')
+    if ja_baixado and validador:
+        # If-Range: o servidor só envia o restante se o arquivo ainda for a mesma versão
+        cabecalhos = {'Range': f'bytes={ja_baixado}-', 'If-Range': validador}
+        print(f"[cache] {fonte}: retomando download a partir de {ja_baixado / 1e6:.1f} MB.")
+
+    response = cliente.get(url, headers=cabecalhos, timeout=timeout, stream=True)
+    with response:
+        if response.status_code == 304:
+            return response, None, None
+        if response.status_code == 416:
+            # O trecho salvo não corresponde mais ao arquivo do servidor: recomeça do zero
+            parcial.unlink(missing_ok=True)
+            metadados_parcial.unlink(missing_ok=True)
+            raise DownloadIncompleto(f"Intervalo inválido ao retomar '{url}'. O download será reiniciado.")
+        response.raise_for_status()
+
+        sha = hashlib.sha256()
+        if response.status_code == 206:
+            # Recalcula o hash do trecho já existente antes de continuar
+            with open(parcial, 'rb') as f:
+                for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                    sha.update(bloco)
+            modo = 'ab'
+        else:
+            ja_baixado = 0
+            modo = 'wb'
+        total = _tamanho_total(response, ja_baixado)
+
+        arquivos.gravar_json(metadados_parcial, {
+            'url': url,
+            'validador': response.headers.get('ETag') or response.headers.get('Last-Modified'),
+        })
+        with open(parcial, modo) as f:
+            for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO):
+                f.write(bloco)
+                sha.update(bloco)
+
+    recebido = parcial.stat().st_size
+    if total is not None and recebido != total:
+        raise DownloadIncompleto(f"Recebidos {recebido} de {total} bytes de '{url}'.")
+    sha256 = sha.hexdigest()
+    if sha256_esperado is not None and sha256 != sha256_esperado:
+        parcial.unlink()
+        metadados_parcial.unlink(missing_ok=True)
+        raise DownloadIncompleto(f"SHA-256 de '{url}' não confere: {sha256} != {sha256_esperado}.")
+
+    destino = _caminho_objeto(sha256)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(parcial, destino)
+    metadados_parcial.unlink(missing_ok=True)
+    return response, sha256, destino
+
+
+def baixar(url, fonte, session=None, timeout=30, revalidar=True, sha256_esperado=None):
+    """
+    Baixa uma URL passando pelo cache em disco, endereçado por conteúdo (SHA-256).
+
+    Se a URL já estiver no cache, a cópia local é revalidada com ETag/Last-Modified
+    (requisição condicional); uma resposta 304 reaproveita o arquivo sem novo download.
+    Em modo offline, apenas o cache é consultado. Com um espelho definido
+    (definir_espelho() ou PORTAL_ESPELHO), a URL é buscada no espelho.
+
+    O corpo da resposta é gravado em disco em blocos de TAMANHO_BLOCO bytes, sem
+    passar inteiro pela memória. Se a conexão cair no meio, o trecho recebido é
+    mantido e a próxima tentativa retoma o download com uma requisição Range.
+
+    Args:
+        url (str): Endereço do arquivo.
+        fonte (str): Nome da fonte de dados, usado no relatório de hits/misses.
+        session (requests.Session, opcional): Sessão (com retry) a ser usada.
+        timeout (int): Timeout da requisição em segundos.
+        revalidar (bool): Se False, uma cópia em cache é usada sem consultar o servidor.
+        sha256_esperado (str, opcional): Hash esperado do arquivo, verificado ao fim do download.
+
+    Returns:
+        pathlib.Path: Caminho do arquivo no cache.
+
+    Raises:
+        CacheIndisponivel: Em modo offline, quando a URL não está no cache.
+        DownloadIncompleto: Quando o tamanho ou o hash do arquivo recebido não confere.
+        requests.exceptions.RequestException: Em falhas de download.
+    """
+    url = _aplicar_espelho(url)
+    with _trava:
+        trava_url = _travas_url.setdefault(url, threading.Lock())
+    with trava_url:
+        return _baixar(url, fonte, session, timeout, revalidar, sha256_esperado)
+
+
+def _baixar(url, fonte, session, timeout, revalidar, sha256_esperado):
+    cliente = session if session is not None else requests
+    with _trava:
+        indice = _carregar_indice()
+    entrada = indice.get(url)
+    caminho_em_cache = _caminho_objeto(entrada['sha256']) if entrada else None
+    em_cache = caminho_em_cache is not None and caminho_em_cache.exists()
+
+    if em_cache and (MODO_OFFLINE or not revalidar):
+        print(f"[cache] {fonte}: usando cópia local ({entrada['sha256'][:12]}).")
+        _registrar(fonte, 'hits')
+        return caminho_em_cache
+    if MODO_OFFLINE:
+        _registrar(fonte, 'misses')
+        raise CacheIndisponivel(f"Modo offline ativo e '{url}' não está no cache.")
+
+    cabecalhos = {}
+    if em_cache:
+        if entrada.get('etag'):
+            cabecalhos['If-None-Match'] = entrada['etag']
+        if entrada.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = entrada['last_modified']
+
+    try:
+        response, sha256, destino = _transferir(cliente, url, cabecalhos, timeout, fonte, sha256_esperado)
+    except requests.exceptions.RequestException as e:
+        if not em_cache:
+            _registrar(fonte, 'misses')
+            raise
+        # Servidor inacessível: a cópia local ainda é a melhor informação disponível
+        print(f"[cache] {fonte}: falha ao revalidar ({e}). Usando cópia local.")
+        _registrar(fonte, 'hits')
+        return caminho_em_cache
+
+    if em_cache and response.status_code == 304:
+        print(f"[cache] {fonte}: arquivo não mudou no servidor (304). Usando cópia local.")
+        _registrar(fonte, 'hits')
+        _registrar(fonte, 'revalidados')
+        with _trava:
+            indice = _carregar_indice()
+            indice.setdefault(url, entrada)['verificado_em'] = time.time()
+            _salvar_indice(indice)
+        return caminho_em_cache
+
+    if destino is None:
+        # 304 sem cópia local válida: não há o que reaproveitar
+        raise DownloadIncompleto(f"O servidor respondeu 304 para '{url}', mas não há cópia em cache.")
+    print(f"[cache] {fonte}: arquivo baixado e armazenado ({sha256[:12]}).")
+    _registrar(fonte, 'misses')
+
+    with _trava:
+        indice = _carregar_indice()
+        indice[url] = {
+            'fonte': fonte,
+            'sha256': sha256,
+            'tamanho': destino.stat().st_size,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'baixado_em': time.time(),
+            'verificado_em': time.time(),
+        }
+        _salvar_indice(indice)
+    return destino
+
+
+def estatisticas_cache():
+    """Retorna uma cópia das contagens de hits, misses e revalidações por fonte."""
+    with _trava:
+        return {fonte: dict(contagem) for fonte, contagem in _estatisticas.items()}
+
+
+def zerar_estatisticas():
+    with _trava:
+        _estatisticas.clear()
+
+
+def imprimir_relatorio_cache():
+    """Exibe um resumo de uso do cache por fonte de dados."""
+    estatisticas = estatisticas_cache()
+    print("\n--- Relatório do cache de downloads ---")
+    if not estatisticas:
+        print("Nenhum download passou pelo cache nesta execução.")
+        return
+    for fonte, contagem in sorted(estatisticas.items()):
+        print(f"{fonte:<25} hits: {contagem['hits']:>3} | misses: {contagem['misses']:>3} "
+              f"| revalidados (304): {contagem['revalidados']:>3}")
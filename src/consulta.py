@@ -0,0 +1,454 @@
+import json
+import re
+import threading
+import unicodedata
+from functools import lru_cache, partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import indice_municipios
+import iqe
+
+
+# Como as colunas podem ser escritas nas consultas (sem acentos, minúsculas)
+SINONIMOS_COLUNAS = {
+    'iqe': 'IQE', 'indice': 'IQE',
+    'nota_saeb': 'nota_saeb', 'nota do saeb': 'nota_saeb', 'saeb': 'nota_saeb', 'nota': 'nota_saeb',
+    'taxa_aprovacao': 'taxa_aprovacao', 'taxa de aprovacao': 'taxa_aprovacao', 'aprovacao': 'taxa_aprovacao',
+    'iqie_infraestrutura': 'iqie_infraestrutura', 'infraestrutura': 'iqie_infraestrutura', 'iqie': 'iqie_infraestrutura',
+    'inse_socioeconomico': 'inse_socioeconomico', 'nivel socioeconomico': 'inse_socioeconomico',
+    'socioeconomico': 'inse_socioeconomico', 'inse': 'inse_socioeconomico',
+    'formacao_docente': 'formacao_docente', 'formacao docente': 'formacao_docente', 'formacao': 'formacao_docente',
+    'docentes': 'formacao_docente', 'docente': 'formacao_docente',
+}
+OPERADORES = {
+    '>=': '>=', '<=': '<=', '>': '>', '<': '<', '=': '=',
+    'acima de': '>', 'maior que': '>', 'maior do que': '>', 'mais de': '>', 'superior a': '>',
+    'pelo menos': '>=', 'no minimo': '>=', 'a partir de': '>=',
+    'abaixo de': '<', 'menor que': '<', 'menor do que': '<', 'menos de': '<', 'inferior a': '<',
+    'no maximo': '<=', 'ate': '<=', 'igual a': '=',
+}
+NOMES_UF = {
+    'rondonia': 'RO', 'acre': 'AC', 'amazonas': 'AM', 'roraima': 'RR', 'para': 'PA', 'amapa': 'AP',
+    'tocantins': 'TO', 'maranhao': 'MA', 'piaui': 'PI', 'ceara': 'CE', 'rio grande do norte': 'RN',
+    'paraiba': 'PB', 'pernambuco': 'PE', 'alagoas': 'AL', 'sergipe': 'SE', 'bahia': 'BA',
+    'minas gerais': 'MG', 'espirito santo': 'ES', 'rio de janeiro': 'RJ', 'sao paulo': 'SP',
+    'parana': 'PR', 'santa catarina': 'SC', 'rio grande do sul': 'RS', 'mato grosso do sul': 'MS',
+    'mato grosso': 'MT', 'goias': 'GO', 'distrito federal': 'DF',
+}
+PALAVRAS_CRESCENTE = ('piores', 'pior', 'menores', 'ultimos', 'bottom', 'lanterna')
+PALAVRAS_LISTA = ('top', 'maiores', 'melhores', 'primeiros', 'ranking', 'municipios', 'cidades', 'lista',
+                  'listar') + PALAVRAS_CRESCENTE
+N_PADRAO = 5
+N_MAXIMO = 100
+TAMANHO_CACHE = 4096
+PORTA_PADRAO = 8765
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com espaços simples: a forma usada no cache e no parser."""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', errors='ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', texto.lower()).strip()
+
+
+def _alternativas(opcoes):
+    # As mais longas primeiro, para 'taxa de aprovacao' vencer 'aprovacao'
+    return '|'.join(re.escape(opcao) for opcao in sorted(opcoes, key=len, reverse=True))
+
+
+_NUMERO = r'-?\d+(?:[.,]\d+)?'
+_COLUNA = _alternativas(SINONIMOS_COLUNAS)
+_RE_ENTRE = re.compile(rf'\b(?P<coluna>{_COLUNA})\b[\w ]{{0,20}}?\bentre (?P<minimo>{_NUMERO}) e (?P<maximo>{_NUMERO})')
+_RE_CONDICAO = re.compile(
+    rf'\b(?P<coluna>{_COLUNA})\b(?:\s+\w+){{0,2}}?\s*(?P<operador>{_alternativas(OPERADORES)})\s*(?P<valor>{_NUMERO})')
+_RE_UF_ESTRUTURADA = re.compile(r'\buf\s*[=:]\s*(?P<uf>[a-z]{2})\b')
+_RE_UF_NOME = re.compile(rf'\b(?:em|no|na|de|do|da)\s+(?P<nome>{_alternativas(NOMES_UF)})\b')
+_RE_N = re.compile(r'\bn\s*=\s*(?P<n>\d+)\b|\b(?P<n2>\d+)\b')
+_RE_ORDENAR = re.compile(rf'\b(?:ordenar por|ordenado por|por|ordem)\s*=?\s*(?P<coluna>{_COLUNA})\b')
+_RE_COMPARAR = re.compile(r'^(?:comparar|compare|comparacao|comparativo)(?: entre| de)?\s+(?P<resto>.+)$')
+_RE_SEPARADOR = re.compile(r'\s+(?:e|vs\.?|versus|x|com)\s+|\s*[,;|]\s*')
+_RE_POSICAO = re.compile(r'\b(?:posicao|colocacao|rank|ranking|lugar)\s+(?:de |do |da |of )?(?P<nome>.+?)\??$')
+
+
+def _numero(texto):
+    return float(texto.replace(',', '.'))
+
+
+class MotorConsultas:
+    """
+    Responde perguntas sobre a tabela do IQE a partir de índices montados uma vez:
+    o ranking nacional, o ranking de cada UF, cada coluna ordenada (para filtros
+    por faixa com busca binária) e os nomes normalizados. As respostas ficam em um
+    cache LRU pela consulta normalizada.
+
+    Entende linguagem natural simples e uma forma estruturada:
+        "top 5 IQE na Paraíba"             "top n=5 uf=PB"
+        "municípios com aprovação acima de 90 e infraestrutura abaixo de 0,5"
+        "taxa_aprovacao>90 iqie_infraestrutura<0.5"
+        "piores 10 de Pernambuco por saeb"
+        "comparar Campina Grande e João Pessoa"
+        "posição de Itatuba"
+
+    Exemplo:
+        motor = MotorConsultas(df_iqe)
+        motor.consultar('top 5 IQE na Paraíba')['texto']
+    """
+
+    def __init__(self, df_iqe, tamanho_cache=TAMANHO_CACHE):
+        """
+        Args:
+            df_iqe (pd.DataFrame): Saída de iqe.calcular_iqe() ('cod_municipio',
+                'nome_municipio', 'IQE' e as variáveis do IQE).
+            tamanho_cache (int): Consultas distintas guardadas no cache LRU.
+        """
+        df = df_iqe.dropna(subset=['IQE']).reset_index(drop=True)
+        if df.empty:
+            raise ValueError("A tabela do IQE está vazia.")
+        self.codigos = df['cod_municipio'].to_numpy(dtype='int64')
+        self.nomes = df['nome_municipio'].astype(str).to_numpy()
+        self.ufs = np.array([indice_municipios.SIGLAS_UF.get(codigo // 100_000, '') for codigo in self.codigos.tolist()])
+        self.colunas = {coluna: df[coluna].to_numpy(dtype='float64')
+                        for coluna in ['IQE'] + iqe.VARIAVEIS_IQE if coluna in df}
+        self.variaveis = [coluna for coluna in iqe.VARIAVEIS_IQE if coluna in self.colunas]
+
+        # Ranking nacional e por UF (posição 1 = maior IQE)
+        self._ranking = np.argsort(-self.colunas['IQE'], kind='stable')
+        self.posicao = np.empty(len(df), dtype='int64')
+        self.posicao[self._ranking] = np.arange(1, len(df) + 1)
+        self._ranking_uf = {uf: self._ranking[self.ufs[self._ranking] == uf] for uf in np.unique(self.ufs)}
+        self.posicao_uf = np.empty(len(df), dtype='int64')
+        for indices in self._ranking_uf.values():
+            self.posicao_uf[indices] = np.arange(1, len(indices) + 1)
+
+        # Cada coluna ordenada (sem nulos): faixas de valores viram fatias por busca binária
+        self._ordem, self._ordenados = {}, {}
+        for coluna, valores in self.colunas.items():
+            validos = np.flatnonzero(~np.isnan(valores))
+            ordem = validos[np.argsort(valores[validos], kind='stable')]
+            self._ordem[coluna], self._ordenados[coluna] = ordem, valores[ordem]
+
+        self._por_nome = {}
+        for i, nome in enumerate(self.nomes):
+            self._por_nome.setdefault(normalizar(nome), []).append(i)
+        self._por_codigo = {codigo: i for i, codigo in enumerate(self.codigos.tolist())}
+        # O cache guarda o JSON serializado: bytes imutáveis, que o endpoint envia como estão
+        self._responder_em_cache = lru_cache(maxsize=tamanho_cache)(self._responder_json)
+
+    # ---------------------------------------------------------------------
+    # Entrada
+    # ---------------------------------------------------------------------
+
+    def consultar(self, texto):
+        """
+        Responde a uma consulta.
+
+        Returns:
+            dict: 'tipo' ('lista', 'comparacao', 'posicao' ou 'erro'), 'texto' (a
+                  resposta em português) e os dados: 'municipios' (lista de dicts)
+                  e, nas listas, 'total' de municípios que atendem aos filtros. Cada
+                  chamada devolve um dict novo: alterá-lo não afeta o cache.
+        """
+        return json.loads(self.consultar_json(texto))
+
+    def consultar_json(self, texto):
+        """A resposta de consultar() já serializada em JSON (bytes UTF-8), como o endpoint a envia."""
+        return self._responder_em_cache(normalizar(texto))
+
+    def info_cache(self):
+        return self._responder_em_cache.cache_info()
+
+    def _responder_json(self, texto):
+        return json.dumps(self._responder(texto), ensure_ascii=False).encode('utf-8')
+
+    def _responder(self, texto):
+        try:
+            comparacao = _RE_COMPARAR.match(texto)
+            if comparacao:
+                return self._comparar(comparacao.group('resto'))
+            # "ranking de PB" é uma lista; "ranking de Itatuba", a posição de um município
+            posicao = _RE_POSICAO.search(texto)
+            if posicao and self._resolver(posicao.group('nome'), obrigatorio=False) is not None:
+                return self._posicao_de(posicao.group('nome'))
+            resposta = self._lista(texto)
+            if resposta is not None:
+                return resposta
+            if posicao:
+                return self._posicao_de(posicao.group('nome'))
+            # Só o nome de um município (ou de vários homônimos, para pedir a UF)
+            if self._resolver(texto, obrigatorio=False) is not None or texto.strip(' ?.!"\'') in self._por_nome:
+                return self._posicao_de(texto)
+            return _erro("Não entendi a pergunta. Exemplos: \"top 5 IQE na Paraíba\", \"municípios com aprovação "
+                         "acima de 90 e infraestrutura abaixo de 0,5\", \"comparar Campina Grande e João Pessoa\" "
+                         "ou \"posição de Itatuba\".")
+        except LookupError as e:
+            return _erro(e.args[0])
+
+    # ---------------------------------------------------------------------
+    # Municípios
+    # ---------------------------------------------------------------------
+
+    def _resolver(self, referencia, obrigatorio=True):
+        """Índice de um município pelo código IBGE, pelo nome ou por 'nome (UF)' / 'nome - UF'."""
+        referencia = referencia.strip(' ?.!"\'')
+        if referencia.isdigit():
+            indice = self._por_codigo.get(int(referencia))
+            if indice is not None or not obrigatorio:
+                return indice
+            raise LookupError(f"Não há município com o código {referencia} na tabela do IQE.")
+        uf = None
+        com_uf = re.match(r'^(?P<nome>.+?)\s*(?:\((?P<uf1>[a-z]{2})\)|[-/]\s*(?P<uf2>[a-z]{2}))$', referencia)
+        if com_uf and referencia not in self._por_nome:
+            referencia, uf = com_uf.group('nome'), (com_uf.group('uf1') or com_uf.group('uf2')).upper()
+        indices = [i for i in self._por_nome.get(referencia, []) if uf is None or self.ufs[i] == uf]
+        if len(indices) == 1:
+            return indices[0]
+        if not obrigatorio:
+            return None
+        if not indices:
+            raise LookupError(f"Não encontrei o município \"{referencia}\" na tabela do IQE.")
+        opcoes = ', '.join(f"{self.nomes[i]} ({self.ufs[i]})" for i in indices)
+        raise LookupError(f"Há {len(indices)} municípios com esse nome: {opcoes}. Indique a UF, ex.: \"{self.nomes[indices[0]]} ({self.ufs[indices[0]]})\".")
+
+    def _registro(self, i, colunas=()):
+        registro = {
+            'cod_municipio': int(self.codigos[i]),
+            'nome_municipio': str(self.nomes[i]),
+            'uf': str(self.ufs[i]),
+            'IQE': round(float(self.colunas['IQE'][i]), 4),
+            'posicao': int(self.posicao[i]),
+            'posicao_uf': int(self.posicao_uf[i]),
+        }
+        for coluna in colunas:
+            valor = self.colunas[coluna][i]
+            registro[coluna] = None if np.isnan(valor) else round(float(valor), 4)
+        return registro
+
+    # ---------------------------------------------------------------------
+    # Consultas
+    # ---------------------------------------------------------------------
+
+    def _posicao_de(self, referencia):
+        i = self._resolver(referencia)
+        registro = self._registro(i, self.variaveis)
+        total_uf = len(self._ranking_uf[self.ufs[i]])
+        texto = (f"{registro['nome_municipio']} ({registro['uf']}) tem IQE {_formatar(registro['IQE'])}: "
+                 f"{registro['posicao']}º de {len(self.codigos)} municípios e {registro['posicao_uf']}º de "
+                 f"{total_uf} em {registro['uf']}.")
+        return {'tipo': 'posicao', 'texto': texto, 'municipios': [registro]}
+
+    def _comparar(self, resto):
+        resto = resto.strip(' ?.!')
+        # Tenta cada separador: nomes como "Santa Rita e ..." não são cortados no lugar errado
+        for separador in _RE_SEPARADOR.finditer(resto):
+            a = self._resolver(resto[:separador.start()], obrigatorio=False)
+            b = self._resolver(resto[separador.end():], obrigatorio=False)
+            if a is not None and b is not None:
+                break
+        else:
+            partes = _RE_SEPARADOR.split(resto, maxsplit=1)
+            if len(partes) != 2:
+                raise LookupError("Para comparar, indique dois municípios, ex.: \"comparar Campina Grande e João Pessoa\".")
+            a, b = self._resolver(partes[0]), self._resolver(partes[1])
+        registros = [self._registro(i, self.variaveis) for i in (a, b)]
+        linhas = [f"{registros[0]['nome_municipio']} ({registros[0]['uf']}) x "
+                  f"{registros[1]['nome_municipio']} ({registros[1]['uf']}):"]
+        for coluna in ['IQE'] + self.variaveis:
+            va, vb = registros[0].get(coluna), registros[1].get(coluna)
+            diferenca = '' if va is None or vb is None else f" (diferença {_formatar(va - vb, sinal=True)})"
+            linhas.append(f"- {coluna}: {_formatar(va)} x {_formatar(vb)}{diferenca}")
+        linhas.append(f"- posição: {registros[0]['posicao']}º x {registros[1]['posicao']}º")
+        return {'tipo': 'comparacao', 'texto': '\n'.join(linhas), 'municipios': registros}
+
+    def _condicoes(self, texto):
+        """Extrai os filtros por faixa: [(coluna, mínimo, máximo, inclui mínimo, inclui máximo)]."""
+        condicoes = []
+        for padrao in (_RE_ENTRE, _RE_CONDICAO):
+            for m in padrao.finditer(texto):
+                coluna = SINONIMOS_COLUNAS[m.group('coluna')]
+                if coluna not in self.colunas:
+                    raise LookupError(f"A coluna {coluna} não está na tabela do IQE.")
+                if padrao is _RE_ENTRE:
+                    condicoes.append((coluna, _numero(m.group('minimo')), _numero(m.group('maximo')), True, True))
+                else:
+                    operador, valor = OPERADORES[m.group('operador')], _numero(m.group('valor'))
+                    condicoes.append({
+                        '>': (coluna, valor, np.inf, False, True), '>=': (coluna, valor, np.inf, True, True),
+                        '<': (coluna, -np.inf, valor, True, False), '<=': (coluna, -np.inf, valor, True, True),
+                        '=': (coluna, valor, valor, True, True),
+                    }[operador])
+            texto = padrao.sub(' ', texto)
+        return condicoes, texto
+
+    def _faixa(self, coluna, minimo, maximo, inclui_minimo, inclui_maximo):
+        """Índices dos municípios com a coluna na faixa: uma fatia do índice ordenado."""
+        ordenados = self._ordenados[coluna]
+        inicio = np.searchsorted(ordenados, minimo, side='left' if inclui_minimo else 'right')
+        fim = np.searchsorted(ordenados, maximo, side='right' if inclui_maximo else 'left')
+        return self._ordem[coluna][inicio:max(inicio, fim)]
+
+    def _lista(self, texto):
+        condicoes, resto = self._condicoes(texto)
+        uf = None
+        estruturada = _RE_UF_ESTRUTURADA.search(resto)
+        nome_uf = _RE_UF_NOME.search(resto)
+        if estruturada:
+            uf = estruturada.group('uf').upper()
+            resto = _RE_UF_ESTRUTURADA.sub(' ', resto)
+        elif nome_uf:
+            uf = NOMES_UF[nome_uf.group('nome')]
+            resto = _RE_UF_NOME.sub(' ', resto)
+        else:
+            sigla = re.search(r'\b(?:em|no|na|de|do|da)\s+([a-z]{2})\b', resto)
+            if sigla and sigla.group(1).upper() in self._ranking_uf:
+                uf = sigla.group(1).upper()
+                resto = resto[:sigla.start()] + resto[sigla.end():]
+        palavras = set(re.findall(r'[a-z_]+', resto))
+        if not condicoes and uf is None and not palavras & set(PALAVRAS_LISTA):
+            return None
+
+        ordenar = _RE_ORDENAR.search(resto)
+        coluna = SINONIMOS_COLUNAS[ordenar.group('coluna')] if ordenar else 'IQE'
+        if ordenar:
+            resto = resto[:ordenar.start()] + resto[ordenar.end():]
+        else:
+            mencionadas = [SINONIMOS_COLUNAS[m] for m in re.findall(rf'\b(?:{_COLUNA})\b', resto)]
+            coluna = next((c for c in mencionadas if c != 'IQE'), 'IQE')
+        if coluna not in self.colunas:
+            raise LookupError(f"A coluna {coluna} não está na tabela do IQE.")
+        crescente = bool(palavras & set(PALAVRAS_CRESCENTE))
+        numero = _RE_N.search(resto)
+        n = min(int(numero.group('n') or numero.group('n2')), N_MAXIMO) if numero else N_PADRAO
+
+        # Ordem já pronta (ranking da UF, ranking nacional ou coluna ordenada) filtrada
+        # por uma máscara: a faixa mais seletiva vem do índice, as demais são conferidas
+        if coluna == 'IQE':
+            ordem = self._ranking_uf.get(uf, np.empty(0, dtype='int64')) if uf else self._ranking
+            ordem = ordem[::-1] if crescente else ordem
+        else:
+            ordem = self._ordem[coluna] if crescente else self._ordem[coluna][::-1]
+        if condicoes:
+            faixas = [self._faixa(*condicao) for condicao in condicoes]
+            k = int(np.argmin([len(faixa) for faixa in faixas]))
+            candidatos = faixas[k]
+            for j, (coluna_filtro, minimo, maximo, inclui_minimo, inclui_maximo) in enumerate(condicoes):
+                if j != k:
+                    valores = self.colunas[coluna_filtro][candidatos]
+                    candidatos = candidatos[((valores >= minimo) if inclui_minimo else (valores > minimo)) &
+                                            ((valores <= maximo) if inclui_maximo else (valores < maximo))]
+            mascara = np.zeros(len(self.codigos), dtype=bool)
+            mascara[candidatos] = True
+            if uf and coluna != 'IQE':
+                mascara &= self.ufs == uf
+            ordem = ordem[mascara[ordem]]
+        elif uf and coluna != 'IQE':
+            ordem = ordem[self.ufs[ordem] == uf]
+
+        colunas = list(dict.fromkeys([c for c, *_ in condicoes] + ([coluna] if coluna != 'IQE' else [])))
+        registros = [self._registro(i, colunas) for i in ordem[:n].tolist()]
+        return {'tipo': 'lista', 'texto': self._texto_lista(registros, len(ordem), coluna, crescente, uf, condicoes),
+                'municipios': registros, 'total': int(len(ordem))}
+
+    @staticmethod
+    def _texto_lista(registros, total, coluna, crescente, uf, condicoes):
+        if not registros:
+            return "Nenhum município atende a esses critérios."
+        descricao = f"{'Menores' if crescente else 'Maiores'} valores de {coluna}"
+        if uf:
+            descricao += f" em {uf}"
+        if condicoes:
+            descricao += ' com ' + ' e '.join(_descrever_condicao(*condicao) for condicao in condicoes)
+        linhas = [f"{descricao} ({len(registros)} de {total}):"]
+        for k, registro in enumerate(registros, 1):
+            extras = ''.join(f", {c} {_formatar(registro[c])}" for c in registro if c in iqe.VARIAVEIS_IQE)
+            linhas.append(f"{k}. {registro['nome_municipio']} ({registro['uf']}): IQE {_formatar(registro['IQE'])}"
+                          f"{extras} — {registro['posicao']}º no país")
+        return '\n'.join(linhas)
+
+
+def _formatar(valor, sinal=False):
+    if valor is None:
+        return 'sem dado'
+    return f"{valor:+.2f}" if sinal else f"{valor:.2f}"
+
+
+def _descrever_condicao(coluna, minimo, maximo, inclui_minimo, inclui_maximo):
+    if minimo == maximo:
+        return f"{coluna} = {minimo:g}"
+    if np.isinf(maximo):
+        return f"{coluna} {'>=' if inclui_minimo else '>'} {minimo:g}"
+    if np.isinf(minimo):
+        return f"{coluna} {'<=' if inclui_maximo else '<'} {maximo:g}"
+    return f"{coluna} entre {minimo:g} e {maximo:g}"
+
+
+def _erro(mensagem):
+    return {'tipo': 'erro', 'texto': mensagem, 'municipios': []}
+
+
+# ---------------------------------------------------------------------
+# Servidor HTTP local
+# ---------------------------------------------------------------------
+
+class ManipuladorConsultas(BaseHTTPRequestHandler):
+    """GET /consulta?q=<pergunta> -> JSON de MotorConsultas.consultar()."""
+
+    def __init__(self, *args, motor, **kwargs):
+        self.motor = motor
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/consulta':
+            self._responder(404, {'tipo': 'erro', 'texto': 'Use /consulta?q=<pergunta>.'})
+            return
+        pergunta = parse_qs(url.query).get('q', [''])[0]
+        if not pergunta.strip():
+            self._responder(400, _erro('Parâmetro q vazio.'))
+            return
+        self._responder(200, self.motor.consultar_json(pergunta))
+
+    def _responder(self, status, conteudo):
+        corpo = conteudo if isinstance(conteudo, bytes) else json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        # O site é aberto de outra origem (arquivo local ou outro servidor)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+def iniciar_servidor(motor, porta=PORTA_PADRAO, host='127.0.0.1'):
+    """
+    Sobe o endpoint de consultas em uma thread de fundo.
+
+    Returns:
+        tuple: (servidor, URL base). Use servidor.shutdown() para encerrá-lo.
+    """
+    servidor = ThreadingHTTPServer((host, porta), partial(ManipuladorConsultas, motor=motor))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f'http://{host}:{servidor.server_address[1]}'
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pipeline
+
+    # Uso: python consulta.py "top 5 IQE na Paraíba"   (responde e sai)
+    #      python consulta.py --servir [porta]          (endpoint em http://127.0.0.1:8765/consulta?q=...)
+    motor = MotorConsultas(pipeline.obter('iqe'))
+    if len(sys.argv) > 1 and sys.argv[1] == '--servir':
+        servidor, url = iniciar_servidor(motor, int(sys.argv[2]) if len(sys.argv) > 2 else PORTA_PADRAO)
+        print(f"Consultas em {url}/consulta?q=... (Ctrl+C para encerrar)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            servidor.shutdown()
+    else:
+        print(motor.consultar(' '.join(sys.argv[1:]) or 'top 5')['texto'])
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import brotli  # Opcional: sem ele, só as variantes .gz são geradas
+except ImportError:
+    brotli = None
+
+import arquivos
+import iqe
+
+
+# Dados do site, servidos como arquivos estáticos. Só indice.json tem nome fixo;
+# os demais levam o hash do conteúdo no nome e podem ser guardados em cache para sempre.
+DIRETORIO_SITE_DADOS = Path(__file__).parent.parent / 'site' / 'dados'
+ARQUIVO_TEXTOS = Path(__file__).parent.parent / 'data' / 'textos_municipios.json'
+ARQUIVO_INDICE = 'indice.json'
+VERSAO_EXPORTACAO = 2
+
+
+def _serializar(conteudo):
+    return json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _publicar(diretorio, prefixo, conteudo, estatisticas):
+    """
+    Grava conteudo como '<prefixo>.<hash>.json' e as variantes .gz e .br. Se o arquivo
+    já existe, o conteúdo é o mesmo e nada é regravado.
+
+    Returns:
+        str: Caminho relativo a diretorio.
+    """
+    dados = _serializar(conteudo)
+    relativo = f"{prefixo}.{hashlib.sha256(dados).hexdigest()[:16]}.json"
+    destino = diretorio / relativo
+    if destino.exists():
+        estatisticas['reaproveitados'] += 1
+        return relativo
+    arquivos.gravar_atomico(destino, dados)
+    # mtime=0: o .gz depende só do conteúdo
+    arquivos.gravar_atomico(destino.with_name(destino.name + '.gz'), gzip.compress(dados, compresslevel=9, mtime=0))
+    if brotli is not None:
+        arquivos.gravar_atomico(destino.with_name(destino.name + '.br'), brotli.compress(dados, quality=11))
+    estatisticas['gravados'] += 1
+    estatisticas['bytes'] += len(dados)
+    return relativo
+
+
+def carregar_textos(caminho=None):
+    """Textos de contexto e análise escritos pela equipe, pelo código IBGE do município (texto)."""
+    origem = Path(caminho) if caminho is not None else ARQUIVO_TEXTOS
+    if not origem.exists():
+        return {}
+    with open(origem, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _arredondar(valor, casas):
+    return None if valor is None or (isinstance(valor, float) and np.isnan(valor)) else round(float(valor), casas)
+
+
+def _significativos(valor, digitos=4):
+    # Retornos por real são da ordem de 1e-6: casas decimais fixas não servem
+    return None if valor is None or np.isnan(valor) else float(f'{valor:.{digitos}g}')
+
+
+def _referencias(diretorio):
+    """Arquivos referenciados pelo índice atual (resumo, detalhes e mapa), para a limpeza."""
+    indice = diretorio / ARQUIVO_INDICE
+    if not indice.exists():
+        return set()
+    try:
+        conteudo = json.loads(indice.read_text(encoding='utf-8'))
+        resumo = json.loads((diretorio / conteudo['resumo']).read_text(encoding='utf-8'))
+    except (OSError, ValueError, KeyError):
+        return set()
+    return {conteudo['resumo'], *resumo.get('detalhe', []), *([conteudo['mapa']] if conteudo.get('mapa') else [])}
+
+
+def _limpar(diretorio, manter):
+    removidos = 0
+    for arquivo in diretorio.rglob('*.json*'):
+        relativo = arquivo.relative_to(diretorio).as_posix()
+        base = relativo.removesuffix('.gz').removesuffix('.br')
+        if base != ARQUIVO_INDICE and base not in manter:
+            arquivo.unlink()
+            removidos += 1
+    return removidos
+
+
+def exportar_dados_site(df_iqe, df_recomendacoes=None, investimento_simulado=100000, textos=None,
+                        diretorio=None, limpar=True, mapa=None):
+    """
+    Exporta o IQE e o retorno do investimento para o site, no lugar do array iqeData
+    mantido à mão no index.html.
+
+    São gerados:
+      - indice.json: pequeno e de nome fixo, aponta para o resumo atual;
+      - resumo.<hash>.json: colunas compactas (código, nome, UF, IQE, posição,
+        retorno por real e o arquivo de detalhe de cada município), carregado primeiro;
+      - municipios/<código>.<hash>.json: variáveis e textos de um município,
+        carregado só quando ele é selecionado. Posição e IQE na escala de 1 a 10
+        dependem dos demais municípios e ficam só no resumo;
+      - mapa.<hash>.json: fronteiras simplificadas em TopoJSON (geometria.gerar_mapa()),
+        quando 'mapa' é dado.
+    Cada arquivo tem variantes .gz (e .br, com o pacote brotli) pré-comprimidas. Como
+    o nome vem do conteúdo, só os municípios que mudaram geram arquivos novos.
+
+    Args:
+        df_iqe (pd.DataFrame): Saída de iqe.calcular_iqe().
+        df_recomendacoes (pd.DataFrame, opcional): Saída de
+            investment_model.gerar_recomendacoes_investimento(), de onde vem o retorno por real.
+        investimento_simulado (float): Investimento usado nas recomendações.
+        textos (dict, opcional): Código IBGE (str) -> {'contexto', 'analise'}. Padrão: ARQUIVO_TEXTOS.
+        diretorio (str ou Path, opcional): Destino. Padrão: site/dados.
+        limpar (bool): Remove os arquivos que não são referenciados nem pelo índice
+            novo nem pelo anterior (este fica para páginas abertas antes da exportação).
+        mapa (dict, opcional): Topologia de geometria.gerar_mapa().
+
+    Returns:
+        dict: Estatísticas da exportação (arquivos gravados, reaproveitados e removidos).
+    """
+    diretorio = Path(diretorio) if diretorio is not None else DIRETORIO_SITE_DADOS
+    textos = carregar_textos() if textos is None else textos
+    estatisticas = {'gravados': 0, 'reaproveitados': 0, 'bytes': 0, 'removidos': 0}
+    anteriores = _referencias(diretorio)
+
+    df = df_iqe.sort_values('IQE', ascending=False).reset_index(drop=True)
+    df['posicao'] = np.arange(1, len(df) + 1)
+    retorno = {}
+    if df_recomendacoes is not None and not df_recomendacoes.empty:
+        retorno = dict(zip(df_recomendacoes['cod_municipio'],
+                           df_recomendacoes['Melhoria_Estimada_IQE'] / investimento_simulado))
+
+    resumo = {'cod': [], 'nome': [], 'uf': [], 'iqe': [], 'posicao': [], 'retorno_por_real': [], 'detalhe': []}
+    for linha in df.itertuples(index=False):
+        cod = int(linha.cod_municipio)
+        texto = textos.get(str(cod), {})
+        # Só dados do próprio município: mudar outro não regrava este arquivo
+        detalhe = {
+            'cod': cod,
+            'nome': linha.nome_municipio,
+            'uf': str(linha.ds_uf),
+            'variaveis': {variavel: _arredondar(getattr(linha, variavel), 4) for variavel in iqe.VARIAVEIS_IQE},
+            'contexto': texto.get('contexto'),
+            'analise': texto.get('analise'),
+        }
+        resumo['cod'].append(cod)
+        resumo['nome'].append(detalhe['nome'])
+        resumo['uf'].append(detalhe['uf'])
+        resumo['iqe'].append(_arredondar(linha.IQE, 2))
+        resumo['posicao'].append(int(linha.posicao))
+        resumo['retorno_por_real'].append(_significativos(retorno.get(cod)))
+        resumo['detalhe'].append(_publicar(diretorio, f'municipios/{cod}', detalhe, estatisticas))
+
+    resumo_relativo = _publicar(diretorio, 'resumo', resumo, estatisticas)
+    indice = {'versao': VERSAO_EXPORTACAO, 'gerado_em': int(time.time()), 'resumo': resumo_relativo,
+              'municipios': len(df)}
+    if mapa is not None:
+        indice['mapa'] = _publicar(diretorio, 'mapa', mapa, estatisticas)
+    arquivos.gravar_atomico(diretorio / ARQUIVO_INDICE, _serializar(indice))
+
+    if limpar:
+        atuais = {resumo_relativo, *resumo['detalhe'], *([indice['mapa']] if mapa is not None else [])}
+        estatisticas['removidos'] = _limpar(diretorio, anteriores | atuais)
+    print(f"-> Dados do site exportados em {diretorio}: {estatisticas['gravados']} arquivo(s) novo(s) "
+          f"({estatisticas['bytes'] / 1e3:.1f} KB), {estatisticas['reaproveitados']} sem mudança, "
+          f"{estatisticas['removidos']} removido(s).")
+    return estatisticas
+
+
+if __name__ == "__main__":
+    import pipeline
+    pipeline.obter('site')
@@ -1,72 +1,135 @@
+import hashlib
+import re
 import requests
 import zipfile
-import io
+import openpyxl
 import pandas as pd
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import numpy as np
 import time
+import threading
+from contextlib import nullcontext
 from pathlib import Path
+import arquivos
+import cache
+import instrumentacao
+import staging
 
 
 #Dados do Instituto Alpargatas (IA)
-def ler_ia():
-    data_dir = Path(__file__).parent.parent / 'data'
-    file_path = data_dir / 'Projetos_de_Atuac807a771o_-_IA_-_2020_a_2025.xlsx'
-    
-    anos_atuacao = ['2020', '2021', '2022', '2023', '2024']
+ARQUIVO_IA = Path(__file__).parent.parent / 'data' / 'Projetos_de_Atuac807a771o_-_IA_-_2020_a_2025.xlsx'
+# Incrementar quando a leitura das abas do IA mudar, para descartar o cache em Parquet
+VERSAO_LEITOR_IA = 1
+
+
+def _nomes_colunas_ia(cabecalho):
+    """Reproduz os nomes de coluna do pandas: vazias viram 'Unnamed: i' e repetidas ganham '.1', '.2'..."""
+    nomes, vistos = [], {}
+    for i, valor in enumerate(cabecalho):
+        nome = f"Unnamed: {i}" if valor is None else valor
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _mapear_colunas_ia(colunas):
+    """Mapeia os cabeçalhos de uma aba do IA para os nomes padronizados."""
+    col_map = {}
+    for col in colunas:
+        col_norm = str(col).strip().lower().replace("\n", " ").replace("  ", " ")
+        if "cidade" in col_norm: col_map["ds_mun"] = col
+        elif col_norm in ["uf", "estado"]: col_map["sg_uf"] = col
+        elif "projeto" in col_norm and "nº" in col_norm: col_map["nprojetos"] = col
+        elif "institui" in col_norm: col_map["ninstituicoes"] = col
+        elif "beneficiado" in col_norm: col_map["nbeneficiados"] = col
+
+    # Lógica de fallback otimizada para colunas não encontradas
+    # (Caso os nomes não batam exatamente com o esperado)
+    fallback_map = {
+        "nprojetos": "projeto",
+        "ninstituicoes": "institui",
+        "nbeneficiados": "beneficiado"
+    }
+    for key, keyword in fallback_map.items():
+        if key not in col_map:
+            cols_encontradas = [c for c in colunas if keyword in str(c).lower()]
+            if cols_encontradas:
+                col_map[key] = cols_encontradas[-1] # Pega a última coluna correspondente
+    return col_map
+
+
+def _ler_abas_ia(file_path):
+    """
+    Abre a planilha do IA uma única vez (modo somente leitura, em streaming) e
+    extrai todas as abas de ano (nomes com 4 dígitos, ex.: '2024') numa só passada.
+    """
     lista_dataframes = []
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        anos_atuacao = sorted(nome for nome in wb.sheetnames if re.fullmatch(r"\d{4}", nome.strip()))
+        print(f"Abas de ano encontradas na planilha do IA: {anos_atuacao}")
+        for ano in anos_atuacao:
+            print(f"\nProcessando dados do ano: {ano}...")
+            # As 5 primeiras linhas são o título da aba; a 6ª é o cabeçalho
+            linhas = wb[ano].iter_rows(min_row=6, values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                print(f"AVISO: A planilha para o ano '{ano}' está vazia. Pulando...")
+                continue
+            colunas = _nomes_colunas_ia(cabecalho)
+            df = pd.DataFrame([linha[:len(colunas)] for linha in linhas], columns=colunas)
+
+            col_map = _mapear_colunas_ia(colunas)
+
+            # Verifica se as colunas essenciais foram mapeadas
+            if "ds_mun" not in col_map or "sg_uf" not in col_map:
+                print(f"ERRO: Não foi possível mapear as colunas 'cidade' ou 'uf' para o ano {ano}. Pulando...")
+                continue
+
+            # Seleciona apenas as colunas mapeadas
+            df_sel = df[list(col_map.values())].copy()
+            df_sel.columns = list(col_map.keys())
+
+            # Adiciona o ano e faz a limpeza
+            df_sel["ano_atuacao"] = int(ano)
+            df_sel = df_sel.dropna(subset=["ds_mun", "sg_uf"], how="any")
+            df_sel = df_sel[~df_sel["ds_mun"].astype(str).str.contains("VARIAÇÃO|Obs|TOTAL", case=False, na=False)]
+            
+            if not df_sel.empty:
+                lista_dataframes.append(df_sel)
+                print(f"Dados de {ano} processados com sucesso. {len(df_sel)} registros adicionados.")
+            else:
+                print(f"AVISO: Nenhum registro válido encontrado para o ano {ano} após a limpeza.")
+    finally:
+        wb.close()
+    return lista_dataframes
 
-    for ano in anos_atuacao:
-        print(f"\nProcessando dados do ano: {ano}...")
-        try:
-            df = pd.read_excel(file_path, sheet_name=ano, skiprows=5)
-        except ValueError:
-            print(f"AVISO: A planilha para o ano '{ano}' não foi encontrada. Pulando...")
-            continue # Pula para o próximo ano se a aba não existir
-
-        # Mapeamento dinâmico das colunas
-        col_map = {}
-        for col in df.columns:
-            col_norm = str(col).strip().lower().replace("\n", " ").replace("  ", " ")
-            if "cidade" in col_norm: col_map["ds_mun"] = col
-            elif col_norm in ["uf", "estado"]: col_map["sg_uf"] = col
-            elif "projeto" in col_norm and "nº" in col_norm: col_map["nprojetos"] = col
-            elif "institui" in col_norm: col_map["ninstituicoes"] = col
-            elif "beneficiado" in col_norm: col_map["nbeneficiados"] = col
-
-        # Lógica de fallback otimizada para colunas não encontradas
-        # (Caso os nomes não batam exatamente com o esperado)
-        fallback_map = {
-            "nprojetos": "projeto",
-            "ninstituicoes": "institui",
-            "nbeneficiados": "beneficiado"
-        }
-        for key, keyword in fallback_map.items():
-            if key not in col_map:
-                cols_encontradas = [c for c in df.columns if keyword in str(c).lower()]
-                if cols_encontradas:
-                    col_map[key] = cols_encontradas[-1] # Pega a última coluna correspondente
-
-        # Verifica se as colunas essenciais foram mapeadas
-        if "ds_mun" not in col_map or "sg_uf" not in col_map:
-            print(f"ERRO: Não foi possível mapear as colunas 'cidade' ou 'uf' para o ano {ano}. Pulando...")
-            continue
-
-        # Seleciona apenas as colunas mapeadas
-        df_sel = df[list(col_map.values())].copy()
-        df_sel.columns = list(col_map.keys())
-
-        # Adiciona o ano e faz a limpeza
-        df_sel["ano_atuacao"] = int(ano)
-        df_sel = df_sel.dropna(subset=["ds_mun", "sg_uf"], how="any")
-        df_sel = df_sel[~df_sel["ds_mun"].astype(str).str.contains("VARIAÇÃO|Obs|TOTAL", case=False, na=False)]
-        
-        if not df_sel.empty:
-            lista_dataframes.append(df_sel)
-            print(f"Dados de {ano} processados com sucesso. {len(df_sel)} registros adicionados.")
-        else:
-            print(f"AVISO: Nenhum registro válido encontrado para o ano {ano} após a limpeza.")
+
+@instrumentacao.instrumentar('extract')
+def ler_ia(file_path=ARQUIVO_IA):
+    """
+    Lê as abas anuais da planilha de projetos do Instituto Alpargatas (IA).
+
+    O resultado fica em cache (Parquet) indexado pelo hash do arquivo e por
+    VERSAO_LEITOR_IA: enquanto nem a planilha nem o leitor mudarem, ela não é aberta novamente. Novas abas de ano (ex.: '2026')
+    são incluídas automaticamente.
+
+    Returns:
+        pd.DataFrame: Município, UF, nº de projetos, instituições e beneficiados por ano de atuação.
+    """
+    file_path = Path(file_path)
+    sha256 = hashlib.sha256(file_path.read_bytes()).hexdigest()
+    arquivo_cache = cache.DIRETORIO_CACHE / 'ia' / f'{sha256}.v{VERSAO_LEITOR_IA}.parquet'
+    if arquivo_cache.exists():
+        print(f"Planilha do IA sem alterações ({sha256[:12]}). Usando dados já processados.")
+        return pd.read_parquet(arquivo_cache)
+
+    lista_dataframes = _ler_abas_ia(file_path)
 
     # A concatenação e o return devem estar FORA do loop
     if not lista_dataframes:
@@ -75,26 +138,59 @@ def ler_ia():
 
     print("\nConcatenando todos os dados...")
     df_ia = pd.concat(lista_dataframes, ignore_index=True)
+    with arquivos.escrita_atomica(arquivo_cache) as temporario:
+        df_ia.to_parquet(temporario, index=False)
+    staging.salvar('ia', df_ia)
     return df_ia
 
 #Dados da Divisão Territorial Brasileira - IBGE
-def ler_dtb():
+
+# URLs e caminhos de cada edição da DTB. Para incluir um novo ano basta acrescentá-lo aqui.
+ARQUIVOS_DTB = [
+    {"ano": 2020, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2020/DTB_2020_v2.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
+    {"ano": 2021, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2021/DTB_2021.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
+    {"ano": 2022, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2022/DTB_2022.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
+    {"ano": 2023, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2023/DTB_2023.zip", "caminho_interno_zip": "DTB_2023/RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
+    {"ano": 2024, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2024/DTB_2024.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_2024_MUNICIPIOS.xls"}
+]
+
+
+def normalizar_nome(serie):
+    """
+    Normaliza nomes de municípios para comparação entre fontes: caixa alta,
+    sem acentos, sem pontuação e sem espaços (ex.: 'Ingá' -> 'INGA',
+    "Olho d'Água" -> 'OLHODAGUA').
+
+    Args:
+        serie (pd.Series): Nomes de municípios.
+
+    Returns:
+        pd.Series: Nomes normalizados.
+    """
+    return (serie.str.upper()
+                 .str.replace("- MIXING CENTER", "", regex=False)
+                 .str.normalize('NFKD')
+                 .str.encode('ascii', errors='ignore')
+                 .str.decode('ascii')
+                 .str.replace("[-.!?'`()*]", "", regex=True)
+                 .str.strip()
+                 .str.replace(" ", "", regex=False))
+
+
+@instrumentacao.instrumentar('extract')
+def ler_dtb(anos=None):
     """
     Baixa, extrai, trata e consolida os dados da Divisão Territorial Brasileira (DTB)
     do IBGE para os anos de 2020 a 2024.
+
+    Args:
+        anos (list, opcional): Edições da DTB a carregar. Por padrão, todas as de ARQUIVOS_DTB.
     
     Retorna:
         pandas.DataFrame: Um único DataFrame contendo os dados de todos os anos.
                           Retorna um DataFrame vazio se nenhum dado for carregado.
     """
-    # 2. Organização dos Dados: URLs e Caminhos (versão corrigida por você)
-    urls_e_arquivos = [
-        {"ano": 2020, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2020/DTB_2020_v2.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
-        {"ano": 2021, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2021/DTB_2021.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
-        {"ano": 2022, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2022/DTB_2022.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
-        {"ano": 2023, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2023/DTB_2023.zip", "caminho_interno_zip": "DTB_2023/RELATORIO_DTB_BRASIL_MUNICIPIO.xls"},
-        {"ano": 2024, "url": "https://geoftp.ibge.gov.br/organizacao_do_territorio/estrutura_territorial/divisao_territorial/2024/DTB_2024.zip", "caminho_interno_zip": "RELATORIO_DTB_BRASIL_2024_MUNICIPIOS.xls"}
-    ]
+    urls_e_arquivos = [info for info in ARQUIVOS_DTB if anos is None or info["ano"] in anos]
 
     # Lista para guardar os dataframes de cada ano
     lista_dfs = []
@@ -114,10 +210,9 @@ def ler_dtb():
             skip = 6 if ano in [2024, 2023, 2022] else 0
             
             # Download e Leitura
-            response = requests.get(url)
-            response.raise_for_status()
+            caminho_zip = cache.baixar(url, fonte=f'dtb_{ano}')
 
-            with zipfile.ZipFile(io.BytesIO(response.content)) as z:
+            with zipfile.ZipFile(caminho_zip) as z:
                 with z.open(caminho_arquivo) as arquivo_excel:
                     print(f"Lendo e tratando o arquivo '{caminho_arquivo}'...")
                     df = pd.read_excel(arquivo_excel, skiprows=skip, usecols=colunas_para_usar)
@@ -125,11 +220,7 @@ def ler_dtb():
                     # Tratamento e Limpeza
                     df.columns = ['id_uf', 'ds_uf', 'ds_rgi', 'id_mundv', 'ds_mun']
                     df = df.drop_duplicates(subset=['id_mundv'])
-                    df['ds_formatada'] = (df['ds_mun'].str.upper()
-                                                     .str.replace("[-.!?'`()]", "", regex=True)
-                                                     .str.replace("- MIXING CENTER", "", regex=False)
-                                                     .str.strip()
-                                                     .str.replace(" ", "", regex=False))
+                    df['ds_formatada'] = normalizar_nome(df['ds_mun'])
                     df['ano'] = ano
                     
                     # Adiciona o dataframe tratado à lista
@@ -146,51 +237,121 @@ def ler_dtb():
     
     print("\n--- Processo finalizado! Consolidando todos os dados... ---")
     df_dtb = pd.concat(lista_dfs, ignore_index=True)
+    if anos is None:
+        # Só a DTB completa vai para o staging; cargas parciais não sobrescrevem o arquivo
+        staging.salvar('dtb', df_dtb, ordenar_por=['id_uf', 'id_mundv'])
     
     return df_dtb
 
-#Nota média de Português e Matemática do SAEB (INEP)
-def pt_mt_saeb():
+#Planilha de divulgação do IDEB - anos iniciais (INEP), compartilhada por SAEB e aprovação
+EDICAO_IDEB = 2023
+URL_IDEB_ANOS_INICIAIS = 'https://download.inep.gov.br/ideb/resultados/divulgacao_anos_iniciais_municipios_2023.zip'
+CAMINHO_IDEB_NO_ZIP = 'divulgacao_anos_iniciais_municipios_2023/divulgacao_anos_iniciais_municipios_2023.xlsx'
 
-    print("Iniciando Módulo: Extração da média de Português e Matemática do SAEB (INEP)")
+# Posição de cada coluna usada na planilha do IDEB. Todas as colunas registradas aqui
+# são lidas na mesma passada; para usar um novo indicador do IDEB basta acrescentá-lo.
+COLUNAS_IDEB = {
+    'cod_municipio': 1,
+    'nome_municipio': 2,
+    'taxa_aprovacao': 67,   # Taxa de aprovação
+    'nota_saeb': 103,       # Nota Média Padronizada (Português e Matemática)
+}
+
+# Séries históricas da mesma planilha (edições anteriores do IDEB), localizadas pelo
+# nome no cabeçalho e lidas na mesma passada das colunas registradas acima
+PADRAO_SERIE_IDEB = re.compile(r'^VL_(APROVACAO_\d{4}_SI_4|NOTA_MEDIA_\d{4})$')
+
+# Planilhas já lidas, indexadas pelo arquivo do cache (endereçado pelo conteúdo)
+_planilhas_ideb = {}
+# Quando SAEB e aprovação são extraídos em paralelo, um espera a leitura do outro
+_trava_ideb = threading.Lock()
+
+
+@instrumentacao.instrumentar('extract')
+def ler_colunas_ideb(colunas):
+    """
+    Retorna colunas da planilha de divulgação do IDEB (anos iniciais, 2023).
+
+    O download passa pelo cache e a planilha é lida uma única vez por arquivo,
+    com todas as colunas registradas em COLUNAS_IDEB e as da série histórica
+    (PADRAO_SERIE_IDEB); chamadas seguintes apenas recortam as colunas pedidas do
+    resultado já em memória.
+
+    Args:
+        colunas (list): Chaves de COLUNAS_IDEB ou nomes de colunas da série histórica
+            (ex.: 'VL_NOTA_MEDIA_2019').
+
+    Returns:
+        pd.DataFrame: Código e nome do município seguidos das colunas pedidas.
 
-    url_zip = 'https://download.inep.gov.br/ideb/resultados/divulgacao_anos_iniciais_municipios_2023.zip'
-    caminho_completo_no_zip = 'divulgacao_anos_iniciais_municipios_2023/divulgacao_anos_iniciais_municipios_2023.xlsx'
-    # Colunas: Código do Município, Nome do Município, Nota Média Padronizada
-    colunas_para_usar = [1, 2, 103]
-    linhas_a_pular = 9
-    valores_na = ['-', '--']
+    Raises:
+        KeyError: Se alguma coluna pedida não está na planilha.
+    """
+    with _trava_ideb:
+        return _ler_planilha_ideb(_baixar_ideb(), colunas)
+
+
+def _baixar_ideb():
     session = requests.Session()
     retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
     adapter = HTTPAdapter(max_retries=retry)
     session.mount('https://', adapter)
-    
-    print(f"\nIniciando download do arquivo ZIP do SAEB de: {url_zip}")
+
+    print(f"\nIniciando download do arquivo ZIP do IDEB de: {URL_IDEB_ANOS_INICIAIS}")
+    caminho_zip = cache.baixar(URL_IDEB_ANOS_INICIAIS, fonte='ideb_anos_iniciais', session=session, timeout=30)
+    print("Download concluído com sucesso.")
+    return caminho_zip
+
+
+def _ler_planilha_ideb(caminho_zip, colunas):
+    pedidas = ['cod_municipio', 'nome_municipio'] + list(colunas)
+    df_planilha = _planilhas_ideb.get(caminho_zip)
+    if df_planilha is None:
+        # O leitor do openpyxl percorre todas as células de cada linha mesmo com
+        # usecols: ler a planilha inteira uma vez custa o mesmo que ler só algumas colunas
+        with zipfile.ZipFile(caminho_zip) as z:
+            with z.open(CAMINHO_IDEB_NO_ZIP) as arquivo_excel:
+                print("Lendo dados da planilha do IDEB...")
+                df_bruto = pd.read_excel(arquivo_excel, skiprows=9, na_values=['-', '--'])
+        # Colunas registradas pela posição e séries históricas pelo nome, resolvidas uma vez
+        nomes = list(COLUNAS_IDEB)
+        posicoes = [COLUNAS_IDEB[nome] for nome in nomes]
+        for posicao, cabecalho in enumerate(df_bruto.columns):
+            if PADRAO_SERIE_IDEB.match(str(cabecalho)) and posicao not in posicoes:
+                nomes.append(str(cabecalho))
+                posicoes.append(posicao)
+        df_planilha = df_bruto.iloc[:, posicoes].set_axis(nomes, axis=1)
+        _planilhas_ideb[caminho_zip] = df_planilha
+        print("Leitura da planilha do IDEB concluída.")
+    else:
+        print("Planilha do IDEB já lida nesta execução. Reaproveitando os dados.")
+
+    ausentes = [coluna for coluna in pedidas if coluna not in df_planilha.columns]
+    if ausentes:
+        raise KeyError(f"Colunas ausentes na planilha do IDEB: {ausentes}")
+    return df_planilha[pedidas].copy()
+
+
+#Nota média de Português e Matemática do SAEB (INEP)
+@instrumentacao.instrumentar('extract')
+def pt_mt_saeb():
+
+    print("Iniciando Módulo: Extração da média de Português e Matemática do SAEB (INEP)")
+
     try:
-        response = session.get(url_zip, timeout=30)
-        response.raise_for_status()
-        print("Download concluído com sucesso.")
-
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            with z.open(caminho_completo_no_zip) as arquivo_excel:
-                print("Lendo e transformando dados da planilha...")
-                df_raw = pd.read_excel(
-                    arquivo_excel, 
-                    skiprows=linhas_a_pular, 
-                    usecols=colunas_para_usar, 
-                    na_values=valores_na,
-                    names=['Codigo_Municipio', 'Nome_Municipio', 'Nota_SAEB'] 
-                )
-                print("Leitura de dados brutos concluída.")
-
-                # --- ETAPA DE AGREGAÇÃO DENTRO DA FUNÇÃO ---
-                print("Agregando dados por município...")
-                df_agregado = df_raw.groupby(['Codigo_Municipio', 'Nome_Municipio']).agg(
-                    Nota_Media_SAEB=('Nota_SAEB', 'mean')
-                ).reset_index()
-                print("Agregação concluída com sucesso!")
-                
-                return df_agregado
+        df_raw = ler_colunas_ideb(['nota_saeb'])
+        df_raw.columns = ['Codigo_Municipio', 'Nome_Municipio', 'Nota_SAEB']
+        print("Leitura de dados brutos concluída.")
+
+        # --- ETAPA DE AGREGAÇÃO DENTRO DA FUNÇÃO ---
+        print("Agregando dados por município...")
+        df_agregado = df_raw.groupby(['Codigo_Municipio', 'Nome_Municipio']).agg(
+            Nota_Media_SAEB=('Nota_SAEB', 'mean')
+        ).reset_index()
+        print("Agregação concluída com sucesso!")
+        staging.salvar('saeb', df_agregado)
+        
+        return df_agregado
 
     except requests.exceptions.RequestException as e:
         print(f"ERRO: Falha no download do arquivo após múltiplas tentativas. {e}")
@@ -201,58 +362,32 @@ def pt_mt_saeb():
     
 
 #Taxa de aprovação do IDEB (INEP)
+@instrumentacao.instrumentar('extract')
 def aprov_ideb():
     print("Iniciando Módulo: Extração e Agregação de Dados do IDEB (INEP)")
 
-    url_zip = 'https://download.inep.gov.br/ideb/resultados/divulgacao_anos_iniciais_municipios_2023.zip'
-    caminho_completo_no_zip = 'divulgacao_anos_iniciais_municipios_2023/divulgacao_anos_iniciais_municipios_2023.xlsx'
-    
-    colunas_para_usar = [1, 2, 67]
-    linhas_a_pular = 9
-    valores_na = ['-', '--']
-    
-    session = requests.Session()
-    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('https://', adapter)
-    
-    print(f"\nIniciando download do arquivo ZIP do IDEB de: {url_zip}")
     try:
-        response = session.get(url_zip, timeout=30)
-        response.raise_for_status()
-        print("Download concluído com sucesso.")
-
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            with z.open(caminho_completo_no_zip) as arquivo_excel:
-                print("Lendo dados da planilha...")
-                df_ideb = pd.read_excel(
-                    arquivo_excel, 
-                    skiprows=linhas_a_pular, 
-                    usecols=colunas_para_usar, 
-                    na_values=valores_na
-                )
-                print("Leitura de dados concluída. Iniciando agregação...")
-
-                # --- ETAPA DE AGREGAÇÃO INTEGRADA ---
-                
-                # 1. Renomear as colunas para facilitar o manuseio
-                df_ideb.columns = ['cod_municipio', 'nome_municipio', 'taxa_aprovacao']
+        df_ideb = ler_colunas_ideb(['taxa_aprovacao'])
+        print("Leitura de dados concluída. Iniciando agregação...")
 
-                # 2. Garantir que a coluna de taxa de aprovação seja numérica
-                df_ideb['taxa_aprovacao'] = pd.to_numeric(df_ideb['taxa_aprovacao'], errors='coerce')
+        # --- ETAPA DE AGREGAÇÃO INTEGRADA ---
 
-                # 3. Remover linhas onde a taxa de aprovação seja nula (NaN)
-                df_ideb.dropna(subset=['taxa_aprovacao'], inplace=True)
+        # 1. Garantir que a coluna de taxa de aprovação seja numérica
+        df_ideb['taxa_aprovacao'] = pd.to_numeric(df_ideb['taxa_aprovacao'], errors='coerce')
 
-                # 4. Agrupar por código e nome do município e calcular a média
-                df_agregado = df_ideb.groupby(['cod_municipio', 'nome_municipio'])['taxa_aprovacao'].mean()
+        # 2. Remover linhas onde a taxa de aprovação seja nula (NaN)
+        df_ideb.dropna(subset=['taxa_aprovacao'], inplace=True)
 
-                # 5. Transformar de volta em DataFrame, arredondar e retornar
-                df_agregado = df_agregado.reset_index()
-                df_agregado['taxa_aprovacao'] = df_agregado['taxa_aprovacao'].round(2)
-                
-                print("Agregação por município concluída com sucesso!")
-                return df_agregado
+        # 3. Agrupar por código e nome do município e calcular a média
+        df_agregado = df_ideb.groupby(['cod_municipio', 'nome_municipio'])['taxa_aprovacao'].mean()
+
+        # 4. Transformar de volta em DataFrame, arredondar e retornar
+        df_agregado = df_agregado.reset_index()
+        df_agregado['taxa_aprovacao'] = df_agregado['taxa_aprovacao'].round(2)
+        
+        print("Agregação por município concluída com sucesso!")
+        staging.salvar('aprovacao', df_agregado)
+        return df_agregado
                 
     except requests.exceptions.RequestException as e:
         print(f"ERRO: Falha no download do arquivo após múltiplas tentativas. {e}")
@@ -262,12 +397,156 @@ def aprov_ideb():
         return pd.DataFrame()
     
 
+@instrumentacao.instrumentar('extract')
+def ler_ideb_edicao(ano):
+    """
+    Taxa de aprovação e nota SAEB de uma edição do IDEB, por município.
+
+    A edição EDICAO_IDEB usa exatamente pt_mt_saeb() e aprov_ideb(). A planilha de
+    divulgação também traz a série histórica, e as edições anteriores são lidas
+    pelas colunas VL_APROVACAO_<ano>_SI_4 e VL_NOTA_MEDIA_<ano>, com a mesma agregação.
+
+    Args:
+        ano (int): Edição do IDEB (bienal: 2019, 2021, 2023...).
+
+    Returns:
+        pd.DataFrame: cod_municipio, nome_municipio, taxa_aprovacao e nota_saeb,
+                      ou um DataFrame vazio se a edição não estiver na planilha.
+    """
+    if ano == EDICAO_IDEB:
+        df_saeb = pt_mt_saeb().rename(columns={'Codigo_Municipio': 'cod_municipio', 'Nome_Municipio': 'nome_municipio',
+                                                'Nota_Media_SAEB': 'nota_saeb'})
+        df_aprovacao = aprov_ideb()
+        if df_saeb.empty or df_aprovacao.empty:
+            return pd.DataFrame()
+        return pd.merge(df_aprovacao, df_saeb.drop(columns='nome_municipio'), on='cod_municipio', how='outer')
+
+    # Mesma leitura memoizada de pt_mt_saeb() e aprov_ideb(): a planilha não é relida por edição
+    colunas = {f'VL_APROVACAO_{ano}_SI_4': 'taxa_aprovacao', f'VL_NOTA_MEDIA_{ano}': 'nota_saeb'}
+    try:
+        df = ler_colunas_ideb(list(colunas))
+    except requests.exceptions.RequestException as e:
+        print(f"ERRO: Falha no download do arquivo do IDEB. {e}")
+        return pd.DataFrame()
+    except KeyError:
+        print(f"AVISO: A edição {ano} do IDEB não está na planilha de divulgação.")
+        return pd.DataFrame()
+
+    df = df.rename(columns=colunas)
+    df['taxa_aprovacao'] = pd.to_numeric(df['taxa_aprovacao'], errors='coerce')
+    df['nota_saeb'] = pd.to_numeric(df['nota_saeb'], errors='coerce')
+    chaves = ['cod_municipio', 'nome_municipio']
+    aprovacao = df.dropna(subset=['taxa_aprovacao']).groupby(chaves)['taxa_aprovacao'].mean().round(2)
+    nota = df.groupby(chaves)['nota_saeb'].mean()
+    return pd.concat([aprovacao, nota], axis=1).reset_index()
+
+
 #Índice de Qualidade da Infraestrutura Escolar (IQIE) - Censo Escolar (INEP)
-def gerar_indice_infraestrutura_municipal():
+
+# Indicadores de "inexistência", invertidos para "existência" (1 = Sim, 0 = Não)
+MAPA_INDICADORES_NEGATIVOS = {
+    'IN_AGUA_INEXISTENTE': 'AGUA_EXISTENTE',
+    'IN_ENERGIA_INEXISTENTE': 'ENERGIA_EXISTENTE',
+    'IN_ESGOTO_INEXISTENTE': 'ESGOTO_EXISTENTE',
+    'IN_TRATAMENTO_LIXO_INEXISTENTE': 'LIXO_TRATADO_EXISTENTE',
+    'IN_ACESSIBILIDADE_INEXISTENTE': 'ACESSIBILIDADE_EXISTENTE'
+}
+
+# Indicadores que já são positivos, apenas renomeados para maior clareza
+MAPA_INDICADORES_POSITIVOS = {
+    'IN_BANHEIRO': 'BANHEIRO_EXISTENTE', 'IN_BIBLIOTECA': 'BIBLIOTECA_EXISTENTE',
+    'IN_LABORATORIO_CIENCIAS': 'LAB_CIENCIAS_EXISTENTE', 'IN_LABORATORIO_INFORMATICA': 'LAB_INFORMATICA_EXISTENTE',
+    'IN_QUADRA_ESPORTES': 'QUADRA_ESPORTES_EXISTENTE', 'IN_BANDA_LARGA': 'BANDA_LARGA_EXISTENTE'
+}
+
+CHAVES_MUNICIPIO_CENSO = ['SG_UF', 'CO_MUNICIPIO', 'NO_MUNICIPIO']
+
+ANO_CENSO = 2024
+URL_CENSO_ESCOLAR_MODELO = 'https://download.inep.gov.br/dados_abertos/microdados_censo_escolar_{ano}.zip'
+CAMINHO_CENSO_NO_ZIP_MODELO = 'microdados_censo_escolar_{ano}/dados/microdados_ed_basica_{ano}.csv'
+URL_CENSO_ESCOLAR = URL_CENSO_ESCOLAR_MODELO.format(ano=ANO_CENSO)
+CAMINHO_CENSO_NO_ZIP = CAMINHO_CENSO_NO_ZIP_MODELO.format(ano=ANO_CENSO)
+
+
+@instrumentacao.instrumentar('extract')
+def _agregar_censo_em_blocos(csv_file, colunas, tamanho_bloco, escritor=None):
+    """
+    Lê o CSV do Censo Escolar em blocos e acumula, por município, somas e contagens
+    de cada indicador. O uso de memória fica limitado ao tamanho do bloco, e não ao
+    tamanho do arquivo. Se um escritor de staging for informado, as linhas de
+    escolas de cada bloco também são gravadas em Parquet.
+
+    Returns:
+        pd.DataFrame: Uma linha por município com a média de cada indicador,
+                      as somas de salas e a contagem de escolas, equivalente ao
+                      groupby feito sobre o arquivo inteiro.
+    """
+    # Tipos compactos: indicadores em Int8 (aceita valores ausentes) e UF/nome como categoria
+    tipos = {col: 'Int8' for col in list(MAPA_INDICADORES_NEGATIVOS) + list(MAPA_INDICADORES_POSITIVOS)}
+    tipos.update({
+        'SG_UF': 'category', 'NO_MUNICIPIO': 'category', 'CO_MUNICIPIO': 'Int32',
+        'CO_ENTIDADE': 'Int32', 'QT_SALAS_UTILIZA_CLIMATIZADAS': 'Int32', 'QT_SALAS_UTILIZADAS': 'Int32'
+    })
+
+    parciais = []
+    total_escolas = 0
+    leitor = pd.read_csv(
+        csv_file, sep=';', encoding='latin-1', usecols=colunas,
+        dtype=tipos, chunksize=tamanho_bloco
+    )
+    for bloco in leitor:
+        total_escolas += len(bloco)
+        if escritor is not None:
+            escritor.escrever(bloco)
+        acumulado = bloco[CHAVES_MUNICIPIO_CENSO].copy()
+        for col_original, col_nova in MAPA_INDICADORES_NEGATIVOS.items():
+            # Na inversão, só valores 0 e 1 são válidos (os demais viram NaN na média)
+            acumulado[f'{col_nova}_soma'] = (bloco[col_original] == 0).fillna(False).astype('int32')
+            acumulado[f'{col_nova}_n'] = bloco[col_original].isin([0, 1]).astype('int32')
+        for col_original, col_nova in MAPA_INDICADORES_POSITIVOS.items():
+            acumulado[f'{col_nova}_soma'] = bloco[col_original].fillna(0).astype('int32')
+            acumulado[f'{col_nova}_n'] = bloco[col_original].notna().astype('int32')
+        acumulado['QT_SALAS_UTILIZA_CLIMATIZADAS'] = bloco['QT_SALAS_UTILIZA_CLIMATIZADAS'].fillna(0).astype('int64')
+        acumulado['QT_SALAS_UTILIZADAS'] = bloco['QT_SALAS_UTILIZADAS'].fillna(0).astype('int64')
+        acumulado['CO_ENTIDADE'] = bloco['CO_ENTIDADE'].notna().astype('int32')
+
+        parcial = acumulado.groupby(CHAVES_MUNICIPIO_CENSO, observed=True, sort=False).sum().reset_index()
+        # As categorias mudam de um bloco para outro; as chaves voltam a ser texto para a junção
+        parcial['SG_UF'] = parcial['SG_UF'].astype(str)
+        parcial['NO_MUNICIPIO'] = parcial['NO_MUNICIPIO'].astype(str)
+        parcial['CO_MUNICIPIO'] = parcial['CO_MUNICIPIO'].astype('int64')
+        parciais.append(parcial)
+        print(f"  ... {total_escolas} escolas processadas.")
+
+    if not parciais:
+        return pd.DataFrame()
+
+    somas = pd.concat(parciais, ignore_index=True).groupby(CHAVES_MUNICIPIO_CENSO).sum().reset_index()
+    print(f"Dados de {total_escolas} escolas agregados com sucesso.")
+
+    df_municipal = somas[CHAVES_MUNICIPIO_CENSO].copy()
+    for col_nova in list(MAPA_INDICADORES_NEGATIVOS.values()) + list(MAPA_INDICADORES_POSITIVOS.values()):
+        n_validos = somas[f'{col_nova}_n'].astype('float64')
+        df_municipal[col_nova] = somas[f'{col_nova}_soma'] / n_validos.where(n_validos > 0)
+    df_municipal['QT_SALAS_UTILIZA_CLIMATIZADAS'] = somas['QT_SALAS_UTILIZA_CLIMATIZADAS']
+    df_municipal['QT_SALAS_UTILIZADAS'] = somas['QT_SALAS_UTILIZADAS']
+    df_municipal['CO_ENTIDADE'] = somas['CO_ENTIDADE']
+    return df_municipal
+
+
+@instrumentacao.instrumentar('extract')
+def gerar_indice_infraestrutura_municipal(modo_streaming=True, tamanho_bloco=200_000, ano=ANO_CENSO):
     """
     Realiza o processo completo de download, extração, pré-processamento de dados
     do Censo Escolar e cálculo do Índice de Qualidade da Infraestrutura Escolar (IQIE)
     para cada município do Brasil.
+
+    Args:
+        modo_streaming (bool): Se True (padrão), o CSV é lido em blocos e agregado
+                               incrementalmente, com memória limitada ao bloco.
+                               Se False, o arquivo é carregado inteiro em memória.
+        tamanho_bloco (int): Número de escolas lidas por bloco no modo streaming.
+        ano (int): Edição do Censo Escolar. Só a edição ANO_CENSO é gravada no staging.
     Returns:
         pd.DataFrame: Um DataFrame contendo três colunas:
                       - 'Código do Município' (CO_MUNICIPIO)
@@ -277,11 +556,9 @@ def gerar_indice_infraestrutura_municipal():
                       Retorna um DataFrame vazio em caso de falha no download.
     """
     # --- 1. CONFIGURAÇÃO ---
-    URL_DADOS = 'https://download.inep.gov.br/dados_abertos/microdados_censo_escolar_2024.zip'
-    NOME_PASTA_PRINCIPAL_ZIP = 'microdados_censo_escolar_2024'
-    NOME_ARQUIVO_CSV = 'microdados_ed_basica_2024.csv'
-    CAMINHO_DENTRO_DO_ZIP = f'{NOME_PASTA_PRINCIPAL_ZIP}/dados/{NOME_ARQUIVO_CSV}'
-
+    url_dados = URL_CENSO_ESCOLAR_MODELO.format(ano=ano)
+    caminho_no_zip = CAMINHO_CENSO_NO_ZIP_MODELO.format(ano=ano)
+    edicao_padrao = ano == ANO_CENSO
     # Colunas necessárias para a análise, otimizando o uso de memória
     COLUNAS_PARA_CARREGAR = [
         'SG_UF', 'NO_MUNICIPIO', 'CO_MUNICIPIO', 'CO_ENTIDADE',
@@ -294,23 +571,34 @@ def gerar_indice_infraestrutura_municipal():
     MAX_TENTATIVAS = 3
     DELAY_SEGUNDOS = 10
 
+    indicadores_binarios = list(MAPA_INDICADORES_NEGATIVOS.values()) + list(MAPA_INDICADORES_POSITIVOS.values())
+
     # --- 2. DOWNLOAD E EXTRAÇÃO DOS DADOS ---
     df_escolas = None
+    df_municipal = None
     for tentativa in range(MAX_TENTATIVAS):
         try:
             print(f"\n--- Tentativa {tentativa + 1} de {MAX_TENTATIVAS} ---")
-            print(f"Baixando dados de: {URL_DADOS}")
-            response = requests.get(URL_DADOS, stream=True, timeout=300)
-            response.raise_for_status()  
-            print("Download concluído. Processando arquivo CSV em memória...")
-
-            with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-                with z.open(CAMINHO_DENTRO_DO_ZIP) as csv_file:
-                    df_escolas = pd.read_csv(
-                        csv_file, sep=';', encoding='latin-1',
-                        usecols=COLUNAS_PARA_CARREGAR, low_memory=False
-                    )
-            print(f"Dados de {len(df_escolas)} escolas carregados com sucesso.")
+            print(f"Baixando dados de: {url_dados}")
+            caminho_zip = cache.baixar(url_dados, fonte='censo_escolar' if edicao_padrao else f'censo_escolar_{ano}', timeout=300)
+            print("Download concluído. Processando arquivo CSV...")
+
+            with zipfile.ZipFile(caminho_zip) as z:
+                with z.open(caminho_no_zip) as csv_file:
+                    if modo_streaming:
+                        print(f"Agregando o CSV em blocos de {tamanho_bloco} escolas...")
+                        with staging.EscritorStaging('censo_escolas') if edicao_padrao else nullcontext() as escritor:
+                            df_municipal = _agregar_censo_em_blocos(
+                                csv_file, COLUNAS_PARA_CARREGAR, tamanho_bloco, escritor
+                            )
+                    else:
+                        df_escolas = pd.read_csv(
+                            csv_file, sep=';', encoding='latin-1',
+                            usecols=COLUNAS_PARA_CARREGAR, low_memory=False
+                        )
+                        print(f"Dados de {len(df_escolas)} escolas carregados com sucesso.")
+                        if edicao_padrao:
+                            staging.salvar('censo_escolas', df_escolas)
             break  
         except requests.exceptions.RequestException as e:
             print(f"ERRO DE CONEXÃO na tentativa {tentativa + 1}: {e}")
@@ -321,50 +609,36 @@ def gerar_indice_infraestrutura_municipal():
                 print("Número máximo de tentativas atingido. O download falhou.")
                 return pd.DataFrame()  # Retorna DataFrame vazio em caso de falha
 
-    if df_escolas is None or not isinstance(df_escolas, pd.DataFrame) or df_escolas.empty:
-        return pd.DataFrame()
-
-    # --- 3. PRÉ-PROCESSAMENTO (NÍVEL ESCOLA) ---
-    print("\nIniciando pré-processamento dos indicadores das escolas...")
-    # Inverte colunas de "inexistência" para "existência" (1 = Sim, 0 = Não)
-    mapa_negativos = {
-        'IN_AGUA_INEXISTENTE': 'AGUA_EXISTENTE',
-        'IN_ENERGIA_INEXISTENTE': 'ENERGIA_EXISTENTE',
-        'IN_ESGOTO_INEXISTENTE': 'ESGOTO_EXISTENTE',
-        'IN_TRATAMENTO_LIXO_INEXISTENTE': 'LIXO_TRATADO_EXISTENTE',
-        'IN_ACESSIBILIDADE_INEXISTENTE': 'ACESSIBILIDADE_EXISTENTE'
-    }
-    for col_original, col_nova in mapa_negativos.items():
-        # Converte 0 para 1, 1 para 0, e mantém outros valores (como NaN) como estão
-        df_escolas[col_nova] = np.select(
-            [df_escolas[col_original] == 0, df_escolas[col_original] == 1],
-            [1, 0],
-            default=np.nan
-        )
-
-    # Renomeia colunas que já são positivas para maior clareza
-    mapa_positivos = {
-        'IN_BANHEIRO': 'BANHEIRO_EXISTENTE', 'IN_BIBLIOTECA': 'BIBLIOTECA_EXISTENTE',
-        'IN_LABORATORIO_CIENCIAS': 'LAB_CIENCIAS_EXISTENTE', 'IN_LABORATORIO_INFORMATICA': 'LAB_INFORMATICA_EXISTENTE',
-        'IN_QUADRA_ESPORTES': 'QUADRA_ESPORTES_EXISTENTE', 'IN_BANDA_LARGA': 'BANDA_LARGA_EXISTENTE'
-    }
-    df_escolas.rename(columns=mapa_positivos, inplace=True)
-
-    # --- 4. CÁLCULO DO IQIE (NÍVEL MUNICIPAL) ---
-    print("Agregando dados por município para calcular o IQIE...")
-    indicadores_binarios = list(mapa_negativos.values()) + list(mapa_positivos.values())
-
-    agregacao = {col: 'mean' for col in indicadores_binarios}
-    agregacao.update({
-        'QT_SALAS_UTILIZA_CLIMATIZADAS': 'sum',
-        'QT_SALAS_UTILIZADAS': 'sum',
-        'CO_ENTIDADE': 'count'  # Usado para contar o número de escolas
-    })
-    
-    df_municipal = df_escolas.groupby(
-        ['SG_UF', 'CO_MUNICIPIO', 'NO_MUNICIPIO']
-    ).agg(agregacao).reset_index()
+    if modo_streaming:
+        if df_municipal is None or df_municipal.empty:
+            return pd.DataFrame()
+    else:
+        if df_escolas is None or not isinstance(df_escolas, pd.DataFrame) or df_escolas.empty:
+            return pd.DataFrame()
+
+        # --- 3. PRÉ-PROCESSAMENTO (NÍVEL ESCOLA) ---
+        print("\nIniciando pré-processamento dos indicadores das escolas...")
+        for col_original, col_nova in MAPA_INDICADORES_NEGATIVOS.items():
+            # Converte 0 para 1, 1 para 0, e mantém outros valores (como NaN) como estão
+            df_escolas[col_nova] = np.select(
+                [df_escolas[col_original] == 0, df_escolas[col_original] == 1],
+                [1, 0],
+                default=np.nan
+            )
+        df_escolas.rename(columns=MAPA_INDICADORES_POSITIVOS, inplace=True)
+
+        # --- 4. AGREGAÇÃO POR MUNICÍPIO ---
+        print("Agregando dados por município para calcular o IQIE...")
+        agregacao = {col: 'mean' for col in indicadores_binarios}
+        agregacao.update({
+            'QT_SALAS_UTILIZA_CLIMATIZADAS': 'sum',
+            'QT_SALAS_UTILIZADAS': 'sum',
+            'CO_ENTIDADE': 'count'  # Usado para contar o número de escolas
+        })
+        
+        df_municipal = df_escolas.groupby(CHAVES_MUNICIPIO_CENSO).agg(agregacao).reset_index()
 
+    # --- 5. CÁLCULO DO IQIE (NÍVEL MUNICIPAL) ---
     # Cálculo da Taxa de Climatização de forma segura (evitando divisão por zero)
     df_municipal['TX_CLIMATIZACAO'] = 0.0
     salas_utilizadas_validas = df_municipal['QT_SALAS_UTILIZADAS'] > 0
@@ -378,7 +652,7 @@ def gerar_indice_infraestrutura_municipal():
     colunas_para_iqie = indicadores_binarios + ['TX_CLIMATIZACAO']
     df_municipal['IQIE'] = df_municipal[colunas_para_iqie].mean(axis=1)
 
-    # --- 5. FORMATAÇÃO DO RESULTADO FINAL ---
+    # --- 6. FORMATAÇÃO DO RESULTADO FINAL ---
     print("Cálculo do IQIE Municipal concluído com sucesso.")
     
     df_resultado = df_municipal[['CO_MUNICIPIO', 'NO_MUNICIPIO', 'IQIE']]
@@ -386,10 +660,16 @@ def gerar_indice_infraestrutura_municipal():
         'CO_MUNICIPIO': 'Código do Município',
         'NO_MUNICIPIO': 'Nome do Município'
     })
+    if edicao_padrao:
+        staging.salvar('infraestrutura', df_resultado)
     return df_resultado
 
 
 #Indicador de Nível Socioeconômico (INSE) - SAEB (INEP)
+URL_INSE = 'https://download.inep.gov.br/informacoes_estatisticas/indicadores_educacionais/2021/nivel_socioeconomico/INSE_2021_municipios.xlsx'
+ABA_INSE = 'INSE_MUN_2021'
+
+@instrumentacao.instrumentar('extract')
 def processar_inse():
     """
     Faz o download e processa dados socioeconômicos do INEP.
@@ -398,17 +678,15 @@ def processar_inse():
     Returns:
         pandas.DataFrame: DataFrame com a média do INSE por município.
     """
-    url = 'https://download.inep.gov.br/informacoes_estatisticas/indicadores_educacionais/2021/nivel_socioeconomico/INSE_2021_municipios.xlsx'
     tentativas = 3
     for i in range(tentativas):
         try:
             print(f"Tentativa {i + 1} de {tentativas} para acessar a URL...")
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            caminho_xlsx = cache.baixar(URL_INSE, fonte='inse', timeout=30)
             print("Conexão bem-sucedida!")
             
             # Carrega a planilha correta do arquivo Excel
-            df = pd.read_excel(response.content, sheet_name='INSE_MUN_2021')
+            df = pd.read_excel(caminho_xlsx, sheet_name=ABA_INSE)
             
             # Limpeza e conversão de dados
             df['MEDIA_INSE'] = pd.to_numeric(df['MEDIA_INSE'], errors='coerce')
@@ -416,6 +694,7 @@ def processar_inse():
             
             # Agrega pela média, incluindo agora o NOME do município
             df_socio = df.groupby(['CO_MUNICIPIO', 'NO_MUNICIPIO'])['MEDIA_INSE'].mean().reset_index()
+            staging.salvar('inse', df_socio)
             
             return df_socio
 
@@ -428,27 +707,35 @@ def processar_inse():
                 print("Todas as tentativas de conexão falharam.")
                 return None
             
-def extrair_afd():
+#Adequação da Formação Docente (AFD) - INEP
+ANO_AFD = 2024
+URL_AFD_MODELO = "https://download.inep.gov.br/informacoes_estatisticas/indicadores_educacionais/{ano}/AFD_{ano}_MUNICIPIOS.zip"
+CAMINHO_AFD_NO_ZIP_MODELO = 'AFD_{ano}_MUNICIPIOS/AFD_MUNICIPIOS_{ano}.xlsx'
+URL_AFD = URL_AFD_MODELO.format(ano=ANO_AFD)
+CAMINHO_AFD_NO_ZIP = CAMINHO_AFD_NO_ZIP_MODELO.format(ano=ANO_AFD)
+
+@instrumentacao.instrumentar('extract')
+def extrair_afd(ano=ANO_AFD):
     """
     Baixa e processa dados de formação de docentes. Agrega os dados por município
     para calcular a média percentual de formação adequada, garantindo um único
     registro por município.
 
+    Args:
+        ano (int): Edição do indicador. Só a edição ANO_AFD é gravada no staging.
+
     Returns:
         Um DataFrame do Pandas com código, nome e a média do percentual de
         formação adequada por município, devidamente agregado.
     """
-    url = "https://download.inep.gov.br/informacoes_estatisticas/indicadores_educacionais/2024/AFD_2024_MUNICIPIOS.zip"
     for tentativa in range(2):
         try:
             print("Tentando baixar o arquivo...")
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
+            caminho_zip = cache.baixar(URL_AFD_MODELO.format(ano=ano), fonte='afd' if ano == ANO_AFD else f'afd_{ano}', timeout=None)
             print("Download concluído com sucesso!")
 
-            with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-                caminho_arquivo = 'AFD_2024_MUNICIPIOS/AFD_MUNICIPIOS_2024.xlsx'
-                with z.open(caminho_arquivo) as f:
+            with zipfile.ZipFile(caminho_zip) as z:
+                with z.open(CAMINHO_AFD_NO_ZIP_MODELO.format(ano=ano)) as f:
                     # Carrega o arquivo excel
                     df = pd.read_excel(f, header=7)
 
@@ -476,6 +763,8 @@ def extrair_afd():
 
                     # Renomeia a coluna da média para o nome final
                     afd_agregado.rename(columns={'media_percentual': 'media_percentual_formacao_adequada'}, inplace=True)
+                    if ano == ANO_AFD:
+                        staging.salvar('afd', afd_agregado)
                     
                     return afd_agregado
 
@@ -534,4 +823,6 @@ if __name__ == "__main__":
     df_dtb = ler_dtb()
     print("\n\n--- Dados da Divisão Territorial Brasileira (DTB) - IBGE")
     print(df_dtb.info())
+
+    cache.imprimir_relatorio_cache()
           
\ No newline at end of file
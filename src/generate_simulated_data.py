@@ -3,7 +3,30 @@
 import pandas as pd
 import numpy as np
 import os
-import iqe # Continua usando o iqe.py, mas agora apenas para obter a lista de municípios para a predição final
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import arquivos
+
+# Colunas do histórico gerado em blocos: float32/int32 ocupam metade do float64/int64.
+# O nome fictício não é gravado: é sempre f"Sintético_{cod_municipio - 100000}".
+ESQUEMA_HISTORICO = pa.schema([
+    ('cod_municipio', pa.int32()),
+    ('iqe_anterior', pa.float32()),
+    ('nota_saeb_anterior', pa.float32()),
+    ('taxa_aprovacao_anterior', pa.float32()),
+    ('iqie_infraestrutura_anterior', pa.float32()),
+    ('inse_socioeconomico_anterior', pa.float32()),
+    ('formacao_docente_anterior', pa.float32()),
+    ('valor_investido', pa.float32()),
+    ('iqe_recente', pa.float32()),
+])
+TAMANHO_BLOCO = 1_000_000
 
 def gerar_dados_sinteticos(num_amostras=1000):
     """
@@ -46,8 +69,109 @@ def gerar_dados_sinteticos(num_amostras=1000):
     return df_sintetico
 
 
+def gerar_bloco(inicio, tamanho, semente):
+    """
+    Gera um bloco do histórico sintético com as mesmas distribuições de
+    gerar_dados_sinteticos(), em float32 e com um gerador próprio.
+
+    Args:
+        inicio (int): Índice da primeira amostra do bloco (define os códigos).
+        tamanho (int): Número de amostras.
+        semente (np.random.SeedSequence ou int): Semente do gerador do bloco.
+
+    Returns:
+        pa.Table: O bloco, no esquema ESQUEMA_HISTORICO.
+    """
+    rng = np.random.default_rng(semente)
+    f32 = np.float32
+
+    def uniforme(minimo, maximo):
+        return f32(minimo) + f32(maximo - minimo) * rng.random(tamanho, dtype=f32)
+
+    def normal(desvio):
+        return f32(desvio) * rng.standard_normal(tamanho, dtype=f32)
+
+    iqe_anterior = uniforme(1, 9.5)
+    nota_saeb = iqe_anterior * uniforme(0.9, 1.1)
+    taxa_aprovacao = f32(80) + iqe_anterior * f32(2) + normal(2)
+    iqie_infra = iqe_anterior / f32(10) * uniforme(0.8, 1.2)
+    inse_socio = iqe_anterior / f32(2) * uniforme(0.9, 1.1)
+    formacao_docente = f32(60) + iqe_anterior * f32(3) + normal(5)
+    valor_investido = uniforme(20000, 250000)
+
+    fator_melhoria = (f32(10) - iqe_anterior) / f32(10)
+    impacto_investimento = valor_investido / f32(100000) * fator_melhoria * uniforme(0.8, 1.2)
+    iqe_recente = iqe_anterior + impacto_investimento + normal(0.1)
+
+    return pa.Table.from_arrays([
+        np.arange(100000 + inicio, 100000 + inicio + tamanho, dtype=np.int32),
+        iqe_anterior,
+        nota_saeb,
+        np.clip(taxa_aprovacao, 50, 100),
+        np.clip(iqie_infra, 0, 1),
+        np.clip(inse_socio, 1, 6),
+        np.clip(formacao_docente, 30, 100),
+        valor_investido,
+        np.clip(iqe_recente, 1, 10),
+    ], schema=ESQUEMA_HISTORICO)
+
+
+def gerar_dados_sinteticos_parquet(num_amostras, destino, tamanho_bloco=TAMANHO_BLOCO, semente=42, max_workers=None):
+    """
+    Gera um histórico sintético de qualquer tamanho direto em Parquet, bloco a bloco.
+
+    Cada bloco tem seu próprio gerador (SeedSequence(semente).spawn), então o
+    arquivo é o mesmo com qualquer número de processos. Os blocos são gerados em
+    paralelo e gravados na ordem, um row group por bloco, com no máximo dois blocos
+    por processo em memória.
+
+    Args:
+        num_amostras (int): Total de linhas (ex.: 10_000_000).
+        destino (str ou Path): Arquivo Parquet de saída (escrita atômica).
+        tamanho_bloco (int): Linhas por bloco.
+        semente (int): Semente global.
+        max_workers (int, opcional): Processos. Padrão: número de CPUs.
+
+    Returns:
+        str: O caminho gravado.
+    """
+    inicios = list(range(0, num_amostras, tamanho_bloco))
+    sementes = np.random.SeedSequence(semente).spawn(len(inicios))
+    tarefas = [(inicio, min(tamanho_bloco, num_amostras - inicio), s) for inicio, s in zip(inicios, sementes)]
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"-> Gerando {num_amostras} amostras sintéticas em {len(tarefas)} bloco(s) com {max_workers} processo(s)...")
+
+    inicio_relogio = time.perf_counter()
+    with arquivos.escrita_atomica(destino) as temporario, \
+            pq.ParquetWriter(temporario, ESQUEMA_HISTORICO, compression='zstd') as escritor:
+        if max_workers == 1 or len(tarefas) == 1:
+            for tarefa in tarefas:
+                escritor.write_table(gerar_bloco(*tarefa))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                pendentes = deque()
+                for tarefa in tarefas:
+                    pendentes.append(executor.submit(gerar_bloco, *tarefa))
+                    if len(pendentes) >= 2 * max_workers:
+                        escritor.write_table(pendentes.popleft().result())
+                while pendentes:
+                    escritor.write_table(pendentes.popleft().result())
+    tempo = time.perf_counter() - inicio_relogio
+    print(f"-> {num_amostras} amostras gravadas em '{destino}' em {tempo:.1f}s "
+          f"({num_amostras / max(tempo, 1e-9) / 1e6:.1f} milhões de linhas/s).")
+    return str(destino)
+
+
 # Bloco Principal
 if __name__ == "__main__":
+    # Uso: python generate_simulated_data.py [amostras [destino.parquet]]
+    # Com o número de amostras, gera o histórico em blocos direto em Parquet
+    if len(sys.argv) > 1:
+        num_amostras = int(sys.argv[1])
+        destino = sys.argv[2] if len(sys.argv) > 2 else 'data/dados_historicos.parquet'
+        gerar_dados_sinteticos_parquet(num_amostras, destino)
+        sys.exit(0)
+
     print("--- INICIANDO GERAÇÃO DE DADOS HISTÓRICOS SIMULADOS (V2) ---")
     
     df_treino_sintetico = gerar_dados_sinteticos(num_amostras=1000)
@@ -58,7 +182,8 @@ if __name__ == "__main__":
         print("-> Diretório 'data/' criado.")
 
     caminho_arquivo = 'data/dados_historicos.csv'
-    df_treino_sintetico.to_csv(caminho_arquivo, index=False)
+    with arquivos.escrita_atomica(caminho_arquivo) as temporario:
+        df_treino_sintetico.to_csv(temporario, index=False)
 
     print(f"\n--- SUCESSO! ---")
     print(f"Arquivo '{caminho_arquivo}' com {len(df_treino_sintetico)} registros sintéticos foi criado.")
@@ -0,0 +1,332 @@
+import gzip
+import json
+from pathlib import Path
+
+import numpy as np
+
+import cache
+
+
+# Malhas municipais por UF (GeoJSON do geodata-br, com o código IBGE em properties.id).
+# Um arquivo 'geojs-<código da UF>-mun.json' em DIRETORIO_MALHAS é usado no lugar do download.
+DIRETORIO_MALHAS = Path(__file__).parent.parent / 'data' / 'malhas'
+URL_MALHA_UF = 'https://raw.githubusercontent.com/tbrugz/geodata-br/master/geojson/geojs-{uf}-mun.json'
+
+# Tolerância da simplificação, em graus (0,001° ≈ 110 m), e tamanho da grade de quantização
+TOLERANCIA_PADRAO = 0.001
+QUANTIZACAO_PADRAO = 100_000
+# Tamanho máximo do mapa comprimido com gzip: o que uma conexão móvel lenta baixa em ~1 s
+ORCAMENTO_MAPA_BYTES = 150_000
+NOME_OBJETO = 'municipios'
+
+
+def _arquivo_malha(uf):
+    return DIRETORIO_MALHAS / f'geojs-{uf}-mun.json'
+
+
+def arquivos_malhas_locais():
+    """Malhas guardadas em DIRETORIO_MALHAS (entradas do estágio 'mapa' do pipeline)."""
+    return sorted(DIRETORIO_MALHAS.glob('geojs-*-mun.json')) if DIRETORIO_MALHAS.exists() else []
+
+
+def _codigo_feature(feature):
+    propriedades = feature.get('properties') or {}
+    for chave in ('id', 'codarea', 'CD_MUN', 'cod_municipio'):
+        if propriedades.get(chave) is not None:
+            return int(propriedades[chave])
+    return int(feature['id']) if feature.get('id') is not None else None
+
+
+def carregar_malhas(codigos):
+    """
+    Lê as malhas das UFs dos municípios pedidos e mantém só esses municípios.
+    Cada UF vem do arquivo local, se existir, ou do download (com cache).
+
+    Returns:
+        dict: Código IBGE -> geometria GeoJSON (Polygon ou MultiPolygon).
+    """
+    codigos = {int(codigo) for codigo in codigos}
+    geometrias = {}
+    for uf in sorted({codigo // 100_000 for codigo in codigos}):
+        local = _arquivo_malha(uf)
+        caminho = local if local.exists() else cache.baixar(URL_MALHA_UF.format(uf=uf), fonte=f'malha_{uf}')
+        with open(caminho, encoding='utf-8') as f:
+            colecao = json.load(f)
+        for feature in colecao['features']:
+            codigo = _codigo_feature(feature)
+            if codigo in codigos and feature.get('geometry'):
+                geometrias[codigo] = feature['geometry']
+    ausentes = codigos - set(geometrias)
+    if ausentes:
+        print(f"AVISO: {len(ausentes)} município(s) sem geometria na malha: {sorted(ausentes)[:10]}")
+    return geometrias
+
+
+# ---------------------------------------------------------------------
+# Topologia: anéis quantizados divididos em arcos compartilhados
+# ---------------------------------------------------------------------
+
+def _poligonos(geometria):
+    if geometria['type'] == 'Polygon':
+        return [geometria['coordinates']]
+    if geometria['type'] == 'MultiPolygon':
+        return geometria['coordinates']
+    raise ValueError(f"Geometria '{geometria['type']}' não suportada.")
+
+
+def _quantizar(anel, origem, escala):
+    pontos = np.rint((np.asarray(anel, dtype='float64')[:, :2] - origem) / escala).astype('int64')
+    # Pontos que caem na mesma célula da grade viram um só; o anel fica sem o ponto de fechamento
+    mantidos = np.r_[True, np.any(pontos[1:] != pontos[:-1], axis=1)]
+    pontos = pontos[mantidos]
+    if len(pontos) > 1 and np.array_equal(pontos[0], pontos[-1]):
+        pontos = pontos[:-1]
+    return pontos
+
+
+def _juncoes(aneis, largura):
+    """
+    Máscara, sobre os pontos de todos os anéis concatenados, dos pontos onde uma
+    fronteira compartilhada começa ou termina: os que aparecem com vizinhos
+    (anterior, seguinte) diferentes em anéis diferentes.
+    """
+    chaves, pares = [], []
+    for anel in aneis:
+        chave = anel[:, 0] * largura + anel[:, 1]
+        anterior, seguinte = np.roll(chave, 1), np.roll(chave, -1)
+        chaves.append(chave)
+        pares.append(np.column_stack([np.minimum(anterior, seguinte), np.maximum(anterior, seguinte)]))
+    chaves, pares = np.concatenate(chaves), np.concatenate(pares)
+    ocorrencias = np.unique(np.column_stack([chaves, pares]), axis=0)
+    unicas, contagem = np.unique(ocorrencias[:, 0], return_counts=True)
+    return np.isin(chaves, unicas[contagem > 1]), chaves
+
+
+def _dividir_em_arcos(aneis, largura):
+    """
+    Divide cada anel nas junções e une os trechos iguais (em qualquer sentido) em um
+    só arco. Como cada fronteira entre vizinhos vira um arco único, simplificá-lo uma
+    vez mantém os vizinhos encaixados, sem frestas nem sobreposições.
+
+    Returns:
+        tuple: (lista de arcos como arrays de pontos, para cada anel a lista de
+               referências a arcos no formato do TopoJSON: i ou ~i se invertido)
+    """
+    juncoes, chaves = _juncoes(aneis, largura)
+    limites = np.cumsum([0] + [len(anel) for anel in aneis])
+    arcos, indices, referencias = [], {}, []
+    for k, anel in enumerate(aneis):
+        cortes = np.flatnonzero(juncoes[limites[k]:limites[k + 1]])
+        if len(cortes) == 0:
+            # Anel sem vizinhos (ou contornado por um só): arco fechado a partir do menor ponto
+            cortes = np.array([int(np.argmin(chaves[limites[k]:limites[k + 1]]))])
+        anel = np.roll(anel, -int(cortes[0]), axis=0)
+        cortes = np.r_[cortes - cortes[0], len(anel)]
+        anel = np.vstack([anel, anel[:1]])
+        referencias_anel = []
+        for inicio, fim in zip(cortes[:-1], cortes[1:]):
+            trecho = anel[inicio:fim + 1]
+            direto, inverso = trecho.tobytes(), trecho[::-1].tobytes()
+            if direto in indices:
+                referencias_anel.append(indices[direto])
+            elif inverso in indices:
+                referencias_anel.append(~indices[inverso])
+            else:
+                indices[direto] = len(arcos)
+                referencias_anel.append(len(arcos))
+                arcos.append(trecho)
+        referencias.append(referencias_anel)
+    return arcos, referencias
+
+
+def _distancias(pontos, a, b):
+    """Distância de cada ponto à reta a-b (ou ao ponto a, se a == b). Aceita um a e um b por ponto."""
+    direcao = (b - a).astype('float64')
+    relativos = (pontos - a).astype('float64')
+    norma = np.hypot(direcao[..., 0], direcao[..., 1])
+    cruzado = np.abs(relativos[..., 0] * direcao[..., 1] - relativos[..., 1] * direcao[..., 0])
+    return np.where(norma > 0, cruzado / np.where(norma > 0, norma, 1), np.hypot(relativos[..., 0], relativos[..., 1]))
+
+
+def _importancias(pontos, inicios, fins):
+    """
+    Tolerância a partir da qual cada ponto sai na simplificação de Douglas-Peucker
+    dos arcos pontos[inicio:fim + 1]: simplificar com tolerância t é manter os
+    pontos com importância > t. Assim o algoritmo roda uma vez e qualquer
+    tolerância custa uma comparação.
+
+    Em vez de recursão arco a arco, todos os segmentos pendentes de todos os arcos
+    são divididos juntos, um nível da recursão por vez.
+    """
+    importancia = np.zeros(len(pontos))
+    importancia[inicios] = importancia[fins] = np.inf
+    # Arco fechado: o ponto mais distante do início e um ponto de cada metade são
+    # sempre mantidos, para o anel não se reduzir a um segmento
+    fechados = np.flatnonzero(np.all(pontos[inicios] == pontos[fins], axis=1) & (fins - inicios >= 3))
+    meios = np.array([inicios[k] + int(np.argmax(_distancias(pontos[inicios[k]:fins[k] + 1], pontos[inicios[k]],
+                                                              pontos[inicios[k]]))) for k in fechados], dtype='int64')
+    importancia[meios] = np.inf
+    abertos = np.setdiff1d(np.arange(len(inicios)), fechados)
+    segmento_inicio = np.r_[inicios[abertos], inicios[fechados], meios]
+    segmento_fim = np.r_[fins[abertos], meios, fins[fechados]]
+    forcado = np.r_[np.zeros(len(abertos), dtype=bool), np.ones(2 * len(fechados), dtype=bool)]
+    limite_pai = np.full(len(segmento_inicio), np.inf)
+
+    while True:
+        ativos = segmento_fim - segmento_inicio >= 2
+        segmento_inicio, segmento_fim = segmento_inicio[ativos], segmento_fim[ativos]
+        forcado, limite_pai = forcado[ativos], limite_pai[ativos]
+        if len(segmento_inicio) == 0:
+            return importancia
+        internos = segmento_fim - segmento_inicio - 1
+        deslocamentos = np.r_[0, np.cumsum(internos)[:-1]]
+        segmento = np.repeat(np.arange(len(internos)), internos)
+        indices = np.arange(internos.sum()) - deslocamentos[segmento] + segmento_inicio[segmento] + 1
+        distancias = _distancias(pontos[indices], pontos[segmento_inicio[segmento]], pontos[segmento_fim[segmento]])
+        maiores = np.maximum.reduceat(distancias, deslocamentos)
+        candidatos = np.flatnonzero(distancias == maiores[segmento])
+        _, primeiros = np.unique(segmento[candidatos], return_index=True)
+        meio = indices[candidatos[primeiros]]
+        # Um ponto nunca é mais importante que o que dividiu o seu segmento
+        valor = np.where(forcado, np.inf, np.minimum(maiores, limite_pai))
+        importancia[meio] = valor
+        segmento_inicio, segmento_fim = np.r_[segmento_inicio, meio], np.r_[meio, segmento_fim]
+        forcado = np.zeros(len(segmento_inicio), dtype=bool)
+        limite_pai = np.r_[valor, valor]
+
+
+def _delta(arco):
+    return np.vstack([arco[:1], np.diff(arco, axis=0)]).tolist()
+
+
+class _Topologia:
+    """
+    Anéis de todos os municípios quantizados, divididos em arcos e com a importância
+    de cada ponto já calculada: gerar o mapa para outra tolerância é barato.
+    """
+
+    def __init__(self, geometrias, quantizacao):
+        coordenadas = np.vstack([np.asarray(anel, dtype='float64')[:, :2] for geometria in geometrias.values()
+                                 for poligono in _poligonos(geometria) for anel in poligono])
+        minimo, maximo = coordenadas.min(axis=0), coordenadas.max(axis=0)
+        self.bbox = [*minimo.tolist(), *maximo.tolist()]
+        self.origem = minimo
+        self.escala = np.maximum(maximo - minimo, 1e-9) / (quantizacao - 1)
+
+        aneis, self.estrutura = [], {}
+        for codigo, geometria in geometrias.items():
+            poligonos = []
+            for poligono in _poligonos(geometria):
+                indices_aneis = []
+                for anel in poligono:
+                    pontos = _quantizar(anel, self.origem, self.escala)
+                    if len(pontos) >= 3:
+                        indices_aneis.append(len(aneis))
+                        aneis.append(pontos)
+                if indices_aneis:
+                    poligonos.append(indices_aneis)
+            self.estrutura[codigo] = poligonos
+        arcos, self.referencias = _dividir_em_arcos(aneis, quantizacao)
+        self.n_arcos = len(arcos)
+        self.pontos = np.vstack(arcos)
+        self.n_pontos = len(self.pontos)
+        self.inicios = np.r_[0, np.cumsum([len(arco) for arco in arcos])[:-1]]
+        self.fins = self.inicios + [len(arco) - 1 for arco in arcos]
+        self.importancia = _importancias(self.pontos, self.inicios, self.fins)
+
+    def _mantidos(self, tolerancia):
+        """Máscara dos pontos mantidos; anéis que se degenerariam mantêm os arcos originais."""
+        mantidos = self.importancia > tolerancia
+        pontos_arco = np.add.reduceat(mantidos, self.inicios) - 1
+        for referencias_anel in self.referencias:
+            arcos_anel = [referencia if referencia >= 0 else ~referencia for referencia in referencias_anel]
+            if pontos_arco[arcos_anel].sum() < 3:
+                for arco in arcos_anel:
+                    mantidos[self.inicios[arco]:self.fins[arco] + 1] = True
+        return mantidos
+
+    def topojson(self, tolerancia, propriedades):
+        """TopoJSON quantizado com os arcos simplificados e codificados em deltas."""
+        # A tolerância é dada em graus; os pontos estão em unidades da grade
+        mantidos = self._mantidos(tolerancia / float(self.escala.min()))
+        arcos = [_delta(self.pontos[inicio:fim + 1][mantidos[inicio:fim + 1]])
+                 for inicio, fim in zip(self.inicios, self.fins)]
+        geometrias = []
+        for codigo, poligonos in self.estrutura.items():
+            if not poligonos:
+                continue
+            aneis = [[self.referencias[i] for i in poligono] for poligono in poligonos]
+            geometria = {'type': 'Polygon', 'arcs': aneis[0]} if len(aneis) == 1 else {'type': 'MultiPolygon', 'arcs': aneis}
+            geometria.update({'id': codigo, 'properties': propriedades.get(codigo, {})})
+            geometrias.append(geometria)
+        return {
+            'type': 'Topology',
+            'bbox': self.bbox,
+            'transform': {'scale': self.escala.tolist(), 'translate': self.origem.tolist()},
+            'objects': {NOME_OBJETO: {'type': 'GeometryCollection', 'geometries': geometrias}},
+            'arcs': arcos,
+        }, int(mantidos.sum())
+
+
+def tamanho_comprimido(conteudo):
+    """Bytes do conteúdo serializado como no site (JSON compacto) e comprimido com gzip."""
+    dados = json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return len(gzip.compress(dados, compresslevel=9, mtime=0))
+
+
+def gerar_mapa(df_iqe, tolerancia=TOLERANCIA_PADRAO, quantizacao=QUANTIZACAO_PADRAO,
+               orcamento_bytes=ORCAMENTO_MAPA_BYTES, geometrias=None):
+    """
+    Gera o mapa do site: as fronteiras dos municípios pontuados, simplificadas sem
+    abrir frestas entre vizinhos, em TopoJSON quantizado, no lugar das malhas
+    completas das UFs baixadas pela página.
+
+    Cada fronteira compartilhada é guardada uma vez (como arco) e simplificada com
+    Douglas-Peucker; as coordenadas são inteiros de uma grade de 'quantizacao' pontos
+    por eixo, codificados como diferenças em relação ao ponto anterior. Se o mapa
+    comprimido passar de 'orcamento_bytes', a tolerância é dobrada até caber.
+
+    Args:
+        df_iqe (pd.DataFrame): Saída de iqe.calcular_iqe() ('cod_municipio',
+            'nome_municipio' e 'IQE'), unida às geometrias pelo código IBGE.
+        tolerancia (float): Tolerância inicial da simplificação, em graus.
+        quantizacao (int): Pontos da grade por eixo.
+        orcamento_bytes (int, opcional): Tamanho máximo com gzip. None desliga o limite.
+        geometrias (dict, opcional): Código -> geometria GeoJSON. Padrão: carregar_malhas().
+
+    Returns:
+        dict: Topologia com o objeto 'municipios' (id = código IBGE, propriedades
+              'nome' e 'iqe') e, em '_metadados', a tolerância usada e os tamanhos.
+    """
+    df = df_iqe.dropna(subset=['IQE'])
+    codigos = df['cod_municipio'].astype(int).tolist()
+    geometrias = carregar_malhas(codigos) if geometrias is None else geometrias
+    if not geometrias:
+        raise ValueError("Nenhuma geometria encontrada para os municípios do IQE.")
+    propriedades = {int(linha.cod_municipio): {'nome': linha.nome_municipio, 'iqe': round(float(linha.IQE), 2)}
+                    for linha in df.itertuples(index=False)}
+
+    topologia = _Topologia(geometrias, quantizacao)
+    mapa, n_pontos = topologia.topojson(tolerancia, propriedades)
+    tamanho = tamanho_comprimido(mapa)
+    while orcamento_bytes is not None and tamanho > orcamento_bytes:
+        print(f"-> Mapa com {tamanho / 1e3:.0f} KB (gzip) acima do orçamento de {orcamento_bytes / 1e3:.0f} KB "
+              f"com tolerância {tolerancia:g}°. Dobrando a tolerância...")
+        candidato, n_candidato = topologia.topojson(tolerancia * 2, propriedades)
+        if n_candidato == n_pontos:
+            # Só os extremos dos arcos restaram: simplificar mais não reduz o mapa
+            print(f"AVISO: o mapa continua com {tamanho / 1e3:.0f} KB (gzip), acima do orçamento.")
+            break
+        tolerancia, mapa, n_pontos = tolerancia * 2, candidato, n_candidato
+        tamanho = tamanho_comprimido(mapa)
+
+    mapa['_metadados'] = {'tolerancia': tolerancia, 'quantizacao': quantizacao, 'pontos_originais': topologia.n_pontos,
+                          'pontos': n_pontos, 'bytes_gzip': tamanho}
+    print(f"-> Mapa de {len(geometrias)} municípios: {topologia.n_pontos:,} -> {n_pontos:,} pontos em "
+          f"{topologia.n_arcos:,} arcos, {tamanho / 1e3:.1f} KB com gzip (tolerância {tolerancia:g}°).")
+    return mapa
+
+
+if __name__ == "__main__":
+    import pipeline
+    pipeline.obter('mapa')
@@ -0,0 +1,145 @@
+import json
+
+import pandas as pd
+
+import arquivos
+import cache
+import extract
+import instrumentacao
+
+
+# Siglas das UFs pelo código do IBGE (dois primeiros dígitos do código do município)
+SIGLAS_UF = {
+    11: 'RO', 12: 'AC', 13: 'AM', 14: 'RR', 15: 'PA', 16: 'AP', 17: 'TO',
+    21: 'MA', 22: 'PI', 23: 'CE', 24: 'RN', 25: 'PB', 26: 'PE', 27: 'AL', 28: 'SE', 29: 'BA',
+    31: 'MG', 32: 'ES', 33: 'RJ', 35: 'SP',
+    41: 'PR', 42: 'SC', 43: 'RS',
+    50: 'MS', 51: 'MT', 52: 'GO', 53: 'DF',
+}
+
+VERSAO_INDICE = 1
+
+
+def caminho_indice():
+    return cache.DIRETORIO_CACHE / 'indice_municipios.json'
+
+
+def _indice_vazio():
+    # 'chaves': "NOMENORMALIZADO|UF" -> lista de códigos IBGE
+    # 'municipios': código IBGE -> nome oficial e UF (na edição mais recente da DTB)
+    return {'versao': VERSAO_INDICE, 'anos': [], 'chaves': {}, 'municipios': {}}
+
+
+def carregar_indice():
+    """Lê o índice persistido; retorna um índice vazio se não existir ou for de outra versão."""
+    arquivo = caminho_indice()
+    if not arquivo.exists():
+        return _indice_vazio()
+    with open(arquivo, encoding='utf-8') as f:
+        indice = json.load(f)
+    if indice.get('versao') != VERSAO_INDICE:
+        print("-> Índice de municípios em formato antigo. Ele será reconstruído.")
+        return _indice_vazio()
+    return indice
+
+
+def salvar_indice(indice):
+    arquivos.gravar_json(caminho_indice(), indice, ensure_ascii=False)
+
+
+def incorporar_dtb(indice, df_dtb):
+    """
+    Acrescenta ao índice os municípios de uma ou mais edições da DTB.
+
+    Args:
+        indice (dict): Índice a ser atualizado (modificado no lugar).
+        df_dtb (pd.DataFrame): Saída de extract.ler_dtb().
+
+    Returns:
+        dict: O próprio índice atualizado.
+    """
+    df = df_dtb.dropna(subset=['id_mundv', 'ds_formatada']).sort_values('ano')
+    codigos = df['id_mundv'].astype(int)
+    siglas = (codigos // 100000).map(SIGLAS_UF)
+    chaves = df['ds_formatada'] + '|' + siglas
+
+    for chave, codigo in zip(chaves, codigos):
+        candidatos = indice['chaves'].setdefault(chave, [])
+        if codigo not in candidatos:
+            candidatos.append(codigo)
+    # Ordenado por ano: a edição mais recente define o nome oficial
+    for codigo, nome, uf, sigla in zip(codigos, df['ds_mun'], df['ds_uf'], siglas):
+        indice['municipios'][str(codigo)] = {'nome': nome, 'ds_uf': str(uf), 'sg_uf': sigla}
+
+    indice['anos'] = sorted(set(indice['anos']) | set(int(ano) for ano in df['ano'].unique()))
+    return indice
+
+
+def atualizar_indice(anos=None):
+    """
+    Garante que o índice contenha as edições pedidas da DTB, baixando e
+    normalizando apenas as que ainda não foram incorporadas.
+
+    Args:
+        anos (list, opcional): Edições desejadas. Por padrão, todas as de extract.ARQUIVOS_DTB.
+
+    Returns:
+        dict: O índice atualizado (e persistido em disco).
+    """
+    if anos is None:
+        anos = [info['ano'] for info in extract.ARQUIVOS_DTB]
+    indice = carregar_indice()
+    faltantes = sorted(set(anos) - set(indice['anos']))
+    if not faltantes:
+        print(f"-> Índice de municípios já atualizado (DTB {indice['anos']}).")
+        return indice
+
+    print(f"-> Incorporando ao índice de municípios as edições da DTB: {faltantes}")
+    df_dtb = extract.ler_dtb(anos=faltantes)
+    if df_dtb.empty:
+        print("ERRO: Nenhuma edição nova da DTB foi carregada. O índice não foi alterado.")
+        return indice
+    incorporar_dtb(indice, df_dtb)
+    salvar_indice(indice)
+    print(f"-> Índice salvo com {len(indice['municipios'])} municípios (DTB {indice['anos']}).")
+    return indice
+
+
+def buscar(indice, nome, sg_uf):
+    """Retorna os códigos IBGE que correspondem ao nome e à UF informados (consulta O(1))."""
+    nome_normalizado = extract.normalizar_nome(pd.Series([nome])).iloc[0]
+    return list(indice['chaves'].get(f"{nome_normalizado}|{sg_uf}", []))
+
+
+@instrumentacao.instrumentar('merge')
+def casar_municipios(df, indice, coluna_nome='ds_mun', coluna_uf='sg_uf'):
+    """
+    Associa cada linha de df (ex.: dados do IA) aos códigos IBGE do índice.
+
+    Returns:
+        tuple: (pd.DataFrame das linhas casadas, com 'cod_municipio', 'nome_municipio'
+                e 'ds_uf' acrescentadas — uma linha por candidato;
+                pd.DataFrame com as linhas sem correspondência ou ambíguas)
+    """
+    chaves = extract.normalizar_nome(df[coluna_nome]) + '|' + df[coluna_uf].astype(str).str.strip().str.upper()
+    candidatos = chaves.map(lambda chave: indice['chaves'].get(chave, []))
+    n_candidatos = candidatos.str.len()
+
+    relatorio = df.loc[n_candidatos != 1, [coluna_nome, coluna_uf]].copy()
+    relatorio['situacao'] = n_candidatos[n_candidatos != 1].map(lambda n: 'sem correspondência' if n == 0 else 'ambíguo')
+    relatorio['candidatos'] = candidatos[n_candidatos != 1]
+
+    casados = df.assign(cod_municipio=candidatos).explode('cod_municipio').dropna(subset=['cod_municipio'])
+    casados['cod_municipio'] = casados['cod_municipio'].astype(int)
+    municipios = casados['cod_municipio'].astype(str).map(indice['municipios'])
+    casados['nome_municipio'] = municipios.str['nome']
+    casados['ds_uf'] = municipios.str['ds_uf']
+    return casados.reset_index(drop=True), relatorio.reset_index(drop=True)
+
+
+def imprimir_relatorio_casamento(relatorio):
+    if relatorio.empty:
+        print("-> Todas as linhas tiveram exatamente um município correspondente.")
+        return
+    print(f"\nAVISO: {len(relatorio)} linha(s) sem correspondência única no índice de municípios:")
+    print(relatorio.drop_duplicates(subset=list(relatorio.columns[:3])).to_string(index=False))
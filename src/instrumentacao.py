@@ -0,0 +1,244 @@
+import atexit
+import cProfile
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+import arquivos
+
+try:
+    import resource  # Indisponível no Windows: o pico de RSS fica de fora do trace
+except ImportError:
+    resource = None
+
+
+# PORTAL_TRACE=1 (ou o caminho do arquivo) liga a coleta; PORTAL_PROFILE=1 grava também
+# um arquivo .prof do cProfile por etapa de nível mais alto de cada thread
+ARQUIVO_TRACE = Path(__file__).parent.parent / 'data' / 'trace.json'
+ATIVO = False
+PERFIL = False
+DIRETORIO_PERFIS = Path(__file__).parent.parent / 'data' / 'perfis'
+
+_trava = threading.Lock()
+_eventos = []
+_abertos = []           # eventos ainda em andamento, para atribuir o pico do tracemalloc
+_local = threading.local()
+_inicio_sessao = time.time()
+
+
+def ativar(arquivo=None, perfil=False):
+    """
+    Liga a instrumentação: tempos, CPU, memória e linhas de cada etapa passam a ser
+    registrados e, ao fim do processo, gravados em JSON (ver salvar_trace()).
+
+    Args:
+        arquivo (str ou Path, opcional): Destino do trace. Padrão: data/trace.json.
+        perfil (bool): Se True, grava um .prof do cProfile por etapa em DIRETORIO_PERFIS.
+    """
+    global ATIVO, PERFIL, ARQUIVO_TRACE
+    if arquivo is not None:
+        ARQUIVO_TRACE = Path(arquivo)
+    PERFIL = perfil
+    if not ATIVO:
+        ATIVO = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        atexit.register(salvar_trace)
+
+
+def desativar():
+    global ATIVO
+    ATIVO = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def rss_atual_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def rss_maximo_mb():
+    if resource is None:
+        return None
+    # ru_maxrss é dado em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _coletar_pico():
+    """Repassa o pico do tracemalloc a todos os eventos abertos e zera o pico global."""
+    _, pico = tracemalloc.get_traced_memory()
+    for evento in _abertos:
+        evento['_pico'] = max(evento['_pico'], pico)
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def medir(nome, categoria='etapa', **atributos):
+    """
+    Mede um bloco de código. Sem a instrumentação ativa, o custo é praticamente nulo.
+
+    O dicionário devolvido pode receber informações extras (ex.: linhas de entrada
+    e saída), que vão para o trace junto com as medidas. O pico de memória do
+    tracemalloc é o do processo durante o bloco: com etapas rodando em paralelo em
+    threads, ele inclui as alocações das etapas simultâneas.
+
+    Exemplo:
+        with instrumentacao.medir('iqe.analise_fatorial', 'modelo') as evento:
+            fa.fit(df_scaled)
+            evento['linhas_entrada'] = len(df_scaled)
+    """
+    evento = dict(atributos)
+    if not ATIVO:
+        yield evento
+        return
+
+    profundidade = getattr(_local, 'profundidade', 0)
+    _local.profundidade = profundidade + 1
+    perfil = None
+    if PERFIL and profundidade == 0:
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:  # Outro profiler já ativo nesta thread
+            perfil = None
+
+    with _trava:
+        _coletar_pico()
+        memoria_inicial, _ = tracemalloc.get_traced_memory()
+        evento.update(_pico=memoria_inicial)
+        _abertos.append(evento)
+    inicio, inicio_cpu, inicio_relogio = time.perf_counter(), time.thread_time(), time.time()
+    erro = None
+    try:
+        yield evento
+    except BaseException as e:
+        erro = e
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - inicio, time.thread_time() - inicio_cpu
+        if perfil is not None:
+            perfil.disable()
+            DIRETORIO_PERFIS.mkdir(parents=True, exist_ok=True)
+            perfil.dump_stats(DIRETORIO_PERFIS / f'{nome}.prof')
+        _local.profundidade = profundidade
+        with _trava:
+            _coletar_pico()
+            # Remoção por identidade: eventos diferentes podem ser dicionários iguais
+            _abertos[:] = [aberto for aberto in _abertos if aberto is not evento]
+            pico = evento.pop('_pico')
+            evento.update({
+                'nome': nome,
+                'categoria': categoria,
+                'thread': threading.current_thread().name,
+                'profundidade': profundidade,
+                'inicio_s': round(inicio_relogio - _inicio_sessao, 4),
+                'wall_s': round(wall, 4),
+                'cpu_s': round(cpu, 4),
+                'pico_tracemalloc_mb': round((pico - memoria_inicial) / 1e6, 3),
+                'rss_mb': rss_atual_mb(),
+                'rss_maximo_mb': rss_maximo_mb(),
+                'erro': None if erro is None else repr(erro),
+            })
+            _eventos.append(evento)
+
+
+def _contar_linhas(valor):
+    if isinstance(valor, pd.DataFrame):
+        return len(valor)
+    if isinstance(valor, tuple):
+        # Ex.: (X, y) da engenharia de atributos
+        return next((len(item) for item in valor if isinstance(item, (pd.DataFrame, pd.Series))), None)
+    return None
+
+
+def instrumentar(categoria='etapa', nome=None):
+    """
+    Decorador equivalente a medir() em torno de toda a função. Quando a função
+    retorna um DataFrame, o número de linhas da saída também é registrado.
+    """
+    def decorador(funcao):
+        rotulo = nome or f'{funcao.__module__}.{funcao.__name__}'
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if not ATIVO:
+                return funcao(*args, **kwargs)
+            with medir(rotulo, categoria) as evento:
+                linhas_entrada = [len(arg) for arg in args if isinstance(arg, pd.DataFrame)]
+                if linhas_entrada:
+                    evento['linhas_entrada'] = sum(linhas_entrada)
+                resultado = funcao(*args, **kwargs)
+                evento['linhas_saida'] = _contar_linhas(resultado)
+                return resultado
+        return envoltorio
+    return decorador
+
+
+def mesclar(nome, esquerda, direita, **kwargs):
+    """
+    pd.merge() instrumentado: registra linhas de cada lado e do resultado e, quando
+    a junção é por uma única coluna ('on'), quantas chaves de cada lado não chegaram
+    ao resultado, o que mostra em qual merge os municípios se perdem.
+    """
+    with medir(nome, 'merge') as evento:
+        resultado = pd.merge(esquerda, direita, **kwargs)
+        if ATIVO:
+            evento.update(linhas_esquerda=len(esquerda), linhas_direita=len(direita),
+                          linhas_saida=len(resultado), como=kwargs.get('how', 'inner'))
+            chave = kwargs.get('on')
+            if isinstance(chave, str):
+                chaves_resultado = set(resultado[chave].unique())
+                evento['chaves_perdidas_esquerda'] = len(set(esquerda[chave].unique()) - chaves_resultado)
+                evento['chaves_perdidas_direita'] = len(set(direita[chave].unique()) - chaves_resultado)
+    return resultado
+
+
+def eventos():
+    """Retorna uma cópia dos eventos registrados até agora, na ordem de término."""
+    with _trava:
+        return [dict(evento) for evento in _eventos]
+
+
+def zerar():
+    with _trava:
+        _eventos.clear()
+
+
+def salvar_trace(arquivo=None):
+    """Grava os eventos registrados em JSON e retorna o caminho, ou None se não há eventos."""
+    registrados = eventos()
+    if not registrados:
+        return None
+    destino = Path(arquivo) if arquivo is not None else ARQUIVO_TRACE
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    conteudo = {
+        'inicio': _inicio_sessao,
+        'pid': os.getpid(),
+        'rss_maximo_mb': rss_maximo_mb(),
+        'eventos': sorted(registrados, key=lambda evento: evento['inicio_s']),
+    }
+    arquivos.gravar_json(destino, conteudo, ensure_ascii=False, indent=2, default=str)
+    print(f"[trace] {len(registrados)} eventos gravados em {destino}.")
+    return destino
+
+
+def resumo():
+    """DataFrame com as medidas de cada evento, para inspeção rápida no console."""
+    colunas = ['nome', 'categoria', 'wall_s', 'cpu_s', 'pico_tracemalloc_mb', 'linhas_entrada', 'linhas_saida']
+    return pd.DataFrame(eventos()).reindex(columns=colunas)
+
+
+_variavel_trace = os.environ.get('PORTAL_TRACE', '')
+if _variavel_trace and _variavel_trace.lower() not in ('0', 'false', 'nao', 'não'):
+    ativar(arquivo=None if _variavel_trace.lower() in ('1', 'true', 'sim') else _variavel_trace,
+           perfil=os.environ.get('PORTAL_PROFILE', '0').lower() in ('1', 'true', 'sim'))
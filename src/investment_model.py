@@ -1,28 +1,73 @@
 # investment_model.py
 
+import heapq
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import lightgbm as lgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
-import iqe # Importa seu script para obter os dados atuais
+import instrumentacao
+
+ARQUIVO_HISTORICO_CSV = 'data/dados_historicos.csv'
+# Gerado por generate_simulated_data.gerar_dados_sinteticos_parquet(); tem precedência sobre o CSV
+ARQUIVO_HISTORICO_PARQUET = 'data/dados_historicos.parquet'
+
+# Colunas da tabela do IQE atual -> atributos "anteriores" usados pelo modelo
+COLUNAS_ATRIBUTOS_ATUAIS = {
+    'IQE': 'iqe_anterior',
+    'nota_saeb': 'nota_saeb_anterior',
+    'taxa_aprovacao': 'taxa_aprovacao_anterior',
+    'iqie_infraestrutura': 'iqie_infraestrutura_anterior',
+    'inse_socioeconomico': 'inse_socioeconomico_anterior',
+    'formacao_docente': 'formacao_docente_anterior',
+}
+
+# Candidatos avaliados por treinar_modelo_validacao_cruzada(). Só parâmetros do
+# booster: a discretização (max_bin) é feita uma vez e compartilhada por todos
+GRADE_HIPERPARAMETROS = [
+    {'num_leaves': 15, 'learning_rate': 0.05, 'min_child_samples': 20},
+    {'num_leaves': 31, 'learning_rate': 0.05, 'min_child_samples': 20},
+    {'num_leaves': 63, 'learning_rate': 0.05, 'min_child_samples': 50},
+    {'num_leaves': 31, 'learning_rate': 0.1, 'min_child_samples': 20,
+     'subsample': 0.8, 'subsample_freq': 1, 'colsample_bytree': 0.8},
+]
+
+# Até quantos municípios a alocação usa a programação dinâmica exata em vez da gulosa
+LIMITE_MUNICIPIOS_DP = 50
 
-def carregar_dados_historicos():
+def caminho_dados_historicos():
+    """Arquivo do histórico de treino: o Parquet, se existir, senão o CSV."""
+    return ARQUIVO_HISTORICO_PARQUET if os.path.exists(ARQUIVO_HISTORICO_PARQUET) else ARQUIVO_HISTORICO_CSV
+
+
+@instrumentacao.instrumentar('modelo')
+def carregar_dados_historicos(caminho=None):
     """
     Função para carregar e preparar os dados históricos.
     !! ATENÇÃO: Você precisará criar este arquivo 'dados_historicos.csv' !!
     Ele deve conter os dados de investimento e os IQEs de dois períodos.
+    Aceita também o Parquet de generate_simulated_data.gerar_dados_sinteticos_parquet().
+    Sem caminho, usa caminho_dados_historicos().
     """
+    caminho = caminho or caminho_dados_historicos()
     try:
         # Exemplo de como o arquivo 'dados_historicos.csv' deve ser:
         # cod_municipio, nome_municipio, iqe_anterior, nota_saeb_anterior, ..., valor_investido, iqe_recente
-        df_hist = pd.read_csv('data/dados_historicos.csv')
+        df_hist = pd.read_parquet(caminho) if str(caminho).endswith('.parquet') else pd.read_csv(caminho)
         print("-> Dados históricos carregados com sucesso.")
         return df_hist
     except FileNotFoundError:
-        print("ERRO: Arquivo 'dados_historicos.csv' não encontrado.")
+        print(f"ERRO: Arquivo '{caminho}' não encontrado.")
         print("Crie este arquivo com os dados históricos de investimento e IQE para treinar o modelo.")
         return None
 
+@instrumentacao.instrumentar('modelo')
 def engenharia_de_atributos(df):
     """
     Cria a variável alvo (delta_iqe) e seleciona as features.
@@ -53,10 +98,17 @@ def engenharia_de_atributos(df):
     print("-> Engenharia de atributos concluída. Variável alvo 'delta_iqe' criada.")
     return X, y
 
-def treinar_modelo_preditivo(X, y):
+@instrumentacao.instrumentar('modelo')
+def treinar_modelo_preditivo(X, y, validacao_cruzada=False, **opcoes):
     """
     Treina um modelo LightGBM para prever o delta_iqe.
+
+    Com validacao_cruzada=True, escolhe os hiperparâmetros e o número de árvores por
+    treinar_modelo_validacao_cruzada() (que recebe as demais opções).
     """
+    if validacao_cruzada:
+        model, _ = treinar_modelo_validacao_cruzada(X, y, **opcoes)
+        return model
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
     print("\n--- FASE: TREINANDO O MODELO PREDITIVO ---")
@@ -70,6 +122,107 @@ def treinar_modelo_preditivo(X, y):
     
     return model
 
+def _treinar_fold(arquivo_binario, n_linhas, parametros, fold, n_folds, semente, rodadas_maximas, paciencia,
+                  threads):
+    """
+    Treina um candidato em um fold, com parada antecipada pela perda de validação.
+    Roda em um processo do pool: lê o Dataset já discretizado do arquivo binário, em
+    vez de receber os dados brutos, e separa treino e validação por subconjuntos dele.
+    """
+    inicio = time.perf_counter()
+    rss_inicial = instrumentacao.rss_atual_mb()
+    ordem = np.random.default_rng(semente).permutation(n_linhas)
+    validacao = np.sort(np.array_split(ordem, n_folds)[fold])
+    treino = np.sort(np.setdiff1d(ordem, validacao, assume_unique=True))
+
+    dados = lgb.Dataset(str(arquivo_binario), params={'verbose': -1, 'feature_pre_filter': False})
+    conjunto_treino, conjunto_validacao = dados.subset(treino), dados.subset(validacao)
+    booster = lgb.train(
+        {'objective': 'regression', 'metric': 'l1', 'verbose': -1, 'num_threads': threads,
+         'seed': semente, **parametros},
+        conjunto_treino, num_boost_round=rodadas_maximas, valid_sets=[conjunto_validacao],
+        callbacks=[lgb.early_stopping(paciencia, verbose=False)])
+    rss_final = instrumentacao.rss_atual_mb()
+    return {
+        'fold': fold,
+        'mae': float(booster.best_score['valid_0']['l1']),
+        'melhor_iteracao': int(booster.best_iteration or booster.current_iteration()),
+        'tempo_s': time.perf_counter() - inicio,
+        'rss_delta_mb': None if rss_inicial is None else rss_final - rss_inicial,
+        'rss_pico_mb': instrumentacao.rss_maximo_mb(),
+    }
+
+
+@instrumentacao.instrumentar('modelo')
+def treinar_modelo_validacao_cruzada(X, y, candidatos=None, n_folds=5, rodadas_maximas=2000, paciencia=50,
+                                     max_workers=None, semente=42):
+    """
+    Seleção de modelo por validação cruzada k-fold, com parada antecipada.
+
+    Os dados são discretizados uma única vez (lgb.Dataset) e gravados em binário;
+    cada par candidato x fold roda em um processo do pool e lê esse arquivo, sem
+    repetir a discretização nem copiar os dados brutos entre processos. O melhor
+    candidato (menor MAE médio) é reajustado em todos os dados com o número médio
+    de iterações encontrado pela parada antecipada.
+
+    Args:
+        X (pd.DataFrame), y (pd.Series): Saída de engenharia_de_atributos().
+        candidatos (list, opcional): Dicionários de hiperparâmetros. Padrão: GRADE_HIPERPARAMETROS.
+        n_folds (int): Número de folds.
+        rodadas_maximas (int): Limite de árvores por ajuste.
+        paciencia (int): Rodadas sem melhora na validação antes de parar.
+        max_workers (int, opcional): Processos em paralelo. Padrão: número de CPUs.
+        semente (int): Semente da divisão dos folds e do LightGBM.
+
+    Returns:
+        tuple: (modelo LGBMRegressor reajustado, relatório por candidato com MAE médio,
+               desvio, iterações, tempo de ajuste e memória).
+    """
+    candidatos = candidatos or GRADE_HIPERPARAMETROS
+    max_workers = max_workers or os.cpu_count() or 1
+    tarefas = [(c, fold) for c in range(len(candidatos)) for fold in range(n_folds)]
+    max_workers = min(max_workers, len(tarefas))
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+
+    print(f"\n--- FASE: VALIDAÇÃO CRUZADA ({len(candidatos)} candidatos x {n_folds} folds, "
+          f"{max_workers} processo(s)) ---")
+    with tempfile.TemporaryDirectory(prefix='cv_lightgbm_') as diretorio:
+        arquivo_binario = Path(diretorio) / 'dados.bin'
+        with instrumentacao.medir('investment_model.discretizar', 'modelo', linhas_entrada=len(X)):
+            lgb.Dataset(X, label=y, params={'verbose': -1, 'feature_pre_filter': False}).save_binary(str(arquivo_binario))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {executor.submit(_treinar_fold, arquivo_binario, len(X), candidatos[c], fold, n_folds, semente,
+                                       rodadas_maximas, paciencia, threads): c
+                       for c, fold in tarefas}
+            resultados = [(futuros[futuro], futuro.result()) for futuro in futuros]
+
+    linhas = []
+    for c, parametros in enumerate(candidatos):
+        folds = pd.DataFrame([resultado for candidato, resultado in resultados if candidato == c])
+        linhas.append({
+            'candidato': c,
+            'parametros': parametros,
+            'mae_medio': folds['mae'].mean(),
+            'mae_desvio': folds['mae'].std(ddof=0),
+            'iteracoes_media': int(round(folds['melhor_iteracao'].mean())),
+            'tempo_ajuste_s': round(folds['tempo_s'].sum(), 3),
+            'tempo_medio_fold_s': round(folds['tempo_s'].mean(), 3),
+            'rss_delta_mb_maximo': folds['rss_delta_mb'].max(),
+            'rss_pico_mb': folds['rss_pico_mb'].max(),
+        })
+    relatorio = pd.DataFrame(linhas).sort_values('mae_medio').reset_index(drop=True)
+    print(relatorio.drop(columns='parametros').to_string(index=False))
+
+    melhor = relatorio.iloc[0]
+    print(f"-> Melhor candidato: {melhor['parametros']} (MAE médio de {melhor['mae_medio']:.4f} em {n_folds} folds). "
+          f"Reajustando com {melhor['iteracoes_media']} árvores em todos os dados...")
+    model = lgb.LGBMRegressor(random_state=semente, n_estimators=max(1, melhor['iteracoes_media']), verbose=-1,
+                              **melhor['parametros'])
+    model.fit(X, y)
+    return model, relatorio
+
+
+@instrumentacao.instrumentar('modelo')
 def gerar_recomendacoes_investimento(model, df_dados_atuais, investimento_simulado=100000):
     """
     Usa o modelo treinado para prever o impacto de um investimento simulado
@@ -81,14 +234,7 @@ def gerar_recomendacoes_investimento(model, df_dados_atuais, investimento_simula
     df_pred = df_dados_atuais.copy()
     
     # Renomeia colunas atuais para corresponder às features do modelo
-    df_pred.rename(columns={
-        'IQE': 'iqe_anterior',
-        'nota_saeb': 'nota_saeb_anterior',
-        'taxa_aprovacao': 'taxa_aprovacao_anterior',
-        'iqie_infraestrutura': 'iqie_infraestrutura_anterior',
-        'inse_socioeconomico': 'inse_socioeconomico_anterior',
-        'formacao_docente': 'formacao_docente_anterior'
-    }, inplace=True)
+    df_pred.rename(columns=COLUNAS_ATRIBUTOS_ATUAIS, inplace=True)
     
     # Adiciona a coluna do investimento simulado
     df_pred['valor_investido'] = investimento_simulado
@@ -116,27 +262,237 @@ def gerar_recomendacoes_investimento(model, df_dados_atuais, investimento_simula
     
     return df_resultado
 
+# Objetivos cuja saída é a soma das folhas, sem função de ligação
+OBJETIVOS_IDENTIDADE = ('regression', 'regression_l1', 'huber', 'fair', 'quantile')
+
+
+def _curvas_pelas_arvores(booster, atributos, coluna_investimento, niveis):
+    """
+    Curvas de resposta direto das árvores do LightGBM, sem uma predição por nível.
+
+    Como só o investimento varia ao longo da curva, cada folha vale para um conjunto
+    de municípios (definido pelas demais variáveis) e um intervalo de investimento.
+    Folhas com o mesmo intervalo são somadas, e a curva é (municípios x intervalos) @
+    (intervalos x níveis): um produto de matrizes em vez de municípios x níveis
+    travessias de cada árvore.
+
+    Returns:
+        np.ndarray ou None: Predições (municípios, níveis), ou None se o modelo usa algo
+                            que esta avaliação não cobre (ex.: variáveis categóricas).
+    """
+    modelo = booster.dump_model()
+    if str(modelo.get('objective', '')).split()[0] not in OBJETIVOS_IDENTIDADE:
+        return None
+    por_intervalo = {}  # (mínimo, máximo] do investimento -> soma das folhas de cada município
+
+    def percorrer(no, alcanca, minimo, maximo):
+        if 'leaf_value' in no:
+            contribuicao = alcanca * no['leaf_value']
+            if (minimo, maximo) in por_intervalo:
+                por_intervalo[(minimo, maximo)] += contribuicao
+            else:
+                por_intervalo[(minimo, maximo)] = contribuicao
+            return True
+        if no.get('decision_type') != '<=':
+            return False
+        coluna, limiar = no['split_feature'], no['threshold']
+        if coluna == coluna_investimento:
+            # Investimento <= limiar vai para a esquerda
+            return (percorrer(no['left_child'], alcanca, minimo, min(maximo, limiar))
+                    and percorrer(no['right_child'], alcanca, max(minimo, limiar), maximo))
+        valores = atributos[:, coluna]
+        esquerda = valores <= limiar
+        if np.isnan(valores).any():
+            esquerda = np.where(np.isnan(valores), no.get('default_left', True), esquerda)
+        return (percorrer(no['left_child'], alcanca & esquerda, minimo, maximo)
+                and percorrer(no['right_child'], alcanca & ~esquerda, minimo, maximo))
+
+    todos = np.ones(len(atributos), dtype=bool)
+    for arvore in modelo['tree_info']:
+        if not percorrer(arvore['tree_structure'], todos, -np.inf, np.inf):
+            return None
+    minimos, maximos = np.array(list(por_intervalo)).T
+    no_intervalo = (niveis[None, :] > minimos[:, None]) & (niveis[None, :] <= maximos[:, None])
+    return np.column_stack(list(por_intervalo.values())) @ no_intervalo.astype('float64')
+
+
+@instrumentacao.instrumentar('modelo')
+def calcular_curvas_de_resposta(model, df_dados_atuais, niveis):
+    """
+    Prevê a melhoria do IQE de cada município para cada nível de investimento, de uma
+    vez para todas as combinações município x nível: pelas árvores do modelo quando
+    possível (_curvas_pelas_arvores) e, senão, com uma única chamada a model.predict().
+
+    Returns:
+        np.ndarray: Melhoria estimada (municípios, níveis), relativa ao nível 0 quando
+                    o primeiro nível é 0 (o modelo pode prever delta_iqe != 0 sem investimento).
+    """
+    df_pred = df_dados_atuais.rename(columns=COLUNAS_ATRIBUTOS_ATUAIS)
+    features_modelo = list(model.feature_name_)
+    niveis = np.asarray(niveis, dtype='float64')
+    n, n_niveis = len(df_pred), len(niveis)
+    atributos = np.column_stack([
+        np.zeros(n) if feature == 'valor_investido' else df_pred[feature].to_numpy(dtype='float64')
+        for feature in features_modelo])
+
+    previsto = _curvas_pelas_arvores(model.booster_, atributos, features_modelo.index('valor_investido'), niveis)
+    if previsto is None:
+        # Repete as linhas de cada município para todos os níveis e prevê tudo de uma vez
+        em_grade = np.repeat(atributos, n_niveis, axis=0)
+        em_grade[:, features_modelo.index('valor_investido')] = np.tile(niveis, n)
+        previsto = model.predict(pd.DataFrame(em_grade, columns=features_modelo)).reshape(n, n_niveis)
+    if niveis[0] == 0:
+        previsto = previsto - previsto[:, :1]
+    return previsto
+
+
+def _envoltoria_concava(ganhos, niveis):
+    """
+    Envoltória côncava superior de cada curva, a partir do nível 0, só com trechos de
+    ganho positivo. Vetorizada entre municípios: cada passo acha, para todos de uma
+    vez, o ponto seguinte de maior inclinação (o mais distante, em caso de empate).
+
+    Returns:
+        list: Trechos (município, nível inicial, nível final, inclinação), com
+              inclinações decrescentes para cada município.
+    """
+    n, n_niveis = ganhos.shape
+    atual = np.zeros(n, dtype='int64')
+    ativos = np.arange(n)
+    trechos = []
+    while len(ativos):
+        x0 = niveis[atual[ativos]][:, None]
+        g0 = ganhos[ativos, atual[ativos]][:, None]
+        distancia = niveis[None, :] - x0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inclinacao = np.where(distancia > 0, (ganhos[ativos] - g0) / distancia, -np.inf)
+        melhor = inclinacao.max(axis=1)
+        empatados = inclinacao >= melhor[:, None] * (1 - 1e-12)
+        proximo = n_niveis - 1 - np.argmax(empatados[:, ::-1], axis=1)
+        segue = melhor > 0
+        for i, de, para, inclinacao_trecho in zip(ativos[segue], atual[ativos[segue]], proximo[segue], melhor[segue]):
+            trechos.append((i, de, para, inclinacao_trecho))
+        atual[ativos[segue]] = proximo[segue]
+        ativos = ativos[segue]
+    return trechos
+
+
+def _alocar_guloso(ganhos, niveis, orcamento):
+    """
+    Alocação gulosa pelo maior ganho marginal por real, com uma heap de trechos da
+    envoltória côncava de cada curva. Ótima para curvas côncavas, salvo o resto de
+    orçamento que não cobre o próximo trecho.
+    """
+    por_municipio = {}
+    for i, de, para, inclinacao in _envoltoria_concava(ganhos, niveis):
+        por_municipio.setdefault(i, []).append((de, para, inclinacao))
+
+    heap = [(-trechos[0][2], i, 0) for i, trechos in por_municipio.items()]
+    heapq.heapify(heap)
+    escolhido = np.zeros(len(ganhos), dtype='int64')
+    restante = orcamento
+    while heap:
+        _, i, k = heapq.heappop(heap)
+        de, para, _ = por_municipio[i][k]
+        custo = niveis[para] - niveis[de]
+        if custo > restante + 1e-9:
+            continue  # Os trechos seguintes deste município dependem deste
+        restante -= custo
+        escolhido[i] = para
+        if k + 1 < len(por_municipio[i]):
+            heapq.heappush(heap, (-por_municipio[i][k + 1][2], i, k + 1))
+    return escolhido
+
+
+def _alocar_dp(ganhos, niveis, orcamento):
+    """
+    Alocação exata (mochila de múltipla escolha) sobre a grade de níveis, que deve ser
+    uniforme: o custo do nível k é k passos. O(municípios x níveis x capacidade).
+    """
+    n, n_niveis = ganhos.shape
+    passo = niveis[1] - niveis[0]
+    capacidade = int(np.floor(orcamento / passo + 1e-9))
+    melhor = np.zeros(capacidade + 1)
+    escolhas = np.zeros((n, capacidade + 1), dtype='int64')
+    for i in range(n):
+        novo = melhor.copy()
+        for k in range(1, min(n_niveis - 1, capacidade) + 1):
+            candidato = melhor[:-k] + ganhos[i, k]
+            melhora = candidato > novo[k:]
+            novo[k:] = np.where(melhora, candidato, novo[k:])
+            escolhas[i, k:] = np.where(melhora, k, escolhas[i, k:])
+        melhor = novo
+
+    escolhido = np.zeros(n, dtype='int64')
+    c = capacidade
+    for i in range(n - 1, -1, -1):
+        escolhido[i] = escolhas[i, c]
+        c -= escolhido[i]
+    return escolhido
+
+
+@instrumentacao.instrumentar('modelo')
+def otimizar_alocacao(model, df_dados_atuais, orcamento, investimento_maximo=None, n_niveis=200, metodo='auto'):
+    """
+    Distribui um orçamento total entre os municípios para maximizar a melhoria prevista do IQE.
+
+    As curvas de resposta (melhoria estimada x investimento) são calculadas numa grade
+    de n_niveis níveis de 0 a investimento_maximo, com uma única predição em lote.
+
+    Args:
+        model: Modelo treinado por treinar_modelo_preditivo().
+        df_dados_atuais (pd.DataFrame): Tabela do IQE atual (ex.: iqe.calcular_iqe()).
+        orcamento (float): Orçamento total, em reais.
+        investimento_maximo (float, opcional): Teto por município. Padrão: o orçamento.
+        n_niveis (int): Quantos níveis de investimento acima de zero avaliar.
+        metodo (str): 'guloso' (heap de ganhos marginais), 'dp' (exato na grade) ou
+            'auto' (dp até LIMITE_MUNICIPIOS_DP municípios).
+
+    Returns:
+        tuple: (df_alocacao, df_curvas). df_alocacao tem o investimento alocado, a
+               melhoria estimada e o retorno por real de cada município; df_curvas tem
+               a curva de resposta de cada município (uma coluna por nível).
+    """
+    investimento_maximo = orcamento if investimento_maximo is None else investimento_maximo
+    niveis = np.linspace(0, investimento_maximo, n_niveis + 1)
+    ganhos = calcular_curvas_de_resposta(model, df_dados_atuais, niveis)
+
+    if metodo == 'auto':
+        metodo = 'dp' if len(df_dados_atuais) <= LIMITE_MUNICIPIOS_DP else 'guloso'
+    if metodo == 'dp':
+        escolhido = _alocar_dp(ganhos, niveis, orcamento)
+    elif metodo == 'guloso':
+        escolhido = _alocar_guloso(ganhos, niveis, orcamento)
+    else:
+        raise ValueError(f"Método de alocação desconhecido: '{metodo}'. Use 'guloso', 'dp' ou 'auto'.")
+
+    investimento = niveis[escolhido]
+    melhoria = ganhos[np.arange(len(ganhos)), escolhido]
+    df_alocacao = df_dados_atuais[['cod_municipio', 'nome_municipio', 'ds_uf', 'IQE']].rename(
+        columns={'IQE': 'IQE_Atual'}).reset_index(drop=True)
+    df_alocacao['Investimento_Alocado'] = investimento
+    df_alocacao['Melhoria_Estimada_IQE'] = melhoria
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df_alocacao['Retorno_por_Real'] = np.where(investimento > 0, melhoria / investimento, 0.0)
+    df_alocacao = df_alocacao.sort_values(by=['Investimento_Alocado', 'Melhoria_Estimada_IQE'],
+                                          ascending=False).reset_index(drop=True)
+
+    df_curvas = pd.DataFrame(ganhos, index=df_dados_atuais['cod_municipio'].to_numpy(), columns=niveis)
+    df_curvas.index.name = 'cod_municipio'
+    print(f"-> Orçamento de R$ {orcamento:,.2f} alocado ({metodo}): R$ {investimento.sum():,.2f} em "
+          f"{int((investimento > 0).sum())} municípios, melhoria estimada total de {melhoria.sum():.4f} no IQE.")
+    return df_alocacao, df_curvas
+
 # Bloco de Execução Principal
 if __name__ == "__main__":
-    # 1. Carregar dados históricos para treino
-    df_historico = carregar_dados_historicos()
-    
-    if df_historico is not None:
-        # 2. Preparar dados para o modelo
-        X, y = engenharia_de_atributos(df_historico)
-        
-        if X is not None:
-            # 3. Treinar o modelo
-            modelo = treinar_modelo_preditivo(X, y)
-            
-            # 4. Carregar os dados atuais (executando a lógica do iqe.py)
-            print("\n--- FASE: CARREGANDO DADOS ATUAIS DOS MUNICÍPIOS ---")
-            df_atual_completo = iqe.calcular_iqe()
-            
-            if not df_atual_completo.empty:
-                # 5. Gerar e exibir as recomendações
-                df_recomendacoes = gerar_recomendacoes_investimento(modelo, df_atual_completo)
-                
-                print("\n\n--- RANKING DE PRIORIZAÇÃO DE INVESTIMENTO ---")
-                print("Municípios ordenados pelo maior potencial de melhoria do IQE com um investimento padrão:")
-                print(df_recomendacoes)
\ No newline at end of file
+    # Importado aqui porque o pipeline importa este módulo para registrar os estágios do modelo
+    import pipeline
+
+    # Dados históricos, treino do modelo e IQE atual são estágios do pipeline:
+    # o ramo do modelo e o ramo do IQE rodam em paralelo e só o que mudou é recalculado
+    df_recomendacoes = pipeline.obter('recomendacoes')
+
+    if not df_recomendacoes.empty:
+        print("\n\n--- RANKING DE PRIORIZAÇÃO DE INVESTIMENTO ---")
+        print("Municípios ordenados pelo maior potencial de melhoria do IQE com um investimento padrão:")
+        print(df_recomendacoes)
@@ -1,58 +1,357 @@
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-from factor_analyzer import FactorAnalyzer
-from factor_analyzer import calculate_bartlett_sphericity, calculate_kmo
+import arquivos
+import instrumentacao
 import transform
 
-def calcular_iqe():
+# Variáveis que compõem o IQE, na ordem usada pela análise fatorial
+VARIAVEIS_IQE = ['nota_saeb', 'taxa_aprovacao', 'iqie_infraestrutura', 'inse_socioeconomico', 'formacao_docente']
+
+# Artefato do modelo ajustado, usado para pontuar novos dados sem refazer a análise fatorial
+ARQUIVO_MODELO_IQE = Path(__file__).parent.parent / 'data' / 'modelo_iqe.json'
+VERSAO_MODELO_IQE = 1
+
+# Limite das comunalidades no solver de 1 fator do bootstrap, o mesmo do
+# FactorAnalyzer (unicidades entre 0,005 e 1)
+COMUNALIDADE_MAXIMA = 0.995
+# Reamostras com correlação singular (poucos municípios distintos, coluna constante)
+# não têm análise fatorial: são sorteadas de novo até tantas vezes, e então descartadas
+TENTATIVAS_REAMOSTRA = 10
+AUTOVALOR_MINIMO = 1e-8
+
+
+@instrumentacao.instrumentar('modelo')
+def ajustar_modelo_iqe(df_valores):
+    """
+    Ajusta o modelo do IQE: padronização (Z-Score), análise fatorial de 1 fator,
+    pesos (cargas ao quadrado normalizadas) e a faixa de referência da escala 1 a 10.
+
+    Args:
+        df_valores (pd.DataFrame): Municípios com as colunas de VARIAVEIS_IQE, sem valores nulos.
+
+    Returns:
+        dict: O artefato do modelo (serializável em JSON), a ser usado em pontuar_iqe().
+    """
+    # Importado aqui: só o ajuste depende do factor_analyzer, a pontuação não
+    from factor_analyzer import FactorAnalyzer
+
+    scaler = StandardScaler()
+    df_scaled = pd.DataFrame(scaler.fit_transform(df_valores[VARIAVEIS_IQE]), columns=VARIAVEIS_IQE)
+    with instrumentacao.medir('iqe.analise_fatorial', 'modelo', linhas_entrada=len(df_scaled)):
+        fa = FactorAnalyzer(n_factors=1)
+        fa.fit(df_scaled)
+    cargas = fa.loadings_[:, 0]
+    pesos = cargas ** 2 / (cargas ** 2).sum()
+    iqe_original = df_scaled.to_numpy() @ pesos
+    return {
+        'versao': VERSAO_MODELO_IQE,
+        'variaveis': list(VARIAVEIS_IQE),
+        'medias': scaler.mean_.tolist(),
+        'desvios': scaler.scale_.tolist(),
+        'cargas': cargas.tolist(),
+        'pesos': pesos.tolist(),
+        'minimo': float(iqe_original.min()),
+        'maximo': float(iqe_original.max()),
+        'n_municipios': int(len(df_valores)),
+        'ajustado_em': time.time(),
+    }
+
+
+def pontuar_iqe(df, modelo, limitar_escala=False):
+    """
+    Aplica um modelo já ajustado a qualquer número de municípios, com uma única
+    multiplicação de matriz e sem refazer a análise fatorial. O IQE de um município
+    não depende dos demais pontuados junto com ele.
+
+    Args:
+        df (pd.DataFrame): Dados com as colunas do modelo (linhas com nulos recebem IQE nulo).
+        modelo (dict): Artefato de ajustar_modelo_iqe() ou carregar_modelo_iqe().
+        limitar_escala (bool): Municípios fora da faixa do ajuste podem ficar abaixo
+            de 1 ou acima de 10; se True, o IQE é limitado a esse intervalo.
+
+    Returns:
+        pd.DataFrame: Cópia de df com as colunas 'IQE_original' e 'IQE'.
+    """
+    valores = df[modelo['variaveis']].to_numpy(dtype='float64')
+    padronizados = (valores - np.asarray(modelo['medias'])) / np.asarray(modelo['desvios'])
+    iqe_original = padronizados @ np.asarray(modelo['pesos'])
+    iqe_0a1 = (iqe_original - modelo['minimo']) / (modelo['maximo'] - modelo['minimo'])
+    resultado = df.copy()
+    resultado['IQE_original'] = iqe_original
+    resultado['IQE'] = np.clip(iqe_0a1 * 9 + 1, 1, 10) if limitar_escala else iqe_0a1 * 9 + 1
+    return resultado
+
+
+def salvar_modelo_iqe(modelo, caminho=None):
+    """Grava o artefato do modelo em JSON (escrita atômica). Retorna o caminho gravado."""
+    destino = Path(caminho) if caminho is not None else ARQUIVO_MODELO_IQE
+    return arquivos.gravar_json(destino, modelo, indent=2)
+
+
+def carregar_modelo_iqe(caminho=None):
+    """Lê um artefato gravado por salvar_modelo_iqe(). Retorna None se ele não existir."""
+    origem = Path(caminho) if caminho is not None else ARQUIVO_MODELO_IQE
+    if not origem.exists():
+        return None
+    with open(origem, encoding='utf-8') as f:
+        modelo = json.load(f)
+    if modelo.get('versao') != VERSAO_MODELO_IQE:
+        raise ValueError(f"Modelo do IQE em '{origem}' tem versão {modelo.get('versao')}, "
+                         f"esperada {VERSAO_MODELO_IQE}. Ajuste-o novamente.")
+    return modelo
+
+
+def imprimir_pesos(modelo):
+    pesos_df = pd.DataFrame({'Peso': modelo['pesos']}, index=modelo['variaveis'])
+    pesos_df['Peso (%)'] = (pesos_df['Peso'] * 100).map('{:.2f}%'.format)
+    print("\nPesos calculados para cada variável:")
+    print(pesos_df.sort_values(by='Peso', ascending=False))
+
+
+@instrumentacao.instrumentar('iqe')
+def calcular_iqe(df_base=None, modelo=None):
     """
     Executa a análise fatorial, calcula o IQE e cria um índice final 
     em uma escala de 1 a 10. Retorna um DataFrame completo para visualização.
+
+    Args:
+        df_base (pd.DataFrame, opcional): Base consolidada já calculada (ex.: pelo
+            pipeline). Se omitida, é gerada por transform.criar_base_de_analise_completa().
+        modelo (dict, opcional): Modelo já ajustado (ver carregar_modelo_iqe()). Se
+            informado, os municípios são apenas pontuados, sem novo ajuste.
     """
     print("--- FASE 1: CARREGANDO DADOS CONSOLIDADOS ---")
-    df_base = transform.criar_base_de_analise_completa()
+    if df_base is None:
+        df_base = transform.criar_base_de_analise_completa()
     if df_base.empty: return pd.DataFrame()
 
     print("\n--- FASE 2: PREPARANDO DADOS PARA ANÁLISE FATORIAL ---")
-    variaveis_analise = ['nota_saeb', 'taxa_aprovacao', 'iqie_infraestrutura', 'inse_socioeconomico', 'formacao_docente']
-    df_analise = df_base.dropna(subset=variaveis_analise).copy()
-    if len(df_analise) < 10: return pd.DataFrame()
-    
-    df_valores = df_analise[variaveis_analise]
-    scaler = StandardScaler()
-    df_scaled = pd.DataFrame(scaler.fit_transform(df_valores), columns=variaveis_analise)
-    print("-> Variáveis padronizadas com sucesso (Z-Score).")
-
-    print("\n--- FASE 3: EXECUTANDO ANÁLISE FATORIAL E EXIBINDO PESOS ---")
-    fa = FactorAnalyzer(n_factors=1)
-    fa.fit(df_scaled)
-    cargas_fatoriais = pd.DataFrame(fa.loadings_, index=variaveis_analise, columns=['Carga_Fatorial'])
-    cargas_ao_quadrado = cargas_fatoriais['Carga_Fatorial'] ** 2
-    soma_cargas_ao_quadrado = cargas_ao_quadrado.sum()
-    pesos = cargas_ao_quadrado / soma_cargas_ao_quadrado
-    pesos_df = pesos.to_frame(name='Peso')
-    pesos_df['Peso (%)'] = (pesos_df['Peso'] * 100).map('{:.2f}%'.format)
-    print("\nPesos calculados para cada variável:")
-    print(pesos_df.sort_values(by='Peso', ascending=False))
+    df_analise = df_base.dropna(subset=VARIAVEIS_IQE).copy()
+    if modelo is None and len(df_analise) < 10: return pd.DataFrame()
+
+    if modelo is None:
+        print("\n--- FASE 3: EXECUTANDO ANÁLISE FATORIAL E EXIBINDO PESOS ---")
+        modelo = ajustar_modelo_iqe(df_analise)
+        print("-> Variáveis padronizadas (Z-Score) e análise fatorial concluída.")
+    else:
+        print("\n--- FASE 3: USANDO MODELO JÁ AJUSTADO (SEM NOVA ANÁLISE FATORIAL) ---")
+    imprimir_pesos(modelo)
 
     print("\n--- FASE 4: CALCULANDO E NORMALIZANDO O IQE ---")
-    df_analise['IQE_original'] = np.dot(df_scaled, pesos)
+    df_analise = pontuar_iqe(df_analise, modelo)
     df_analise.sort_values(by='IQE_original', ascending=False, inplace=True)
     df_analise.reset_index(drop=True, inplace=True)
-    
-    min_iqe = df_analise['IQE_original'].min()
-    max_iqe = df_analise['IQE_original'].max()
-    iqe_0a1 = (df_analise['IQE_original'] - min_iqe) / (max_iqe - min_iqe)
-    df_analise['IQE'] = (iqe_0a1 * 9) + 1
     print("-> Coluna 'IQE' final criada na escala de 1 a 10.")
     
     # Retorna o DataFrame completo com as colunas originais e o IQE calculado
     return df_analise
 
+def cargas_um_fator(correlacoes, iteracoes=500, tolerancia=1e-10):
+    """
+    Cargas de 1 fator para um lote de matrizes de correlação, todas de uma vez.
+
+    Usa a fatoração por eixos principais iterada (comunalidades iniciais pelas
+    correlações múltiplas ao quadrado), cujo ponto fixo é a solução de mínimos
+    resíduos (minres) usada pelo FactorAnalyzer. Com 5 variáveis, cada iteração é
+    um eigh em lote de matrizes 5x5, então milhares de reamostras cabem em milissegundos.
+
+    Args:
+        correlacoes (np.ndarray): Matrizes (lote, p, p).
+
+    Returns:
+        np.ndarray: Cargas (lote, p), com sinal positivo na soma.
+    """
+    indices = np.arange(correlacoes.shape[-1])
+    # Pseudo-inversa: uma matriz quase singular não derruba o lote inteiro. Sem
+    # diagonal acima de 1, a correlação múltipla não existe e o início é 0
+    diagonal = np.diagonal(np.linalg.pinv(correlacoes, hermitian=True), axis1=1, axis2=2)
+    comunalidades = np.where(diagonal > 1, 1 - 1 / np.maximum(diagonal, 1), 0)
+    comunalidades = np.clip(comunalidades, 0, COMUNALIDADE_MAXIMA)
+    reduzidas = correlacoes.copy()
+    for _ in range(iteracoes):
+        reduzidas[:, indices, indices] = comunalidades
+        autovalores, autovetores = np.linalg.eigh(reduzidas)
+        cargas = autovetores[:, :, -1] * np.sqrt(np.maximum(autovalores[:, -1], 0))[:, None]
+        novas = np.clip(cargas ** 2, 0, COMUNALIDADE_MAXIMA)
+        convergiu = np.abs(novas - comunalidades).max() < tolerancia
+        comunalidades = novas
+        if convergiu:
+            break
+    return cargas * np.sign(cargas.sum(axis=1, keepdims=True))
+
+
+def _momentos_reamostras(centrados, sorteios):
+    """Contagens, médias, desvios e correlações de cada reamostra (uma por linha de sorteios)."""
+    n, p = centrados.shape
+    n_reamostras = len(sorteios)
+    # Quantas vezes cada município entrou em cada reamostra: os momentos saem de um
+    # produto de matrizes, sem materializar as reamostras (lote, n, p)
+    contagens = np.bincount((sorteios + np.arange(n_reamostras)[:, None] * n).ravel(),
+                            minlength=n_reamostras * n).reshape(n_reamostras, n).astype('float64')
+    medias = contagens @ centrados / n
+    produtos = (centrados[:, :, None] * centrados[:, None, :]).reshape(n, p * p)
+    covariancias = (contagens @ produtos / n).reshape(-1, p, p) - medias[:, :, None] * medias[:, None, :]
+    desvios = np.sqrt(np.maximum(np.diagonal(covariancias, axis1=1, axis2=2), 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacoes = covariancias / (desvios[:, :, None] * desvios[:, None, :])
+    return contagens, medias, desvios, correlacoes
+
+
+def _reamostras_degeneradas(linhas, sorteios, desvios, correlacoes, desvios_base):
+    """
+    Reamostras sem análise fatorial possível: menos de p + 1 municípios distintos
+    (linhas repetidas contam uma vez), alguma coluna constante ou correlação singular.
+    """
+    p = desvios.shape[1]
+    distintos = (np.diff(np.sort(linhas[sorteios], axis=1), axis=1) != 0).sum(axis=1) + 1
+    # Desvio nulo aparece como resíduo de arredondamento, não como zero exato
+    degeneradas = (distintos < p + 1) | (desvios <= 1e-8 * desvios_base).any(axis=1)
+    degeneradas |= ~np.isfinite(correlacoes).all(axis=(1, 2))
+    candidatas = np.flatnonzero(~degeneradas)
+    if len(candidatas):
+        degeneradas[candidatas] = np.linalg.eigvalsh(correlacoes[candidatas])[:, 0] < AUTOVALOR_MINIMO
+    return degeneradas
+
+
+def _lote_bootstrap(valores, n_reamostras, semente):
+    """
+    Reajusta o modelo em n_reamostras reamostras de valores e pontua todos os
+    municípios com cada uma. Roda em um processo do pool de bootstrap_iqe().
+
+    Reamostras degeneradas (ver _reamostras_degeneradas()) são sorteadas de novo até
+    TENTATIVAS_REAMOSTRA vezes; as que continuam degeneradas ficam de fora.
+
+    Returns:
+        tuple: (pesos (lote, p), IQE (lote, n) em float32, posições (lote, n) em int32,
+                reamostras sorteadas de novo, reamostras descartadas).
+    """
+    n = len(valores)
+    rng = np.random.default_rng(semente)
+    sorteios = rng.integers(0, n, size=(n_reamostras, n))
+    centrados = valores - valores.mean(axis=0)
+    linhas = np.unique(valores, axis=0, return_inverse=True)[1].ravel()
+    desvios_base = valores.std(axis=0)
+    sorteadas_de_novo = 0
+    for tentativa in range(TENTATIVAS_REAMOSTRA + 1):
+        contagens, medias, desvios, correlacoes = _momentos_reamostras(centrados, sorteios)
+        degeneradas = _reamostras_degeneradas(linhas, sorteios, desvios, correlacoes, desvios_base)
+        if not degeneradas.any() or tentativa == TENTATIVAS_REAMOSTRA:
+            break
+        sorteadas_de_novo += int(degeneradas.sum())
+        sorteios[degeneradas] = rng.integers(0, n, size=(int(degeneradas.sum()), n))
+    validas = ~degeneradas
+    contagens, medias, desvios, correlacoes = contagens[validas], medias[validas], desvios[validas], correlacoes[validas]
+    n_reamostras = len(contagens)
+    if n_reamostras == 0:
+        p = valores.shape[1]
+        return (np.empty((0, p)), np.empty((0, n), dtype='float32'), np.empty((0, n), dtype='int32'),
+                sorteadas_de_novo, int(degeneradas.sum()))
+
+    cargas = cargas_um_fator(correlacoes)
+    pesos = cargas ** 2 / (cargas ** 2).sum(axis=1, keepdims=True)
+    # (x - média_b) / desvio_b @ pesos_b, para todos os municípios e reamostras
+    coeficientes = pesos / desvios
+    iqe_original = centrados @ coeficientes.T - (medias * coeficientes).sum(axis=1)
+    iqe_original = iqe_original.T
+    # A escala de 1 a 10 de cada reamostra vem dos municípios sorteados nela
+    sorteado = contagens > 0
+    minimo = np.where(sorteado, iqe_original, np.inf).min(axis=1, keepdims=True)
+    maximo = np.where(sorteado, iqe_original, -np.inf).max(axis=1, keepdims=True)
+    iqe_escala = (iqe_original - minimo) / (maximo - minimo) * 9 + 1
+    posicoes = np.empty((n_reamostras, n), dtype='int32')
+    np.put_along_axis(posicoes, np.argsort(-iqe_original, axis=1),
+                      np.arange(1, n + 1, dtype='int32')[None, :], axis=1)
+    return pesos, iqe_escala.astype('float32'), posicoes, sorteadas_de_novo, int(degeneradas.sum())
+
+
+@instrumentacao.instrumentar('modelo')
+def bootstrap_iqe(df_base, n_reamostras=1000, nivel=0.95, semente=0, tamanho_lote=250,
+                  paralelo=True, max_workers=None):
+    """
+    Intervalos de confiança bootstrap para os pesos, o IQE e a posição de cada município.
+
+    Cada reamostra sorteia os municípios com reposição, refaz padronização e
+    análise fatorial (com cargas_um_fator(), em lote) e pontua todos os municípios.
+    Os intervalos são os percentis das reamostras. Os lotes são distribuídos em um
+    pool de processos e cada um tem sua própria semente (derivada de 'semente'), então
+    o resultado não depende do número de processos.
+
+    Args:
+        df_base (pd.DataFrame): Base consolidada (linhas com nulos em VARIAVEIS_IQE são ignoradas).
+        n_reamostras (int): Número de reamostras bootstrap.
+        nivel (float): Nível de confiança dos intervalos.
+        semente (int): Semente do gerador aleatório.
+        tamanho_lote (int): Reamostras processadas juntas em cada tarefa.
+        paralelo (bool): Distribui os lotes em processos. Se False, roda tudo neste processo.
+        max_workers (int, opcional): Número de processos. Padrão: número de CPUs.
+
+    Returns:
+        tuple: (df_pesos, df_municipios). df_pesos tem uma linha por variável com o peso
+               e seu intervalo; df_municipios tem o IQE, a posição e os intervalos de ambos,
+               ordenado pelo IQE.
+    """
+    df_analise = df_base.dropna(subset=VARIAVEIS_IQE).reset_index(drop=True)
+    if len(df_analise) < 10:
+        raise ValueError(f"São necessários ao menos 10 municípios com dados completos, há {len(df_analise)}.")
+    valores = df_analise[VARIAVEIS_IQE].to_numpy(dtype='float64')
+
+    lotes = [min(tamanho_lote, n_reamostras - inicio) for inicio in range(0, n_reamostras, tamanho_lote)]
+    sementes = np.random.SeedSequence(semente).spawn(len(lotes))
+    print(f"-> Bootstrap do IQE: {n_reamostras} reamostras de {len(df_analise)} municípios em {len(lotes)} lote(s)...")
+    inicio = time.perf_counter()
+    if paralelo and len(lotes) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            resultados = list(executor.map(_lote_bootstrap, [valores] * len(lotes), lotes, sementes))
+    else:
+        resultados = [_lote_bootstrap(valores, lote, s) for lote, s in zip(lotes, sementes)]
+    pesos = np.concatenate([r[0] for r in resultados])
+    iqes = np.concatenate([r[1] for r in resultados])
+    posicoes = np.concatenate([r[2] for r in resultados])
+    sorteadas_de_novo = sum(r[3] for r in resultados)
+    descartadas = sum(r[4] for r in resultados)
+    print(f"-> Bootstrap concluído em {time.perf_counter() - inicio:.1f}s.")
+    if sorteadas_de_novo or descartadas:
+        print(f"-> {sorteadas_de_novo} reamostra(s) degenerada(s) sorteada(s) de novo, {descartadas} descartada(s) "
+              f"(poucos municípios distintos ou variável constante); restam {len(pesos)}.")
+    if len(pesos) == 0:
+        raise ValueError("Nenhuma reamostra tem correlação invertível: verifique se alguma variável é constante.")
+
+    quantis = [(1 - nivel) / 2, (1 + nivel) / 2]
+    modelo = ajustar_modelo_iqe(df_analise)
+    limites_pesos = np.quantile(pesos, quantis, axis=0)
+    df_pesos = pd.DataFrame({
+        'variavel': modelo['variaveis'],
+        'peso': modelo['pesos'],
+        'peso_ic_inferior': limites_pesos[0],
+        'peso_ic_superior': limites_pesos[1],
+    })
+
+    df_municipios = pontuar_iqe(df_analise, modelo)
+    df_municipios['posicao'] = df_municipios['IQE_original'].rank(ascending=False, method='first').astype(int)
+    limites_iqe = np.quantile(iqes, quantis, axis=0)
+    limites_posicao = np.quantile(posicoes, quantis, axis=0, method='nearest')
+    df_municipios['IQE_ic_inferior'] = limites_iqe[0]
+    df_municipios['IQE_ic_superior'] = limites_iqe[1]
+    # Posição 1 é o maior IQE: o limite "inferior" do intervalo é a melhor posição
+    df_municipios['posicao_ic_inferior'] = limites_posicao[0].astype(int)
+    df_municipios['posicao_ic_superior'] = limites_posicao[1].astype(int)
+    df_municipios.sort_values(by='IQE_original', ascending=False, inplace=True)
+    df_municipios.reset_index(drop=True, inplace=True)
+    return df_pesos, df_municipios
+
+
 # Bloco de execução principal (para rodar o iqe.py sozinho e gerar o CSV)
 if __name__ == "__main__":
-    df_iqe = calcular_iqe()
+    # Importado aqui porque o pipeline importa este módulo para registrar o estágio 'iqe'
+    import pipeline
+    df_iqe = pipeline.obter('iqe')
     # Define as colunas para o resultado final limpo
     colunas_resultado = ['cod_municipio', 'nome_municipio', 'ds_uf', 'IQE']
     df_para_exibir_e_salvar = df_iqe[colunas_resultado]
@@ -61,3 +360,16 @@ if __name__ == "__main__":
     print("\n\n--- RESULTADO FINAL: ÍNDICE DE QUALIDADE DA EDUCAÇÃO (IQE) ---")
     print(f"O IQE foi calculado para {len(df_para_exibir_e_salvar)} municípios.")
     print(df_para_exibir_e_salvar)
+
+    # python iqe.py --bootstrap [reamostras]: intervalos de confiança dos pesos e do ranking
+    if '--bootstrap' in sys.argv:
+        posicao = sys.argv.index('--bootstrap') + 1
+        n_reamostras = int(sys.argv[posicao]) if posicao < len(sys.argv) else 1000
+        resultado = pipeline.obter('iqe_bootstrap', parametros={'iqe_bootstrap': {'n_reamostras': n_reamostras}})
+        if not isinstance(resultado, tuple):
+            sys.exit("ERRO: O bootstrap do IQE falhou.")
+        df_pesos, df_intervalos = resultado
+        print(f"\n--- INTERVALOS DE CONFIANÇA DE 95% ({n_reamostras} REAMOSTRAS BOOTSTRAP) ---")
+        print(df_pesos.round(4).to_string(index=False))
+        print(df_intervalos[['nome_municipio', 'ds_uf', 'IQE', 'IQE_ic_inferior', 'IQE_ic_superior',
+                             'posicao', 'posicao_ic_inferior', 'posicao_ic_superior']].round(2).to_string(index=False))
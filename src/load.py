@@ -1,7 +1,26 @@
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import iqe # Importa o script que calcula o IQE
+import arquivos
+
+VARIAVEIS_GRAFICOS = ['nota_saeb', 'taxa_aprovacao', 'iqie_infraestrutura', 'inse_socioeconomico', 'formacao_docente']
+
+# Modo em lote: figuras gravadas em arquivo, sem janelas
+DIRETORIO_GRAFICOS = Path(__file__).parent.parent / 'data' / 'graficos'
+ARQUIVO_MANIFESTO = 'graficos.json'
+# Acima de tantos municípios, barras e pontos individuais viram visões agregadas
+LIMITE_AGREGACAO = 200
+N_EXTREMOS = 25
+# Incrementar quando o desenho das figuras mudar, para regerar todas
+VERSAO_GRAFICOS = 1
 
 def plotar_grafico_barras_iqe(df):
     """
@@ -37,9 +56,7 @@ def plotar_graficos_dispersao(df):
         
     print("\n-> Gerando gráficos de dispersão (Variável vs. IQE)...")
     
-    variaveis = ['nota_saeb', 'taxa_aprovacao', 'iqie_infraestrutura', 'inse_socioeconomico', 'formacao_docente']
-    
-    for var in variaveis:
+    for var in VARIAVEIS_GRAFICOS:
         plt.figure(figsize=(8, 6))
         sns.regplot(x=var, y='IQE', data=df, scatter_kws={'alpha':0.6}, line_kws={"color": "red"})
         
@@ -50,17 +67,179 @@ def plotar_graficos_dispersao(df):
         plt.tight_layout()
         plt.show()
 
+# ---------------------------------------------------------------------
+# Modo em lote: Agg, processos paralelos e figuras reaproveitadas
+# ---------------------------------------------------------------------
+
+def _especificacoes(df):
+    """Figuras do lote: o que cada uma desenha e as colunas de que depende."""
+    agregado = len(df) > LIMITE_AGREGACAO
+    especificacoes = [{'nome': 'barras_iqe', 'tipo': 'barras', 'colunas': ['nome_municipio', 'IQE'], 'agregado': agregado}]
+    for var in VARIAVEIS_GRAFICOS:
+        if var in df:
+            especificacoes.append({'nome': f'dispersao_{var}', 'tipo': 'dispersao', 'variavel': var,
+                                   'colunas': [var, 'IQE'], 'agregado': agregado})
+    return especificacoes
+
+
+def _impressao(dados, especificacao, formato):
+    sha = hashlib.sha256(pd.util.hash_pandas_object(dados, index=False).to_numpy().tobytes())
+    sha.update(json.dumps([especificacao, formato, VERSAO_GRAFICOS, LIMITE_AGREGACAO, N_EXTREMOS]).encode())
+    return sha.hexdigest()
+
+
+def _desenhar_barras(fig, dados, agregado):
+    df_sorted = dados.sort_values(by='IQE', ascending=False)
+    if not agregado:
+        ax = fig.subplots()
+        sns.barplot(x='IQE', y='nome_municipio', hue='nome_municipio', data=df_sorted, palette='viridis',
+                    orient='h', legend=False, ax=ax)
+        ax.set_title('Índice de Qualidade da Educação (IQE) por Município', fontsize=16)
+        ax.set_xlabel('IQE (Escala de 1 a 10)', fontsize=12)
+        ax.set_ylabel('Município', fontsize=12)
+        ax.set_xlim(0, 10.5)
+        for index, value in enumerate(df_sorted['IQE']):
+            ax.text(value + 0.1, index, f'{value:.2f}', va='center')
+        return
+    # Milhares de barras não se leem: só os extremos, com a distribuição completa ao lado
+    ax_maiores, ax_menores, ax_distribuicao = fig.subplots(1, 3, gridspec_kw={'width_ratios': [1, 1, 1.2]})
+    for ax, parte, titulo in ((ax_maiores, df_sorted.head(N_EXTREMOS), f'{N_EXTREMOS} maiores IQE'),
+                              (ax_menores, df_sorted.tail(N_EXTREMOS), f'{N_EXTREMOS} menores IQE')):
+        ax.barh(np.arange(len(parte)), parte['IQE'], color=sns.color_palette('viridis', len(parte)))
+        ax.set_yticks(np.arange(len(parte)), parte['nome_municipio'], fontsize=8)
+        ax.invert_yaxis()
+        ax.set_xlim(0, 10.5)
+        ax.set_title(titulo, fontsize=12)
+        ax.set_xlabel('IQE (Escala de 1 a 10)')
+    ax_distribuicao.hist(dados['IQE'].dropna(), bins=50, color='#2c7fb8')
+    ax_distribuicao.set_title(f'Distribuição do IQE ({len(dados):,} municípios)', fontsize=12)
+    ax_distribuicao.set_xlabel('IQE (Escala de 1 a 10)')
+    ax_distribuicao.set_ylabel('Municípios')
+    fig.suptitle('Índice de Qualidade da Educação (IQE) por Município', fontsize=16)
+
+
+def _desenhar_dispersao(fig, dados, var, agregado):
+    ax = fig.subplots()
+    nome = var.replace("_", " ").title()
+    if not agregado:
+        sns.regplot(x=var, y='IQE', data=dados, scatter_kws={'alpha': 0.6}, line_kws={"color": "red"}, ax=ax)
+    else:
+        # Densidade em hexágonos e reta de mínimos quadrados: sem um marcador por
+        # município nem o bootstrap do intervalo de confiança do regplot
+        validos = dados.dropna()
+        hexagonos = ax.hexbin(validos[var], validos['IQE'], gridsize=60, cmap='viridis', mincnt=1, bins='log')
+        fig.colorbar(hexagonos, ax=ax, label='Municípios')
+        if len(validos) > 1:
+            inclinacao, intercepto = np.polyfit(validos[var], validos['IQE'], 1)
+            x = np.array([validos[var].min(), validos[var].max()])
+            ax.plot(x, inclinacao * x + intercepto, color='red')
+    ax.set_title(f'Relação entre {nome} e o IQE Final', fontsize=14)
+    ax.set_xlabel(f'Valor da Variável ({nome})', fontsize=12)
+    ax.set_ylabel('IQE (Escala de 1 a 10)', fontsize=12)
+    ax.grid(True, linestyle='--', alpha=0.6)
+
+
+def _renderizar(especificacao, dados, destinos):
+    """
+    Desenha uma figura e a grava em cada destino (um por formato). Roda em um
+    processo do pool: usa só a API de objetos do matplotlib, que grava pelo canvas
+    Agg sem abrir janelas nem mexer no estado global do pyplot.
+    """
+    from matplotlib.figure import Figure
+
+    if especificacao['tipo'] == 'barras':
+        altura = 8 if especificacao['agregado'] else max(4, 0.3 * len(dados) + 1.5)
+        fig = Figure(figsize=(18 if especificacao['agregado'] else 12, altura))
+        _desenhar_barras(fig, dados, especificacao['agregado'])
+    else:
+        fig = Figure(figsize=(8, 6))
+        _desenhar_dispersao(fig, dados, especificacao['variavel'], especificacao['agregado'])
+    fig.tight_layout()
+    for destino in destinos:
+        with arquivos.escrita_atomica(destino) as temporario:
+            fig.savefig(temporario, format=Path(destino).suffix[1:], dpi=120)
+    return [str(destino) for destino in destinos]
+
+
+def renderizar_graficos(df, diretorio=None, formatos=('png',), paralelo=True, max_workers=None, forcar=False):
+    """
+    Gera as figuras de plotar_grafico_barras_iqe e plotar_graficos_dispersao em
+    arquivos, sem janelas e em paralelo (um processo por figura).
+
+    Cada figura guarda, em graficos.json, a impressão digital das colunas que usa;
+    se os dados não mudaram, ela não é desenhada de novo. Com mais de
+    LIMITE_AGREGACAO municípios, as barras viram os N_EXTREMOS maiores e menores
+    mais o histograma, e as dispersões viram densidade em hexágonos com a reta de
+    regressão.
+
+    Args:
+        df (pd.DataFrame): Saída de iqe.calcular_iqe().
+        diretorio (str ou Path, opcional): Destino. Padrão: DIRETORIO_GRAFICOS.
+        formatos (tuple): Extensões aceitas pelo matplotlib, ex.: ('png', 'svg').
+        paralelo (bool): Desenha as figuras em processos separados.
+        max_workers (int, opcional): Processos do pool.
+        forcar (bool): Redesenha todas as figuras.
+
+    Returns:
+        dict: Nome da figura -> {'arquivos': [...], 'status': 'gerado' ou 'reaproveitado'}.
+    """
+    diretorio = Path(diretorio) if diretorio is not None else DIRETORIO_GRAFICOS
+    diretorio.mkdir(parents=True, exist_ok=True)
+    arquivo_manifesto = diretorio / ARQUIVO_MANIFESTO
+    manifesto = json.loads(arquivo_manifesto.read_text(encoding='utf-8')) if arquivo_manifesto.exists() else {}
+    if df.empty:
+        print("DataFrame vazio, não há gráficos a gerar.")
+        return {}
+
+    resultado, tarefas = {}, []
+    for especificacao in _especificacoes(df):
+        dados = df[especificacao['colunas']].reset_index(drop=True)
+        destinos, pendentes = [], []
+        for formato in formatos:
+            destino = diretorio / f"{especificacao['nome']}.{formato}"
+            impressao = _impressao(dados, especificacao, formato)
+            destinos.append(str(destino))
+            if forcar or manifesto.get(destino.name) != impressao or not destino.exists():
+                pendentes.append((destino, impressao))
+        resultado[especificacao['nome']] = {'arquivos': destinos, 'status': 'gerado' if pendentes else 'reaproveitado'}
+        if pendentes:
+            tarefas.append((especificacao, dados, pendentes))
+
+    print(f"\n-> Gráficos em lote: {len(tarefas)} de {len(resultado)} figura(s) a desenhar em {diretorio}...")
+    inicio = time.perf_counter()
+    argumentos = [(especificacao, dados, [destino for destino, _ in pendentes]) for especificacao, dados, pendentes in tarefas]
+    if paralelo and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_renderizar, *zip(*argumentos)))
+    else:
+        for especificacao, dados, destinos in argumentos:
+            _renderizar(especificacao, dados, destinos)
+    for _, _, pendentes in tarefas:
+        manifesto.update({destino.name: impressao for destino, impressao in pendentes})
+
+    arquivos.gravar_json(arquivo_manifesto, manifesto, indent=2)
+    print(f"-> Gráficos prontos em {time.perf_counter() - inicio:.1f}s.")
+    return resultado
+
+
 # Bloco de Execução Principal do script de Load/Visualização
+# Uso: python load.py                      (janelas interativas)
+#      python load.py --lote [png svg ...] (arquivos em data/graficos, sem janelas)
 if __name__ == "__main__":
+    import pipeline # Obtém o IQE do pipeline, reaproveitando os estágios já calculados
+
     print("--- INICIANDO ROTINA DE LOAD E VISUALIZAÇÃO ---")
     
-    # 1. Executa o iqe.py e carrega o DataFrame completo
-    df_completo = iqe.calcular_iqe()
+    # 1. Obtém o DataFrame completo do IQE (só reexecuta os estágios desatualizados)
+    df_completo = pipeline.obter('iqe')
     
     if not df_completo.empty:
         # 2. Gera os gráficos a partir do DataFrame carregado
-        plotar_grafico_barras_iqe(df_completo)
-        plotar_graficos_dispersao(df_completo)
+        if len(sys.argv) > 1 and sys.argv[1] == '--lote':
+            renderizar_graficos(df_completo, formatos=tuple(sys.argv[2:]) or ('png',))
+        else:
+            plotar_grafico_barras_iqe(df_completo)
+            plotar_graficos_dispersao(df_completo)
         print("\n--- ROTINA DE VISUALIZAÇÃO FINALIZADA ---")
     else:
         print("\n--- ROTINA DE VISUALIZAÇÃO ENCERRADA (DADOS INSUFICIENTES) ---")
\ No newline at end of file
@@ -0,0 +1,235 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+import arquivos
+import extract
+import instrumentacao
+import iqe
+import staging
+import transform
+
+
+# Edições disponíveis de cada fonte e como extraí-las. Para incluir um novo ano,
+# basta acrescentá-lo aqui: só a extração e o IQE desse ano serão calculados.
+FONTES_PAINEL = {
+    'ideb': {
+        'anos': [2019, 2021, 2023],
+        'extrair': extract.ler_ideb_edicao,
+        'renomear': {'cod_municipio': 'cod_municipio', 'taxa_aprovacao': 'taxa_aprovacao', 'nota_saeb': 'nota_saeb'},
+    },
+    'infraestrutura': {
+        'anos': [2021, 2022, 2023, 2024],
+        'extrair': lambda ano: extract.gerar_indice_infraestrutura_municipal(ano=ano),
+        'renomear': {'Código do Município': 'cod_municipio', 'IQIE': 'iqie_infraestrutura'},
+    },
+    'inse': {
+        'anos': [2021],
+        'extrair': lambda ano: extract.processar_inse(),
+        'renomear': {'CO_MUNICIPIO': 'cod_municipio', 'MEDIA_INSE': 'inse_socioeconomico'},
+    },
+    'afd': {
+        'anos': [2021, 2022, 2023, 2024],
+        'extrair': lambda ano: extract.extrair_afd(ano=ano),
+        'renomear': {'cod_municipio': 'cod_municipio', 'media_percentual_formacao_adequada': 'formacao_docente'},
+    },
+}
+
+# Ano cujos dados definem o modelo do IQE (padronização, pesos e escala de 1 a 10).
+# Todos os anos são pontuados com esse mesmo modelo e são comparáveis.
+ANO_REFERENCIA = 2023
+
+ANOS_PAINEL = [2021, 2022, 2023, 2024]
+
+
+def diretorio_painel():
+    return staging.DIRETORIO_STAGING / 'painel'
+
+
+def _caminho_fonte(fonte, ano):
+    return diretorio_painel() / 'fontes' / f'{fonte}_{ano}.parquet'
+
+
+def _gravar_parquet(df, destino):
+    with arquivos.escrita_atomica(destino) as temporario:
+        df.to_parquet(temporario, index=False)
+
+
+def _gravar_json(conteudo, destino):
+    arquivos.gravar_json(destino, conteudo, indent=2)
+
+
+def _ler_json(caminho):
+    return json.loads(caminho.read_text(encoding='utf-8')) if caminho.exists() else None
+
+
+def _anos_fonte_necessarios(anos):
+    """Para cada fonte, as edições usadas por algum ano do painel (a mais recente até o ano)."""
+    necessarios = {}
+    for fonte, config in FONTES_PAINEL.items():
+        edicoes = {max((a for a in config['anos'] if a <= ano), default=None) for ano in anos}
+        necessarios[fonte] = sorted(a for a in edicoes if a is not None)
+    return necessarios
+
+
+def carregar_fontes(anos, paralelo=True, forcar=False):
+    """
+    Garante as edições de cada fonte necessárias para os anos pedidos, extraindo
+    apenas as que ainda não estão gravadas em diretorio_painel()/fontes.
+
+    Returns:
+        dict: fonte -> DataFrame com 'cod_municipio', as variáveis da fonte e 'ano_fonte'.
+    """
+    necessarios = _anos_fonte_necessarios(anos)
+    tarefas = {}
+    for fonte, edicoes in necessarios.items():
+        for ano in edicoes:
+            if forcar or not _caminho_fonte(fonte, ano).exists():
+                tarefas[f'{fonte}_{ano}'] = (lambda f=fonte, a=ano: FONTES_PAINEL[f]['extrair'](a))
+
+    if tarefas:
+        print(f"--- Painel: extraindo {len(tarefas)} edição(ões) nova(s): {sorted(tarefas)} ---")
+        resultados, _ = transform.executar_extracoes(tarefas, paralelo=paralelo)
+        for nome, df in resultados.items():
+            if df is None:
+                continue
+            fonte, ano = nome.rsplit('_', 1)
+            renomear = FONTES_PAINEL[fonte]['renomear']
+            _gravar_parquet(df[list(renomear)].rename(columns=renomear), _caminho_fonte(fonte, int(ano)))
+    else:
+        print("--- Painel: todas as edições necessárias já foram extraídas ---")
+
+    fontes = {}
+    for fonte, edicoes in necessarios.items():
+        partes = [pd.read_parquet(_caminho_fonte(fonte, ano)).assign(ano_fonte=ano)
+                  for ano in edicoes if _caminho_fonte(fonte, ano).exists()]
+        if partes:
+            fontes[fonte] = pd.concat(partes, ignore_index=True)
+    return fontes
+
+
+@instrumentacao.instrumentar('transform')
+def alinhar(municipios, fontes, anos):
+    """
+    Monta o painel município-ano: para cada ano, cada fonte contribui com a edição
+    mais recente publicada até aquele ano (ex.: o INSE 2021 vale para 2021 a 2024).
+
+    Returns:
+        pd.DataFrame: Uma linha por município e ano, com as variáveis do IQE e a
+                      coluna 'ano_<fonte>' indicando a edição usada de cada fonte.
+    """
+    base = municipios[['cod_municipio', 'nome_municipio', 'ds_uf']].drop_duplicates('cod_municipio')
+    painel = base.merge(pd.DataFrame({'ano': anos}), how='cross')
+    for fonte, df_fonte in fontes.items():
+        edicoes = sorted(df_fonte['ano_fonte'].unique())
+        correspondencia = pd.DataFrame({
+            'ano': anos,
+            f'ano_{fonte}': [max((e for e in edicoes if e <= ano), default=np.nan) for ano in anos],
+        })
+        dados = df_fonte.drop_duplicates(['cod_municipio', 'ano_fonte']).rename(columns={'ano_fonte': f'ano_{fonte}'})
+        painel = painel.merge(correspondencia, on='ano', how='left').merge(
+            dados, on=['cod_municipio', f'ano_{fonte}'], how='left')
+    for variavel in iqe.VARIAVEIS_IQE:
+        if variavel not in painel.columns:
+            painel[variavel] = np.nan
+    return painel.sort_values(['ano', 'cod_municipio']).reset_index(drop=True)
+
+
+def _impressao_linhas(df):
+    colunas = ['cod_municipio'] + iqe.VARIAVEIS_IQE
+    return hashlib.sha256(pd.util.hash_pandas_object(df[colunas], index=False).to_numpy().tobytes()).hexdigest()
+
+
+def ajustar_referencia(df_referencia):
+    """
+    Ajusta o modelo do IQE (iqe.ajustar_modelo_iqe) com os dados completos do ano
+    de referência, guardando junto a impressão digital desses dados.
+    """
+    completos = df_referencia.dropna(subset=iqe.VARIAVEIS_IQE)
+    if len(completos) < 10:
+        raise ValueError(f"O ano de referência tem só {len(completos)} municípios com dados completos.")
+    modelo = iqe.ajustar_modelo_iqe(completos)
+    modelo['impressao'] = _impressao_linhas(df_referencia)
+    return modelo
+
+
+def atualizar_painel(anos=None, ano_referencia=ANO_REFERENCIA, municipios=None, paralelo=True, forcar=False):
+    """
+    Calcula (ou atualiza) o painel de IQE por município e ano.
+
+    O trabalho é incremental: só as edições de fontes ainda não extraídas são
+    baixadas, e só os anos novos ou cujos dados mudaram são pontuados. Se os dados
+    do ano de referência mudarem, a escala muda e todos os anos são pontuados de novo.
+
+    Args:
+        anos (list, opcional): Anos do painel. Padrão: ANOS_PAINEL.
+        ano_referencia (int): Ano que define padronização, pesos e escala.
+        municipios (pd.DataFrame, opcional): Municípios do painel (cod_municipio,
+            nome_municipio, ds_uf). Padrão: os municípios de atuação do Instituto.
+        paralelo (bool): Extrai as edições novas em paralelo.
+        forcar (bool): Reextrai todas as edições e repontua todos os anos.
+
+    Returns:
+        pd.DataFrame: Painel longo (uma linha por município e ano) com as variáveis,
+                      as edições usadas de cada fonte e as colunas 'IQE_original' e 'IQE'.
+    """
+    anos = sorted(set(anos or ANOS_PAINEL) | {ano_referencia})
+    if municipios is None:
+        municipios = transform.criar_base_municipios_atuacao()
+    if municipios.empty:
+        print("ERRO: Nenhum município para montar o painel.")
+        return pd.DataFrame()
+
+    fontes = carregar_fontes(anos, paralelo=paralelo, forcar=forcar)
+    painel = alinhar(municipios, fontes, anos)
+
+    arquivo_painel = diretorio_painel() / 'painel.parquet'
+    arquivo_estado = diretorio_painel() / 'painel.json'
+    arquivo_referencia = diretorio_painel() / f'referencia_{ano_referencia}.json'
+
+    referencia = _ler_json(arquivo_referencia)
+    impressao_referencia = _impressao_linhas(painel[painel['ano'] == ano_referencia])
+    if forcar or referencia is None or referencia['impressao'] != impressao_referencia:
+        print(f"-> Ajustando a referência do IQE com os dados de {ano_referencia}...")
+        referencia = ajustar_referencia(painel[painel['ano'] == ano_referencia])
+        _gravar_json(referencia, arquivo_referencia)
+
+    estado = _ler_json(arquivo_estado) or {}
+    anteriores = {}
+    if not forcar and estado.get('referencia') == referencia['impressao'] and arquivo_painel.exists():
+        anteriores = estado.get('anos', {})
+    impressoes = {str(ano): _impressao_linhas(grupo) for ano, grupo in painel.groupby('ano')}
+    anos_a_pontuar = [ano for ano in anos if anteriores.get(str(ano)) != impressoes[str(ano)]]
+
+    partes = []
+    if len(anos_a_pontuar) < len(anos):
+        salvo = pd.read_parquet(arquivo_painel)
+        partes.append(salvo[salvo['ano'].isin([ano for ano in anos if ano not in anos_a_pontuar])])
+    if anos_a_pontuar:
+        print(f"-> Pontuando o IQE dos anos {anos_a_pontuar} em uma única passada...")
+        partes.append(iqe.pontuar_iqe(painel[painel['ano'].isin(anos_a_pontuar)], referencia))
+    else:
+        print("-> Nenhum ano novo ou alterado. Painel reaproveitado.")
+
+    resultado = pd.concat(partes, ignore_index=True).sort_values(['ano', 'cod_municipio']).reset_index(drop=True)
+    if anos_a_pontuar:
+        # Anos salvos antes e não pedidos agora continuam no arquivo
+        if anteriores:
+            salvo = pd.read_parquet(arquivo_painel)
+            resultado_completo = pd.concat([salvo[~salvo['ano'].isin(anos)], resultado], ignore_index=True)
+            impressoes = {**{k: v for k, v in anteriores.items() if int(k) not in anos}, **impressoes}
+        else:
+            resultado_completo = resultado
+        _gravar_parquet(resultado_completo, arquivo_painel)
+        _gravar_json({'referencia': referencia['impressao'], 'ano_referencia': ano_referencia,
+                      'anos': impressoes}, arquivo_estado)
+    return resultado
+
+
+if __name__ == "__main__":
+    df_painel = atualizar_painel()
+    if not df_painel.empty:
+        print("\n--- PAINEL DO IQE POR MUNICÍPIO E ANO ---")
+        print(df_painel.pivot_table(index='nome_municipio', columns='ano', values='IQE').round(2))
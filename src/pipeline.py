@@ -0,0 +1,463 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+import api
+import arquivos
+import cache
+import exportar_site
+import extract
+import geometria
+import indice_municipios
+import instrumentacao
+import investment_model
+import iqe
+import painel
+import preditor
+import relatorio
+import transform
+
+
+# Diretório dos resultados de cada estágio; pode ser trocado pela variável de ambiente PORTAL_PIPELINE_DIR
+DIRETORIO_PIPELINE = Path(os.environ.get('PORTAL_PIPELINE_DIR', Path(__file__).parent.parent / 'data' / 'pipeline'))
+
+# Fontes remotas não têm uma impressão digital local: são consideradas vencidas após este prazo
+VALIDADE_FONTES_HORAS = float(os.environ.get('PORTAL_VALIDADE_FONTES_HORAS', 24))
+
+ESTAGIOS = {}
+
+_trava_manifesto = threading.Lock()
+
+
+def registrar_estagio(nome, funcao, dependencias=(), parametros=None, modulos=(), entradas=None,
+                      validade_horas=None, tolerar_falhas=False, versao=1):
+    """
+    Registra um estágio do pipeline.
+
+    Args:
+        nome (str): Nome único do estágio.
+        funcao (callable): Recebe a saída de cada dependência como argumento nomeado
+            (com o nome da dependência) e os parâmetros do estágio.
+        dependencias (tuple): Nomes dos estágios cujas saídas a função recebe.
+        parametros (dict, opcional): Parâmetros padrão, que entram na impressão digital.
+        modulos (tuple): Módulos cujo código-fonte define a versão do estágio.
+        entradas (callable, opcional): Retorna os arquivos locais lidos pelo estágio;
+            o conteúdo deles entra na impressão digital.
+        validade_horas (float, opcional): Idade máxima da saída salva (para fontes remotas).
+        tolerar_falhas (bool): Se True, o estágio roda mesmo com dependências que
+            falharam, recebendo None no lugar da saída delas.
+        versao (int): Incrementar força a reexecução mesmo sem mudança de código.
+    """
+    ESTAGIOS[nome] = {
+        'nome': nome,
+        'funcao': funcao,
+        'dependencias': tuple(dependencias),
+        'parametros': dict(parametros or {}),
+        'modulos': tuple(modulos),
+        'entradas': entradas,
+        'validade_horas': validade_horas,
+        'tolerar_falhas': tolerar_falhas,
+        'versao': versao,
+    }
+
+
+def estagio(nome, **opcoes):
+    """Versão em decorador de registrar_estagio()."""
+    def registrar(funcao):
+        registrar_estagio(nome, funcao, **opcoes)
+        return funcao
+    return registrar
+
+
+# =========================================================================
+# Persistência dos resultados
+# =========================================================================
+
+def _caminho_manifesto():
+    return DIRETORIO_PIPELINE / 'manifesto.json'
+
+
+def _caminho_saida(nome):
+    return DIRETORIO_PIPELINE / f'{nome}.pkl'
+
+
+def _carregar_manifesto():
+    caminho = _caminho_manifesto()
+    if not caminho.exists():
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _atualizar_manifesto(nome, entrada):
+    with _trava_manifesto:
+        manifesto = _carregar_manifesto()
+        manifesto[nome] = entrada
+        arquivos.gravar_json(_caminho_manifesto(), manifesto, ensure_ascii=False, indent=2)
+
+
+def _salvar_saida(nome, saida):
+    """Grava a saída de forma atômica e retorna o SHA-256 do conteúdo gravado."""
+    conteudo = pickle.dumps(saida, protocol=pickle.HIGHEST_PROTOCOL)
+    arquivos.gravar_atomico(_caminho_saida(nome), conteudo)
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _carregar_saida(nome):
+    with open(_caminho_saida(nome), 'rb') as f:
+        return pickle.load(f)
+
+
+# =========================================================================
+# Impressões digitais
+# =========================================================================
+
+def _hash_arquivo(caminho):
+    caminho = Path(caminho)
+    if not caminho.exists():
+        return 'ausente'
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(cache.TAMANHO_BLOCO), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _codigo(funcao):
+    try:
+        return inspect.getsource(funcao)
+    except (OSError, TypeError):
+        # Funções sem código-fonte disponível (ex.: definidas no interpretador)
+        codigo = getattr(funcao, '__code__', None)
+        return funcao.__qualname__ if codigo is None else codigo.co_code.hex()
+
+
+def _impressao(definicao, parametros, hashes_dependencias):
+    """
+    Impressão digital de um estágio: código (função e módulos), parâmetros,
+    arquivos de entrada e o conteúdo das saídas das dependências. Como são usadas
+    as saídas, e não as impressões, das dependências, um estágio que reexecuta e
+    produz o mesmo resultado não invalida os estágios seguintes.
+    """
+    partes = {
+        'versao': definicao['versao'],
+        'funcao': _codigo(definicao['funcao']),
+        'modulos': [_hash_arquivo(inspect.getsourcefile(modulo)) for modulo in definicao['modulos']],
+        'parametros': parametros,
+        'entradas': [_hash_arquivo(caminho) for caminho in (definicao['entradas']() if definicao['entradas'] else [])],
+        'dependencias': hashes_dependencias,
+    }
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _ordenar(alvos):
+    """Ordem topológica dos estágios necessários para produzir os alvos."""
+    ordem, visitados = [], set()
+
+    def visitar(nome, caminho):
+        if nome in visitados:
+            return
+        if nome not in ESTAGIOS:
+            raise KeyError(f"Estágio desconhecido: '{nome}'.")
+        if nome in caminho:
+            raise ValueError(f"Ciclo no pipeline envolvendo '{nome}'.")
+        for dependencia in ESTAGIOS[nome]['dependencias']:
+            visitar(dependencia, caminho | {nome})
+        visitados.add(nome)
+        ordem.append(nome)
+
+    for alvo in alvos:
+        visitar(alvo, frozenset())
+    return ordem
+
+
+def _falhou(saida):
+    return saida is None or (isinstance(saida, pd.DataFrame) and saida.empty)
+
+
+def _rodar(nome, funcao, argumentos):
+    inicio = time.perf_counter()
+    try:
+        with instrumentacao.medir(f'pipeline.{nome}', 'estagio'):
+            saida, erro = funcao(**argumentos), None
+    except Exception as e:
+        saida, erro = None, e
+    return saida, time.perf_counter() - inicio, erro
+
+
+# =========================================================================
+# Execução
+# =========================================================================
+
+def executar(alvos, forcar=(), parametros=None, paralelo=True, max_workers=6):
+    """
+    Produz as saídas dos estágios pedidos, reexecutando apenas o que está desatualizado.
+
+    Um estágio é reaproveitado do disco quando sua impressão digital coincide com a
+    da última execução bem-sucedida (e a saída salva não venceu). Os demais rodam
+    assim que todas as suas dependências estiverem resolvidas; ramos independentes
+    (ex.: as fontes de dados, ou o IQE e o modelo preditivo) rodam em paralelo.
+
+    Args:
+        alvos (list): Nomes dos estágios desejados.
+        forcar (iterable): Estágios que devem rodar de qualquer forma ('*' para todos).
+        parametros (dict, opcional): Nome do estágio -> parâmetros que substituem os padrões.
+        paralelo (bool): Se False, os estágios rodam um de cada vez.
+        max_workers (int): Número máximo de estágios simultâneos.
+
+    Returns:
+        dict: Nome do alvo -> saída do estágio (None se ele ou uma dependência falhou).
+    """
+    if isinstance(alvos, str):
+        alvos = [alvos]
+    forcar = set(forcar)
+    parametros = parametros or {}
+    ordem = _ordenar(alvos)
+    manifesto = _carregar_manifesto()
+
+    hashes = {}         # estágio resolvido -> SHA-256 da saída (None se falhou)
+    saidas = {}         # saídas já em memória
+    relatorio = []
+    pendentes = list(ordem)
+    em_execucao = {}
+    inicio_total = time.perf_counter()
+
+    def saida_de(nome):
+        if nome not in saidas:
+            saidas[nome] = None if hashes[nome] is None else _carregar_saida(nome)
+        return saidas[nome]
+
+    def concluir(nome, impressao, saida, tempo, erro):
+        if erro is not None:
+            status = f'erro: {erro}'
+        elif _falhou(saida):
+            status = 'vazio'
+        else:
+            status = 'executado'
+        if status == 'executado':
+            hashes[nome] = _salvar_saida(nome, saida)
+            saidas[nome] = saida
+            _atualizar_manifesto(nome, {'impressao': impressao, 'hash_saida': hashes[nome],
+                                        'criado_em': time.time(), 'tempo_s': round(tempo, 2)})
+        else:
+            hashes[nome], saidas[nome] = None, None
+        relatorio.append({'estagio': nome, 'status': status, 'tempo_s': round(tempo, 2)})
+
+    executor = ThreadPoolExecutor(max_workers=max_workers if paralelo else 1, thread_name_prefix='estagio')
+    try:
+        while pendentes or em_execucao:
+            for nome in list(pendentes):
+                definicao = ESTAGIOS[nome]
+                dependencias = definicao['dependencias']
+                if not all(dependencia in hashes for dependencia in dependencias):
+                    continue
+                pendentes.remove(nome)
+
+                if not definicao['tolerar_falhas'] and any(hashes[d] is None for d in dependencias):
+                    hashes[nome], saidas[nome] = None, None
+                    relatorio.append({'estagio': nome, 'status': 'ignorado (dependência falhou)', 'tempo_s': 0.0})
+                    continue
+
+                parametros_estagio = {**definicao['parametros'], **parametros.get(nome, {})}
+                impressao = _impressao(definicao, parametros_estagio, {d: hashes[d] for d in dependencias})
+                anterior = manifesto.get(nome)
+                vencido = (definicao['validade_horas'] is not None and anterior is not None
+                           and time.time() - anterior['criado_em'] > definicao['validade_horas'] * 3600)
+                if (anterior is not None and anterior['impressao'] == impressao and not vencido
+                        and nome not in forcar and '*' not in forcar and _caminho_saida(nome).exists()):
+                    hashes[nome] = anterior['hash_saida']
+                    relatorio.append({'estagio': nome, 'status': 'reaproveitado', 'tempo_s': 0.0})
+                    continue
+
+                argumentos = {d: saida_de(d) for d in dependencias}
+                argumentos.update(parametros_estagio)
+                print(f"[pipeline] Executando o estágio '{nome}'...")
+                futuro = executor.submit(_rodar, nome, definicao['funcao'], argumentos)
+                em_execucao[futuro] = (nome, impressao)
+
+            if not em_execucao:
+                continue
+            concluidos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome, impressao = em_execucao.pop(futuro)
+                concluir(nome, impressao, *futuro.result())
+    finally:
+        executor.shutdown(wait=True)
+
+    print("\n--- Relatório do pipeline ---")
+    print(pd.DataFrame(relatorio, columns=['estagio', 'status', 'tempo_s']).to_string(index=False))
+    print(f"Tempo total: {time.perf_counter() - inicio_total:.2f}s")
+    return {alvo: saida_de(alvo) for alvo in alvos}
+
+
+def obter(nome, **opcoes):
+    """Atalho para executar() com um único alvo. Retorna DataFrame vazio em caso de falha."""
+    saida = executar([nome], **opcoes)[nome]
+    return pd.DataFrame() if saida is None else saida
+
+
+def invalidar(nomes=None):
+    """Remove do manifesto os estágios indicados (todos, se omitido), forçando sua reexecução."""
+    with _trava_manifesto:
+        manifesto = _carregar_manifesto()
+        for nome in list(manifesto) if nomes is None else nomes:
+            manifesto.pop(nome, None)
+            _caminho_saida(nome).unlink(missing_ok=True)
+        if _caminho_manifesto().exists():
+            arquivos.gravar_json(_caminho_manifesto(), manifesto, ensure_ascii=False, indent=2)
+
+
+# =========================================================================
+# Estágios: extract -> transform -> IQE -> modelo
+# =========================================================================
+
+registrar_estagio('municipios_atuacao', transform.criar_base_municipios_atuacao,
+                  modulos=(extract, transform, indice_municipios),
+                  entradas=lambda: [extract.ARQUIVO_IA])
+
+for _nome, (_funcao, _) in transform.FONTES_VARIAVEIS.items():
+    registrar_estagio(_nome, _funcao, modulos=(extract,), validade_horas=VALIDADE_FONTES_HORAS)
+
+
+@estagio('base_analise', dependencias=('municipios_atuacao', *transform.FONTES_VARIAVEIS),
+         modulos=(transform,), tolerar_falhas=True)
+def _base_analise(municipios_atuacao, **fontes):
+    return transform.consolidar_base_de_analise(municipios_atuacao, fontes)
+
+
+@estagio('modelo_iqe', dependencias=('base_analise',), modulos=(iqe,), parametros={'reajustar': False},
+         entradas=lambda: [iqe.ARQUIVO_MODELO_IQE])
+def _modelo_iqe(base_analise, reajustar):
+    # Pesos, padronização e escala ficam guardados e o estágio 'iqe' só pontua: dados
+    # novos não mudam o IQE dos demais. Só há novo ajuste com reajustar=True
+    # (PORTAL_FORCAR=modelo_iqe), sem artefato salvo ou com outra VERSAO_MODELO_IQE
+    if not reajustar:
+        try:
+            modelo = iqe.carregar_modelo_iqe()
+        except ValueError as e:
+            print(f"[pipeline] {e}")
+            modelo = None
+        if modelo is not None:
+            return modelo
+    completos = base_analise.dropna(subset=iqe.VARIAVEIS_IQE)
+    if len(completos) < 10:
+        print(f"[pipeline] Só {len(completos)} município(s) com todas as variáveis do IQE; "
+              f"são necessários ao menos 10 para ajustar o modelo.")
+        return None
+    modelo = iqe.ajustar_modelo_iqe(completos)
+    iqe.salvar_modelo_iqe(modelo)
+    return modelo
+
+
+@estagio('iqe', dependencias=('base_analise', 'modelo_iqe'), modulos=(iqe,))
+def _iqe(base_analise, modelo_iqe):
+    return iqe.calcular_iqe(base_analise, modelo_iqe)
+
+
+@estagio('iqe_bootstrap', dependencias=('base_analise',), modulos=(iqe,),
+         parametros={'n_reamostras': 1000, 'semente': 0})
+def _iqe_bootstrap(base_analise, n_reamostras, semente):
+    return iqe.bootstrap_iqe(base_analise, n_reamostras=n_reamostras, semente=semente)
+
+
+@estagio('painel', dependencias=('municipios_atuacao',), modulos=(painel, extract),
+         validade_horas=VALIDADE_FONTES_HORAS)
+def _painel(municipios_atuacao):
+    return painel.atualizar_painel(municipios=municipios_atuacao)
+
+
+@estagio('historico', modulos=(investment_model,),
+         entradas=lambda: [investment_model.caminho_dados_historicos()])
+def _historico():
+    return investment_model.carregar_dados_historicos(investment_model.caminho_dados_historicos())
+
+
+@estagio('modelo', dependencias=('historico',), modulos=(investment_model,),
+         parametros={'validacao_cruzada': os.environ.get('PORTAL_VALIDACAO_CRUZADA', '0').lower() in ('1', 'true', 'sim')})
+def _modelo(historico, validacao_cruzada):
+    X, y = investment_model.engenharia_de_atributos(historico.copy())
+    if X is None:
+        return None
+    return investment_model.treinar_modelo_preditivo(X, y, validacao_cruzada=validacao_cruzada)
+
+
+@estagio('recomendacoes', dependencias=('modelo', 'iqe'), modulos=(investment_model,),
+         parametros={'investimento_simulado': 100000})
+def _recomendacoes(modelo, iqe, investimento_simulado):
+    return investment_model.gerar_recomendacoes_investimento(modelo, iqe, investimento_simulado)
+
+
+@estagio('alocacao', dependencias=('modelo', 'iqe'), modulos=(investment_model,),
+         parametros={'orcamento': 1_000_000, 'investimento_maximo': 250_000, 'n_niveis': 200})
+def _alocacao(modelo, iqe, orcamento, investimento_maximo, n_niveis):
+    return investment_model.otimizar_alocacao(modelo, iqe, orcamento, investimento_maximo=investimento_maximo,
+                                              n_niveis=n_niveis)
+
+
+@estagio('preditor', dependencias=('modelo', 'iqe'), modulos=(preditor,))
+def _preditor(modelo, iqe):
+    # Publica modelo e atributos para o preditor.Preditor, que os recarrega sozinho
+    return {
+        'modelo': str(preditor.publicar_modelo(modelo)),
+        'atributos': str(preditor.publicar_atributos(iqe, modelo.feature_name_)),
+    }
+
+
+@estagio('mapa', dependencias=('iqe',), modulos=(geometria,),
+         parametros={'tolerancia': geometria.TOLERANCIA_PADRAO, 'quantizacao': geometria.QUANTIZACAO_PADRAO,
+                     'orcamento_bytes': geometria.ORCAMENTO_MAPA_BYTES},
+         entradas=geometria.arquivos_malhas_locais)
+def _mapa(iqe, tolerancia, quantizacao, orcamento_bytes):
+    return geometria.gerar_mapa(iqe, tolerancia=tolerancia, quantizacao=quantizacao, orcamento_bytes=orcamento_bytes)
+
+
+# Sem o mapa (ex.: malhas indisponíveis) ou as recomendações, o site é exportado sem eles
+@estagio('site', dependencias=('iqe', 'recomendacoes', 'mapa'), modulos=(exportar_site,),
+         entradas=lambda: [exportar_site.ARQUIVO_TEXTOS], tolerar_falhas=True)
+def _site(iqe, recomendacoes, mapa):
+    if iqe is None:
+        raise ValueError("O IQE não foi calculado; não há o que exportar para o site.")
+    investimento = ESTAGIOS['recomendacoes']['parametros']['investimento_simulado']
+    return exportar_site.exportar_dados_site(iqe, recomendacoes, investimento_simulado=investimento, mapa=mapa)
+
+
+# Sem as recomendações, a API é publicada só com o IQE
+@estagio('api', dependencias=('iqe', 'modelo_iqe', 'recomendacoes'), modulos=(api,), tolerar_falhas=True)
+def _api(iqe, modelo_iqe, recomendacoes):
+    if iqe is None or modelo_iqe is None:
+        raise ValueError("O IQE não foi calculado; não há o que publicar para a API.")
+    investimento = ESTAGIOS['recomendacoes']['parametros']['investimento_simulado']
+    # Publica para o api.ServidorAPI, que recarrega sozinho
+    return str(api.publicar_dados_api(iqe, modelo_iqe, recomendacoes, investimento_simulado=investimento))
+
+
+@estagio('relatorio', dependencias=('iqe', 'modelo_iqe'), modulos=(relatorio,))
+def _relatorio(iqe, modelo_iqe):
+    return str(relatorio.gerar_relatorio(iqe, modelo_iqe))
+
+
+# =========================================================================
+# Bloco de Execução Principal
+# =========================================================================
+if __name__ == "__main__":
+    # Uso: python pipeline.py [estágio ...]   (padrão: iqe e recomendacoes)
+    # Variável PORTAL_FORCAR="iqe,modelo" (ou "*") força a reexecução de estágios;
+    # com "modelo_iqe", os pesos e a escala do IQE são ajustados de novo
+    alvos = sys.argv[1:] or ['iqe', 'recomendacoes']
+    forcar = [nome for nome in os.environ.get('PORTAL_FORCAR', '').split(',') if nome]
+    parametros = {'modelo_iqe': {'reajustar': True}} if 'modelo_iqe' in forcar else None
+    resultados = executar(alvos, forcar=forcar, parametros=parametros)
+    for alvo, saida in resultados.items():
+        print(f"\n--- {alvo} ---")
+        print(saida.head() if isinstance(saida, pd.DataFrame) else saida)
+    cache.imprimir_relatorio_cache()
@@ -0,0 +1,215 @@
+import ctypes
+import os
+import threading
+import time
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+
+import arquivos
+import investment_model
+
+# A predição de linha única usa internos do lightgbm (lightgbm.basic._LIB, _c_str e
+# _safe_call) e a API C LGBM_BoosterPredictForMatSingleRowFast*, conferidos nas versões
+# maiores abaixo (requirements.txt fixa a 4.6.0). Fora delas, ou se esses nomes
+# sumirem, o Preditor usa booster.predict(): mais lento, mesmo resultado.
+VERSOES_LIGHTGBM_API_C = (4,)
+try:
+    from lightgbm.basic import _LIB, _c_str, _safe_call
+    API_C_DISPONIVEL = (int(lgb.__version__.split('.')[0]) in VERSOES_LIGHTGBM_API_C
+                        and hasattr(_LIB, 'LGBM_BoosterPredictForMatSingleRowFast'))
+except ImportError:
+    API_C_DISPONIVEL = False
+
+
+# Modelo publicado para consultas interativas e a matriz de atributos dos municípios
+# atuais, lidos pelo Preditor. Ambos são gravados de forma atômica.
+DIRETORIO_PREDITOR = Path(__file__).parent.parent / 'data' / 'preditor'
+ARQUIVO_MODELO = 'modelo_investimento.txt'
+ARQUIVO_ATRIBUTOS = 'atributos_atuais.npz'
+
+# Constantes da API C do LightGBM (c_api.h)
+_C_API_DTYPE_FLOAT32 = 0
+_C_API_PREDICT_NORMAL = 0
+
+
+def _diretorio(diretorio):
+    return Path(diretorio) if diretorio is not None else DIRETORIO_PREDITOR
+
+
+def publicar_modelo(model, diretorio=None):
+    """Grava o booster treinado para o Preditor. Quem estiver consultando passa a usá-lo sem reiniciar."""
+    destino = _diretorio(diretorio) / ARQUIVO_MODELO
+    booster = model.booster_ if hasattr(model, 'booster_') else model
+    with arquivos.escrita_atomica(destino) as temporario:
+        booster.save_model(str(temporario))
+    return destino
+
+
+def publicar_atributos(df_dados_atuais, features, diretorio=None):
+    """
+    Grava os atributos dos municípios atuais como uma matriz float32 contígua, na
+    ordem das features do modelo (a coluna do investimento fica zerada).
+
+    Args:
+        df_dados_atuais (pd.DataFrame): Tabela do IQE atual (ex.: iqe.calcular_iqe()).
+        features (list): Features do modelo, na ordem do treino (model.feature_name_).
+    """
+    df = df_dados_atuais.rename(columns=investment_model.COLUNAS_ATRIBUTOS_ATUAIS)
+    atributos = np.ascontiguousarray(np.column_stack([
+        np.zeros(len(df)) if feature == 'valor_investido' else df[feature].to_numpy(dtype='float64')
+        for feature in features]), dtype='float32')
+    destino = _diretorio(diretorio) / ARQUIVO_ATRIBUTOS
+    with arquivos.escrita_atomica(destino, sufixo='.npz') as temporario:
+        np.savez(temporario, atributos=atributos, codigos=df['cod_municipio'].to_numpy(dtype='int64'),
+                 features=np.array(features))
+    return destino
+
+
+class _Estado:
+    """Modelo e atributos carregados juntos: trocados de uma vez na recarga."""
+
+    def __init__(self, arquivo_modelo, arquivo_atributos):
+        self.versao = _versao(arquivo_modelo, arquivo_atributos)
+        self.booster = lgb.Booster(model_file=str(arquivo_modelo))
+        with np.load(arquivo_atributos) as dados:
+            self.atributos = np.ascontiguousarray(dados['atributos'], dtype='float32')
+            self.codigos = dados['codigos']
+            features = [str(feature) for feature in dados['features']]
+        if features != self.booster.feature_name():
+            raise ValueError(f"Os atributos publicados ({features}) não correspondem às features do "
+                             f"modelo ({self.booster.feature_name()}). Publique os atributos novamente.")
+        self.linhas = {codigo: i for i, codigo in enumerate(self.codigos.tolist())}
+        self.coluna_investimento = features.index('valor_investido')
+        self.trava = threading.Lock()
+        self.linha = np.empty(len(features), dtype='float32')
+        self.saida = np.empty(1, dtype='float64')
+        self.tamanho_saida = ctypes.c_int64(0)
+        self.configuracao = None
+        if not API_C_DISPONIVEL:
+            return
+        # Configuração de predição de linha única da API C: evita validar parâmetros
+        # e alocar buffers a cada chamada
+        self.configuracao = ctypes.c_void_p()
+        _safe_call(_LIB.LGBM_BoosterPredictForMatSingleRowFastInit(
+            self.booster._handle, ctypes.c_int(_C_API_PREDICT_NORMAL), ctypes.c_int(0), ctypes.c_int(-1),
+            ctypes.c_int(_C_API_DTYPE_FLOAT32), ctypes.c_int32(len(features)), _c_str('num_threads=1'),
+            ctypes.byref(self.configuracao)))
+
+    def __del__(self):
+        # Só roda quando nenhuma consulta em andamento ainda usa este estado
+        if getattr(self, 'configuracao', None) is not None and self.configuracao.value:
+            _LIB.LGBM_FastConfigFree(self.configuracao)
+
+
+def _versao(*arquivos):
+    return tuple((estado.st_mtime_ns, estado.st_size) for estado in map(os.stat, arquivos))
+
+
+class Preditor:
+    """
+    Consultas de baixa latência ao modelo de investimento, sem pandas no caminho.
+
+    Cada consulta copia a linha float32 já carregada do município, preenche o
+    investimento e chama a predição de linha única da API C do LightGBM: alguns
+    microssegundos, contra milissegundos de gerar_recomendacoes_investimento().
+    Quando publicar_modelo() ou publicar_atributos() gravam novos arquivos, o
+    Preditor os recarrega e troca o estado de uma vez; consultas em andamento
+    terminam com o estado anterior.
+
+    Exemplo:
+        preditor = Preditor()
+        preditor.prever(2507507, 100000)
+        preditor.prever_lote([2507507, 2504009], [50000, 100000])
+    """
+
+    def __init__(self, diretorio=None, intervalo_verificacao=1.0):
+        """
+        Args:
+            diretorio (str ou Path, opcional): Onde estão os arquivos publicados. Padrão: DIRETORIO_PREDITOR.
+            intervalo_verificacao (float): De quantos em quantos segundos, no máximo,
+                verificar se há um modelo novo. None desliga a recarga automática.
+        """
+        self.arquivo_modelo = _diretorio(diretorio) / ARQUIVO_MODELO
+        self.arquivo_atributos = _diretorio(diretorio) / ARQUIVO_ATRIBUTOS
+        self.intervalo_verificacao = intervalo_verificacao
+        self._trava_recarga = threading.Lock()
+        self._estado = _Estado(self.arquivo_modelo, self.arquivo_atributos)
+        self._proxima_verificacao = time.monotonic() + (intervalo_verificacao or 0)
+
+    def recarregar(self, forcar=False):
+        """Recarrega modelo e atributos se os arquivos mudaram. Retorna True se recarregou."""
+        with self._trava_recarga:
+            try:
+                versao = _versao(self.arquivo_modelo, self.arquivo_atributos)
+            except FileNotFoundError:
+                return False
+            if not forcar and versao == self._estado.versao:
+                return False
+            # Atribuição de referência é atômica: quem já pegou o estado antigo o mantém vivo
+            self._estado = _Estado(self.arquivo_modelo, self.arquivo_atributos)
+            print(f"[preditor] Modelo recarregado de {self.arquivo_modelo}.")
+            return True
+
+    def _estado_atual(self):
+        if self.intervalo_verificacao is not None and time.monotonic() >= self._proxima_verificacao:
+            self._proxima_verificacao = time.monotonic() + self.intervalo_verificacao
+            self.recarregar()
+        return self._estado
+
+    @property
+    def municipios(self):
+        return self._estado.codigos
+
+    def prever(self, cod_municipio, investimento):
+        """Melhoria prevista do IQE (delta_iqe) de um município para um investimento."""
+        estado = self._estado_atual()
+        linha = estado.linhas.get(cod_municipio)
+        if linha is None:
+            raise KeyError(f"Município {cod_municipio} não está nos atributos publicados.")
+        with estado.trava:
+            estado.linha[:] = estado.atributos[linha]
+            estado.linha[estado.coluna_investimento] = investimento
+            if estado.configuracao is None:
+                return float(estado.booster.predict(estado.linha.reshape(1, -1))[0])
+            _safe_call(_LIB.LGBM_BoosterPredictForMatSingleRowFast(
+                estado.configuracao, estado.linha.ctypes.data_as(ctypes.c_void_p),
+                ctypes.byref(estado.tamanho_saida), estado.saida.ctypes.data_as(ctypes.POINTER(ctypes.c_double))))
+            return float(estado.saida[0])
+
+    def prever_lote(self, codigos, investimentos):
+        """
+        Predições para vários pares (município, investimento). Lotes pequenos usam a
+        predição de linha única; lotes grandes, uma única chamada ao booster.
+
+        Returns:
+            np.ndarray: Melhoria prevista para cada par.
+        """
+        investimentos = np.broadcast_to(np.asarray(investimentos, dtype='float32'), (len(codigos),))
+        if len(codigos) <= 64:
+            return np.array([self.prever(codigo, investimento) for codigo, investimento in zip(codigos, investimentos)])
+        estado = self._estado_atual()
+        try:
+            linhas = np.fromiter((estado.linhas[codigo] for codigo in codigos), dtype='int64', count=len(codigos))
+        except KeyError as e:
+            raise KeyError(f"Município {e.args[0]} não está nos atributos publicados.") from None
+        matriz = estado.atributos[linhas]
+        matriz[:, estado.coluna_investimento] = investimentos
+        return estado.booster.predict(matriz)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pipeline
+
+    # Uso: python preditor.py <cod_municipio> [investimento]
+    pipeline.obter('preditor')
+    preditor = Preditor(intervalo_verificacao=None)
+    cod_municipio = int(sys.argv[1]) if len(sys.argv) > 1 else int(preditor.municipios[0])
+    investimento = float(sys.argv[2]) if len(sys.argv) > 2 else 100000.0
+    inicio = time.perf_counter()
+    melhoria = preditor.prever(cod_municipio, investimento)
+    print(f"Município {cod_municipio}, investimento de R$ {investimento:,.2f}: melhoria estimada de "
+          f"{melhoria:.4f} no IQE ({(time.perf_counter() - inicio) * 1e6:.0f} µs).")
@@ -0,0 +1,368 @@
+import base64
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import arquivos
+import iqe
+
+
+# Relatório interativo do IQE: um único HTML, com o plotly.js embutido e os dados
+# gravados uma só vez como arrays tipados (base64), lidos por todos os gráficos.
+ARQUIVO_RELATORIO = Path(__file__).parent.parent / 'data' / 'relatorios' / 'relatorio_iqe.html'
+# Pontos desenhados por gráfico de dispersão; acima disso, uma amostra por célula de grade
+LIMITE_PONTOS_DISPERSAO = 2_000
+# Pontos da curva do ranking (IQE por posição), reduzida com LTTB
+LIMITE_PONTOS_CURVA = 1_000
+LINHAS_POR_PAGINA = 50
+URL_PLOTLY_CDN = 'https://cdn.plot.ly/plotly-{versao}.min.js'
+
+ROTULOS_VARIAVEIS = {
+    'nota_saeb': 'Nota SAEB',
+    'taxa_aprovacao': 'Taxa de aprovação',
+    'iqie_infraestrutura': 'Infraestrutura (IQIE)',
+    'inse_socioeconomico': 'Nível socioeconômico (INSE)',
+    'formacao_docente': 'Formação docente',
+}
+
+
+def lttb(x, y, limite):
+    """
+    Largest-Triangle-Three-Buckets: escolhe 'limite' pontos de uma série ordenada em x
+    que preservam a forma da curva (o primeiro, o último e, em cada faixa, o que forma
+    o maior triângulo com o ponto anterior e a média da faixa seguinte).
+
+    Returns:
+        np.ndarray: Índices dos pontos escolhidos, em ordem crescente.
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    limites = np.linspace(1, n - 1, limite - 1).astype(int)
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        seguinte_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[fim:seguinte_fim].mean()
+        media_y = y[fim:seguinte_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior]) -
+                       (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(areas.argmax())
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+
+def amostrar_grade(x, y, limite):
+    """
+    Reduz uma nuvem de pontos a no máximo 'limite', guardando um ponto por célula
+    ocupada de uma grade regular. Regiões densas viram um ponto por célula e pontos
+    isolados (os extremos que interessam) são todos mantidos.
+
+    Returns:
+        tuple: (índices dos pontos mantidos, quantos municípios cada um representa).
+    """
+    n = len(x)
+    if n <= limite:
+        return np.arange(n), np.ones(n, dtype=np.int64)
+    def normalizar(v):
+        amplitude = v.max() - v.min()
+        return (v - v.min()) / amplitude if amplitude > 0 else np.zeros_like(v)
+    nx, ny = normalizar(x), normalizar(y)
+    lado = int(np.sqrt(limite)) * 2
+    while True:
+        celulas = np.minimum((nx * lado).astype(np.int64), lado - 1) * lado + np.minimum((ny * lado).astype(np.int64), lado - 1)
+        _, indices, contagens = np.unique(celulas, return_index=True, return_counts=True)
+        if len(indices) <= limite or lado <= 2:
+            ordem = np.argsort(indices)
+            return indices[ordem], contagens[ordem]
+        lado = int(lado / 1.25)
+
+
+def _array_tipado(valores, dtype):
+    """Array numpy -> {'dtype', 'dados'} com os bytes little-endian em base64."""
+    bruto = np.ascontiguousarray(valores, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': np.dtype(dtype).name, 'dados': base64.b64encode(bruto.tobytes()).decode('ascii')}
+
+
+def _correlacao(x, y):
+    return float(np.corrcoef(x, y)[0, 1]) if len(x) > 1 and x.std() > 0 and y.std() > 0 else None
+
+
+def montar_dados_relatorio(df_iqe, modelo, limite_dispersao=LIMITE_PONTOS_DISPERSAO, limite_curva=LIMITE_PONTOS_CURVA):
+    """
+    Dados do relatório, no formato embutido no HTML: colunas completas (uma vez só)
+    e, para cada gráfico, só os índices dos municípios a desenhar.
+
+    Args:
+        df_iqe (pd.DataFrame): Saída de iqe.calcular_iqe().
+        modelo (dict): Artefato do IQE (pesos e cargas), ver iqe.carregar_modelo_iqe().
+        limite_dispersao (int): Pontos por gráfico de dispersão.
+        limite_curva (int): Pontos da curva do ranking.
+
+    Returns:
+        dict: Serializável em JSON.
+    """
+    df = df_iqe.dropna(subset=['IQE']).sort_values('IQE', ascending=False).reset_index(drop=True)
+    variaveis = [variavel for variavel in modelo['variaveis'] if variavel in df]
+    iqe_valores = df['IQE'].to_numpy(dtype='float64')
+    posicoes = np.arange(1, len(df) + 1)
+
+    colunas = {'cod': _array_tipado(df['cod_municipio'], 'int32'), 'iqe': _array_tipado(iqe_valores, 'float32')}
+    dispersoes = {}
+    for variavel in variaveis:
+        valores = df[variavel].to_numpy(dtype='float64')
+        colunas[variavel] = _array_tipado(valores, 'float32')
+        validos = np.flatnonzero(~np.isnan(valores))
+        indices, contagens = amostrar_grade(valores[validos], iqe_valores[validos], limite_dispersao)
+        dispersoes[variavel] = {'indices': _array_tipado(validos[indices], 'uint32'),
+                                'contagens': _array_tipado(contagens, 'uint32'),
+                                'correlacao': _correlacao(valores[validos], iqe_valores[validos])}
+
+    return {
+        'n': int(len(df)),
+        'nomes': df['nome_municipio'].astype(str).tolist(),
+        'ufs': df['ds_uf'].astype(str).tolist() if 'ds_uf' in df else None,
+        'colunas': colunas,
+        'variaveis': [{'nome': variavel, 'rotulo': ROTULOS_VARIAVEIS.get(variavel, variavel)} for variavel in variaveis],
+        'modelo': {'variaveis': list(modelo['variaveis']), 'pesos': [float(p) for p in modelo['pesos']],
+                   'cargas': [float(c) for c in modelo['cargas']]},
+        'curva': _array_tipado(lttb(posicoes.astype('float64'), iqe_valores, limite_curva), 'uint32'),
+        'dispersoes': dispersoes,
+        'linhas_por_pagina': LINHAS_POR_PAGINA,
+    }
+
+
+def _script_plotly(incluir_plotlyjs):
+    import plotly
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+    if incluir_plotlyjs == 'cdn':
+        return f'<script src="{URL_PLOTLY_CDN.format(versao=get_plotlyjs_version())}"></script>'
+    # Sem o CDN o relatório abre offline (como no include_plotlyjs=True do plotly.py)
+    return f'<script>{get_plotlyjs()}</script><!-- plotly.py {plotly.__version__} -->'
+
+
+def gerar_relatorio(df_iqe, modelo=None, caminho=None, incluir_plotlyjs=True,
+                    limite_dispersao=LIMITE_PONTOS_DISPERSAO, limite_curva=LIMITE_PONTOS_CURVA):
+    """
+    Gera o relatório interativo do IQE em um HTML autocontido: pesos e cargas do
+    fator, curva do ranking, dispersões de cada variável contra o IQE (WebGL,
+    'scattergl') e a tabela do ranking, ordenável por qualquer coluna.
+
+    Os dados vão uma só vez no arquivo, como arrays tipados; cada gráfico guarda só os
+    índices dos municípios que desenha. Com milhares de municípios, as dispersões
+    são reduzidas a uma amostra por célula de grade (amostrar_grade()) e a curva do
+    ranking a LIMITE_PONTOS_CURVA pontos (lttb()); a tabela sempre tem todos.
+
+    Args:
+        df_iqe (pd.DataFrame): Saída de iqe.calcular_iqe().
+        modelo (dict, opcional): Artefato do IQE. Padrão: iqe.carregar_modelo_iqe() e,
+            se não houver um salvo, um novo ajuste sobre df_iqe.
+        caminho (str ou Path, opcional): Destino. Padrão: ARQUIVO_RELATORIO.
+        incluir_plotlyjs (bool ou 'cdn'): Embute o plotly.js (padrão, abre offline)
+            ou o carrega do CDN.
+        limite_dispersao (int): Pontos por gráfico de dispersão.
+        limite_curva (int): Pontos da curva do ranking.
+
+    Returns:
+        Path: Caminho do relatório gravado.
+    """
+    if df_iqe is None or df_iqe.empty:
+        raise ValueError("O IQE não foi calculado; não há o que mostrar no relatório.")
+    if modelo is None:
+        modelo = iqe.carregar_modelo_iqe() or iqe.ajustar_modelo_iqe(df_iqe.dropna(subset=iqe.VARIAVEIS_IQE))
+    dados = montar_dados_relatorio(df_iqe, modelo, limite_dispersao=limite_dispersao, limite_curva=limite_curva)
+
+    # '</' escapado: nomes de municípios não podem fechar a tag <script> dos dados
+    html = (MODELO_HTML
+            .replace('__DADOS__', json.dumps(dados, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/'))
+            .replace('__PLOTLY__', _script_plotly(incluir_plotlyjs)))
+
+    destino = Path(caminho) if caminho is not None else ARQUIVO_RELATORIO
+    arquivos.gravar_atomico(destino, html)
+    print(f"-> Relatório do IQE gravado em {destino} ({dados['n']:,} municípios, "
+          f"{destino.stat().st_size / 1e6:.1f} MB).")
+    return destino
+
+
+MODELO_HTML = r'''<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Relatório do IQE</title>
+__PLOTLY__
+<style>
+  body { font-family: system-ui, sans-serif; margin: 0 auto; max-width: 1200px; padding: 16px; color: #222; }
+  h1 { font-size: 1.5em; margin-bottom: 4px; }
+  h2 { font-size: 1.15em; margin-top: 28px; }
+  .grade { display: grid; grid-template-columns: repeat(auto-fill, minmax(360px, 1fr)); gap: 12px; }
+  .grafico { height: 360px; }
+  .nota { color: #666; font-size: 0.85em; }
+  table { border-collapse: collapse; width: 100%; font-size: 0.9em; }
+  th, td { padding: 4px 8px; border-bottom: 1px solid #ddd; text-align: right; }
+  th { cursor: pointer; background: #f4f4f4; position: sticky; top: 0; user-select: none; }
+  th:nth-child(2), td:nth-child(2), th:nth-child(3), td:nth-child(3) { text-align: left; }
+  .controles { display: flex; gap: 8px; align-items: center; margin: 8px 0; }
+</style>
+</head>
+<body>
+<h1>Índice de Qualidade da Educação (IQE)</h1>
+<p class="nota" id="resumo"></p>
+
+<h2>Pesos e cargas do fator</h2>
+<div class="grade">
+  <div class="grafico" id="grafico-pesos"></div>
+  <div class="grafico" id="grafico-curva"></div>
+</div>
+
+<h2>Variáveis contra o IQE</h2>
+<div class="grade" id="dispersoes"></div>
+
+<h2>Ranking</h2>
+<div class="controles">
+  <input id="busca" type="search" placeholder="Filtrar por nome ou UF">
+  <button id="anterior">&larr;</button><span id="pagina"></span><button id="seguinte">&rarr;</button>
+</div>
+<table><thead id="cabecalho"></thead><tbody id="linhas"></tbody></table>
+
+<script id="dados" type="application/json">__DADOS__</script>
+<script>
+const DADOS = JSON.parse(document.getElementById('dados').textContent);
+const TIPOS = { float32: Float32Array, int32: Int32Array, uint32: Uint32Array };
+
+// Cada coluna é decodificada uma vez; os gráficos só indexam esses arrays
+function decodificar(a) {
+  const bytes = Uint8Array.from(atob(a.dados), c => c.charCodeAt(0));
+  return new TIPOS[a.dtype](bytes.buffer);
+}
+const col = {};
+for (const [nome, a] of Object.entries(DADOS.colunas)) col[nome] = decodificar(a);
+const n = DADOS.n;
+const rotulo = Object.fromEntries(DADOS.variaveis.map(v => [v.nome, v.rotulo]));
+const rotuloMunicipio = i => DADOS.ufs ? `${DADOS.nomes[i]} (${DADOS.ufs[i]})` : DADOS.nomes[i];
+const selecionar = (valores, indices) => {
+  const saida = new Float32Array(indices.length);
+  for (let k = 0; k < indices.length; k++) saida[k] = valores[indices[k]];
+  return saida;
+};
+const CONFIG = { responsive: true, displaylogo: false };
+const fmt = (v, c = 2) => Number.isNaN(v) ? '—' : v.toFixed(c);
+
+document.getElementById('resumo').textContent =
+  `${n.toLocaleString('pt-BR')} municípios. Gráficos em WebGL; dispersões com até ` +
+  `${Math.max(...Object.values(DADOS.dispersoes).map(d => decodificar(d.indices).length)).toLocaleString('pt-BR')} pontos, ` +
+  `um por célula de grade quando há mais municípios.`;
+
+// Pesos (cargas² normalizadas) e cargas do fator
+const m = DADOS.modelo;
+Plotly.newPlot('grafico-pesos', [
+  { type: 'bar', name: 'Peso', x: m.variaveis.map(v => rotulo[v] || v), y: m.pesos, marker: { color: '#2c7fb8' },
+    hovertemplate: '%{x}<br>Peso: %{y:.1%}<extra></extra>' },
+  { type: 'bar', name: 'Carga', x: m.variaveis.map(v => rotulo[v] || v), y: m.cargas, marker: { color: '#7fcdbb' },
+    hovertemplate: '%{x}<br>Carga: %{y:.3f}<extra></extra>' },
+], { title: { text: 'Pesos e cargas' }, barmode: 'group', margin: { b: 90 }, legend: { orientation: 'h' } }, CONFIG);
+
+// Curva do ranking, reduzida com LTTB
+const curva = decodificar(DADOS.curva);
+Plotly.newPlot('grafico-curva', [{
+  type: 'scattergl', mode: 'lines+markers', marker: { size: 3 }, line: { color: '#253494' },
+  x: Float32Array.from(curva, i => i + 1), y: selecionar(col.iqe, curva),
+  text: Array.from(curva, i => rotuloMunicipio(i)),
+  hovertemplate: '%{text}<br>Posição %{x}<br>IQE %{y:.2f}<extra></extra>',
+}], { title: { text: 'IQE por posição no ranking' }, xaxis: { title: { text: 'Posição' } }, yaxis: { title: { text: 'IQE' } } }, CONFIG);
+
+// Dispersões de cada variável contra o IQE
+const contenedor = document.getElementById('dispersoes');
+for (const v of DADOS.variaveis) {
+  const d = DADOS.dispersoes[v.nome];
+  const indices = decodificar(d.indices), contagens = decodificar(d.contagens);
+  const div = document.createElement('div');
+  div.className = 'grafico';
+  contenedor.appendChild(div);
+  const agregado = indices.length < n;
+  Plotly.newPlot(div, [{
+    type: 'scattergl', mode: 'markers',
+    x: selecionar(col[v.nome], indices), y: selecionar(col.iqe, indices),
+    text: Array.from(indices, (i, k) => contagens[k] > 1
+      ? `${rotuloMunicipio(i)} e mais ${contagens[k] - 1} próximos` : rotuloMunicipio(i)),
+    marker: { size: 5, opacity: 0.7, color: agregado ? Array.from(contagens, c => Math.log10(c)) : '#2c7fb8',
+              colorscale: 'Viridis', showscale: agregado,
+              colorbar: agregado ? { title: { text: 'log₁₀ municípios' }, thickness: 10 } : undefined },
+    hovertemplate: `%{text}<br>${v.rotulo}: %{x:.2f}<br>IQE: %{y:.2f}<extra></extra>`,
+  }], {
+    title: { text: v.rotulo + (d.correlacao === null ? '' : ` (r = ${d.correlacao.toFixed(2)})`) },
+    xaxis: { title: { text: v.rotulo } }, yaxis: { title: { text: 'IQE' } }, margin: { t: 40 },
+  }, CONFIG);
+}
+
+// Tabela do ranking: ordenável por qualquer coluna, com filtro e paginação
+const colunasTabela = [
+  { titulo: 'Posição', valor: i => i + 1, texto: i => String(i + 1) },
+  { titulo: 'Município', valor: i => DADOS.nomes[i], texto: i => DADOS.nomes[i] },
+  ...(DADOS.ufs ? [{ titulo: 'UF', valor: i => DADOS.ufs[i], texto: i => DADOS.ufs[i] }] : []),
+  { titulo: 'IQE', valor: i => col.iqe[i], texto: i => fmt(col.iqe[i]) },
+  ...DADOS.variaveis.map(v => ({ titulo: v.rotulo, valor: i => col[v.nome][i], texto: i => fmt(col[v.nome][i]) })),
+];
+let ordemColuna = 0, crescente = true, pagina = 0, visiveis = Array.from({ length: n }, (_, i) => i);
+
+function ordenar() {
+  const chave = colunasTabela[ordemColuna].valor, sinal = crescente ? 1 : -1;
+  visiveis.sort((a, b) => {
+    const va = chave(a), vb = chave(b);
+    return (typeof va === 'string' ? va.localeCompare(vb, 'pt-BR') : va - vb) * sinal;
+  });
+}
+function desenharTabela() {
+  const porPagina = DADOS.linhas_por_pagina, paginas = Math.max(1, Math.ceil(visiveis.length / porPagina));
+  pagina = Math.min(pagina, paginas - 1);
+  document.getElementById('cabecalho').innerHTML = '<tr>' + colunasTabela.map((c, k) =>
+    `<th data-coluna="${k}">${c.titulo}${k === ordemColuna ? (crescente ? ' ▲' : ' ▼') : ''}</th>`).join('') + '</tr>';
+  const corpo = document.getElementById('linhas');
+  corpo.replaceChildren(...visiveis.slice(pagina * porPagina, (pagina + 1) * porPagina).map(i => {
+    const tr = document.createElement('tr');
+    for (const c of colunasTabela) {
+      const td = document.createElement('td');
+      td.textContent = c.texto(i);
+      tr.appendChild(td);
+    }
+    return tr;
+  }));
+  document.getElementById('pagina').textContent = ` ${pagina + 1} de ${paginas} (${visiveis.length.toLocaleString('pt-BR')}) `;
+}
+document.getElementById('cabecalho').addEventListener('click', e => {
+  const th = e.target.closest('th');
+  if (!th) return;
+  const k = Number(th.dataset.coluna);
+  crescente = k === ordemColuna ? !crescente : true;
+  ordemColuna = k;
+  ordenar();
+  desenharTabela();
+});
+document.getElementById('busca').addEventListener('input', e => {
+  const termo = e.target.value.trim().toLocaleLowerCase('pt-BR');
+  visiveis = [];
+  for (let i = 0; i < n; i++) {
+    if (!termo || rotuloMunicipio(i).toLocaleLowerCase('pt-BR').includes(termo)) visiveis.push(i);
+  }
+  pagina = 0;
+  ordenar();
+  desenharTabela();
+});
+document.getElementById('anterior').addEventListener('click', () => { pagina = Math.max(0, pagina - 1); desenharTabela(); });
+document.getElementById('seguinte').addEventListener('click', () => { pagina++; desenharTabela(); });
+desenharTabela();
+</script>
+</body>
+</html>
+'''
+
+
+if __name__ == "__main__":
+    # Uso: python relatorio.py [--cdn]
+    import pipeline
+    gerar_relatorio(pipeline.obter('iqe'), pipeline.obter('modelo_iqe'),
+                    incluir_plotlyjs='cdn' if '--cdn' in sys.argv[1:] else True)
@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+
+import iqe
+
+
+class SimuladorIQE:
+    """
+    Simulações "e se" sobre uma tabela de IQE já calculada, sem reextrair dados nem
+    refazer a análise fatorial: os pesos e a padronização do modelo ficam fixos.
+
+    Os IQE originais (antes da escala de 1 a 10) ficam em um array ordenado, de onde
+    saem o mínimo, o máximo e a posição de qualquer valor por busca binária. Alterar
+    alguns municípios custa O(n) em cópia de memória (microssegundos para os 5.570
+    municípios), e não uma nova pontuação da tabela inteira.
+
+    Exemplo:
+        simulador = SimuladorIQE(df_iqe, modelo)
+        simulador.simular({'Itatuba': {'taxa_aprovacao': 5}})
+        simulador.simular_lote(['Itatuba'] * 3, {'taxa_aprovacao': [1, 5, 10]})
+    """
+
+    def __init__(self, df_iqe, modelo, escala_fixa=False):
+        """
+        Args:
+            df_iqe (pd.DataFrame): Tabela com 'cod_municipio', 'nome_municipio' e as
+                variáveis do modelo (ex.: a saída de iqe.calcular_iqe()).
+            modelo (dict): Modelo do IQE (iqe.ajustar_modelo_iqe() ou iqe.carregar_modelo_iqe()).
+            escala_fixa (bool): Se True, a escala de 1 a 10 usa sempre o mínimo e o máximo
+                do ajuste, e um município alterado não muda o IQE dos demais. Se False
+                (padrão), a escala acompanha o mínimo e o máximo da tabela, como em calcular_iqe().
+        """
+        df = df_iqe.dropna(subset=modelo['variaveis']).reset_index(drop=True)
+        if df.empty:
+            raise ValueError("A tabela do IQE não tem municípios com dados completos.")
+        self.modelo = modelo
+        self.escala_fixa = escala_fixa
+        self.variaveis = list(modelo['variaveis'])
+        self._colunas = {variavel: j for j, variavel in enumerate(self.variaveis)}
+        self._medias = np.asarray(modelo['medias'], dtype='float64')
+        # Efeito de uma unidade de cada variável no IQE original: peso / desvio padrão
+        self._coeficientes = np.asarray(modelo['pesos'], dtype='float64') / np.asarray(modelo['desvios'], dtype='float64')
+
+        self._codigos = df['cod_municipio'].to_numpy()
+        self._nomes = df['nome_municipio'].to_numpy() if 'nome_municipio' in df else None
+        self._indices = {codigo: i for i, codigo in enumerate(self._codigos.tolist())}
+        self._indices_por_nome = {}
+        if self._nomes is not None:
+            for i, nome in enumerate(self._nomes):
+                self._indices_por_nome.setdefault(str(nome).strip().lower(), []).append(i)
+
+        self._valores = df[self.variaveis].to_numpy(dtype='float64')
+        self._original = self._pontuar(self._valores)
+        self._ordenados = np.sort(self._original)
+
+    # ---------------------------------------------------------------------
+    # Auxiliares
+    # ---------------------------------------------------------------------
+
+    def _pontuar(self, valores):
+        return (valores - self._medias) @ self._coeficientes
+
+    def _indice(self, municipio):
+        """Aceita o código IBGE ou o nome do município (sem diferenciar maiúsculas)."""
+        if isinstance(municipio, str):
+            indices = self._indices_por_nome.get(municipio.strip().lower(), [])
+            if len(indices) > 1:
+                raise ValueError(f"Há {len(indices)} municípios chamados '{municipio}'. Use o código IBGE.")
+            if indices:
+                return indices[0]
+        else:
+            indice = self._indices.get(int(municipio))
+            if indice is not None:
+                return indice
+        raise KeyError(f"Município '{municipio}' não está na tabela do IQE.")
+
+    def _coluna(self, variavel):
+        if variavel not in self._colunas:
+            raise ValueError(f"Variável '{variavel}' não faz parte do IQE. Use uma de {self.variaveis}.")
+        return self._colunas[variavel]
+
+    def _limites(self, ordenados):
+        if self.escala_fixa:
+            return self.modelo['minimo'], self.modelo['maximo']
+        return ordenados[0], ordenados[-1]
+
+    @staticmethod
+    def _escala(original, minimo, maximo):
+        return (original - minimo) / (maximo - minimo) * 9 + 1
+
+    @staticmethod
+    def _posicao(ordenados, original):
+        # Posição 1 é o maior IQE: 1 + quantos valores são estritamente maiores
+        return len(ordenados) - np.searchsorted(ordenados, original, side='right') + 1
+
+    def _novos_valores(self, alteracoes, absoluto):
+        indices, linhas = [], []
+        for municipio, mudancas in alteracoes.items():
+            i = self._indice(municipio)
+            if i in indices:
+                raise ValueError(f"Município '{municipio}' aparece mais de uma vez no cenário.")
+            linha = self._valores[i].copy()
+            for variavel, valor in mudancas.items():
+                j = self._coluna(variavel)
+                linha[j] = valor if absoluto else linha[j] + valor
+            indices.append(i)
+            linhas.append(linha)
+        return np.array(indices, dtype='int64'), np.array(linhas).reshape(len(indices), len(self.variaveis))
+
+    def _substituir(self, antigos, novos):
+        """Array ordenado com os valores 'antigos' trocados pelos 'novos'."""
+        ordenados = self._ordenados
+        for valor in antigos:
+            ordenados = np.delete(ordenados, np.searchsorted(ordenados, valor))
+        novos = np.sort(novos)
+        return np.insert(ordenados, np.searchsorted(ordenados, novos), novos)
+
+    # ---------------------------------------------------------------------
+    # Consultas
+    # ---------------------------------------------------------------------
+
+    def consultar(self, municipio):
+        """IQE e posição atuais de um município."""
+        i = self._indice(municipio)
+        minimo, maximo = self._limites(self._ordenados)
+        return {
+            'cod_municipio': self._codigos[i].item(),
+            'IQE': float(self._escala(self._original[i], minimo, maximo)),
+            'posicao': int(self._posicao(self._ordenados, self._original[i])),
+        }
+
+    def simular(self, alteracoes, absoluto=False, aplicar=False):
+        """
+        Um cenário que altera um ou mais municípios ao mesmo tempo.
+
+        Args:
+            alteracoes (dict): Município (código ou nome) -> {variável: valor}.
+                Ex.: {'Itatuba': {'taxa_aprovacao': 5}}.
+            absoluto (bool): Se False (padrão), os valores são somados aos atuais;
+                se True, substituem os atuais.
+            aplicar (bool): Se True, o cenário passa a ser o estado da tabela.
+
+        Returns:
+            list: Um dict por município alterado com 'IQE_anterior', 'IQE',
+                  'posicao_anterior' e 'posicao'.
+        """
+        indices, valores = self._novos_valores(alteracoes, absoluto)
+        antigos = self._original[indices]
+        novos = self._pontuar(valores)
+        ordenados = self._substituir(antigos, novos)
+
+        minimo_anterior, maximo_anterior = self._limites(self._ordenados)
+        minimo, maximo = self._limites(ordenados)
+        iqe_anterior = self._escala(antigos, minimo_anterior, maximo_anterior)
+        iqe_novo = self._escala(novos, minimo, maximo)
+        posicao_anterior = self._posicao(self._ordenados, antigos)
+        posicao = self._posicao(ordenados, novos)
+
+        if aplicar:
+            self._valores[indices] = valores
+            self._original[indices] = novos
+            self._ordenados = ordenados
+        return [{
+            'cod_municipio': self._codigos[i].item(),
+            'IQE_anterior': float(iqe_anterior[k]),
+            'IQE': float(iqe_novo[k]),
+            'posicao_anterior': int(posicao_anterior[k]),
+            'posicao': int(posicao[k]),
+        } for k, i in enumerate(indices)]
+
+    def aplicar(self, alteracoes, absoluto=False):
+        """Atalho para simular(..., aplicar=True)."""
+        return self.simular(alteracoes, absoluto=absoluto, aplicar=True)
+
+    def simular_lote(self, municipios, variacoes, absoluto=False):
+        """
+        Muitos cenários independentes de uma vez, cada um alterando um único município
+        (os demais ficam como estão). Tudo é vetorizado: milhares de cenários custam
+        alguns milissegundos.
+
+        Args:
+            municipios (list): Município (código ou nome) de cada cenário.
+            variacoes (dict ou pd.DataFrame): Variável -> valores, um por cenário.
+            absoluto (bool): Se True, os valores substituem os atuais em vez de somar.
+
+        Returns:
+            pd.DataFrame: Uma linha por cenário com 'cod_municipio', 'IQE_anterior',
+                          'IQE', 'posicao_anterior' e 'posicao'.
+        """
+        indices = np.array([self._indice(municipio) for municipio in municipios], dtype='int64')
+        valores = self._valores[indices]
+        for variavel, valores_variavel in dict(variacoes).items():
+            j = self._coluna(variavel)
+            valores_variavel = np.asarray(valores_variavel, dtype='float64')
+            valores[:, j] = valores_variavel if absoluto else valores[:, j] + valores_variavel
+        antigos = self._original[indices]
+        novos = self._pontuar(valores)
+
+        ordenados = self._ordenados
+        minimo_anterior, maximo_anterior = self._limites(ordenados)
+        if self.escala_fixa:
+            minimo, maximo = minimo_anterior, maximo_anterior
+        else:
+            # Extremos dos demais municípios: se o alterado era o extremo, vale o seguinte
+            minimo_outros = np.where(antigos == ordenados[0], ordenados[min(1, len(ordenados) - 1)], ordenados[0])
+            maximo_outros = np.where(antigos == ordenados[-1], ordenados[max(-2, -len(ordenados))], ordenados[-1])
+            minimo, maximo = np.minimum(minimo_outros, novos), np.maximum(maximo_outros, novos)
+        maiores_outros = (len(ordenados) - np.searchsorted(ordenados, novos, side='right')) - (antigos > novos)
+        return pd.DataFrame({
+            'cod_municipio': self._codigos[indices],
+            'IQE_anterior': self._escala(antigos, minimo_anterior, maximo_anterior),
+            'IQE': self._escala(novos, minimo, maximo),
+            'posicao_anterior': self._posicao(ordenados, antigos),
+            'posicao': maiores_outros + 1,
+        })
+
+    def tabela(self):
+        """Estado atual (com as alterações aplicadas), no formato de iqe.calcular_iqe()."""
+        minimo, maximo = self._limites(self._ordenados)
+        df = pd.DataFrame(self._valores, columns=self.variaveis)
+        df.insert(0, 'cod_municipio', self._codigos)
+        if self._nomes is not None:
+            df.insert(1, 'nome_municipio', self._nomes)
+        df['IQE_original'] = self._original
+        df['IQE'] = self._escala(self._original, minimo, maximo)
+        df['posicao'] = self._posicao(self._ordenados, self._original)
+        return df.sort_values('IQE_original', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pipeline
+
+    # Uso: python simulacao.py <município> <variável> <variação>
+    #      ex.: python simulacao.py Itatuba taxa_aprovacao 5
+    if len(sys.argv) != 4:
+        sys.exit(f"Uso: python simulacao.py <município> <variável> <variação>   (variáveis: {iqe.VARIAVEIS_IQE})")
+    municipio, variavel, variacao = sys.argv[1], sys.argv[2], float(sys.argv[3])
+    simulador = SimuladorIQE(pipeline.obter('iqe'), pipeline.obter('modelo_iqe'))
+    for resultado in simulador.simular({municipio: {variavel: variacao}}):
+        print(f"\n{municipio}: {variavel} {variacao:+g}")
+        print(f"  IQE:     {resultado['IQE_anterior']:.2f} -> {resultado['IQE']:.2f}")
+        print(f"  Posição: {resultado['posicao_anterior']} -> {resultado['posicao']}")
@@ -0,0 +1,197 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import arquivos
+
+
+# Diretório da área de staging; pode ser trocado pela variável de ambiente PORTAL_STAGING_DIR
+DIRETORIO_STAGING = Path(os.environ.get('PORTAL_STAGING_DIR', Path(__file__).parent.parent / 'data' / 'staging'))
+
+# A gravação pode ser desligada com PORTAL_STAGING=0 (a leitura continua disponível)
+ATIVO = os.environ.get('PORTAL_STAGING', '1').lower() not in ('0', 'false', 'nao', 'não')
+
+_TEXTO_CATEGORICO = pa.dictionary(pa.int32(), pa.string())
+
+# Esquemas explícitos de cada fonte. Códigos usam inteiros de 32 bits, nomes e UFs
+# repetidos são codificados como dicionário e indicadores do censo cabem em int8.
+# As medidas contínuas permanecem em float64 para que os dados relidos do staging
+# produzam exatamente o mesmo IQE que os dados recém-extraídos.
+ESQUEMAS = {
+    'censo_escolas': pa.schema([
+        ('SG_UF', _TEXTO_CATEGORICO),
+        ('NO_MUNICIPIO', _TEXTO_CATEGORICO),
+        ('CO_MUNICIPIO', pa.int32()),
+        ('CO_ENTIDADE', pa.int32()),
+        ('IN_AGUA_INEXISTENTE', pa.int8()),
+        ('IN_ENERGIA_INEXISTENTE', pa.int8()),
+        ('IN_ESGOTO_INEXISTENTE', pa.int8()),
+        ('IN_TRATAMENTO_LIXO_INEXISTENTE', pa.int8()),
+        ('IN_BANHEIRO', pa.int8()),
+        ('IN_BIBLIOTECA', pa.int8()),
+        ('IN_LABORATORIO_CIENCIAS', pa.int8()),
+        ('IN_LABORATORIO_INFORMATICA', pa.int8()),
+        ('IN_QUADRA_ESPORTES', pa.int8()),
+        ('IN_ACESSIBILIDADE_INEXISTENTE', pa.int8()),
+        ('QT_SALAS_UTILIZA_CLIMATIZADAS', pa.int32()),
+        ('QT_SALAS_UTILIZADAS', pa.int32()),
+        ('IN_BANDA_LARGA', pa.int8()),
+    ]),
+    'infraestrutura': pa.schema([
+        ('Código do Município', pa.int32()),
+        ('Nome do Município', pa.string()),
+        ('IQIE', pa.float64()),
+    ]),
+    'dtb': pa.schema([
+        ('id_uf', pa.int8()),
+        ('ds_uf', _TEXTO_CATEGORICO),
+        ('ds_rgi', _TEXTO_CATEGORICO),
+        ('id_mundv', pa.int32()),
+        ('ds_mun', pa.string()),
+        ('ds_formatada', pa.string()),
+        ('ano', pa.int16()),
+    ]),
+    'saeb': pa.schema([
+        ('Codigo_Municipio', pa.int32()),
+        ('Nome_Municipio', pa.string()),
+        ('Nota_Media_SAEB', pa.float64()),
+    ]),
+    'aprovacao': pa.schema([
+        ('cod_municipio', pa.int32()),
+        ('nome_municipio', pa.string()),
+        ('taxa_aprovacao', pa.float64()),
+    ]),
+    'inse': pa.schema([
+        ('CO_MUNICIPIO', pa.int32()),
+        ('NO_MUNICIPIO', pa.string()),
+        ('MEDIA_INSE', pa.float64()),
+    ]),
+    'afd': pa.schema([
+        ('cod_municipio', pa.int32()),
+        ('nome_municipio', pa.string()),
+        ('media_percentual_formacao_adequada', pa.float64()),
+    ]),
+    'ia': pa.schema([
+        ('ds_mun', pa.string()),
+        ('sg_uf', _TEXTO_CATEGORICO),
+        ('nprojetos', pa.float64()),
+        ('nbeneficiados', pa.float64()),
+        ('ninstituicoes', pa.float64()),
+        ('ano_atuacao', pa.int16()),
+    ]),
+}
+
+# Linhas por row group: grupos pequenos o bastante para que filtros por código
+# de município ou UF descartem a maior parte do arquivo sem lê-lo
+LINHAS_POR_GRUPO = 50_000
+
+
+def caminho(nome):
+    return DIRETORIO_STAGING / f'{nome}.parquet'
+
+
+def existe(nome):
+    return caminho(nome).exists()
+
+
+def _para_tabela(nome, df):
+    esquema = ESQUEMAS[nome]
+    # Colunas opcionais ausentes (ex.: 'ninstituicoes' em anos sem essa informação) viram nulas
+    df = df.reindex(columns=esquema.names)
+    return pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+
+def salvar(nome, df, ordenar_por=None):
+    """
+    Grava a saída tratada de uma fonte em Parquet, com o esquema compacto de ESQUEMAS.
+
+    A escrita é atômica (arquivo temporário + rename). Falhas de gravação apenas
+    geram um aviso: o staging nunca interrompe a extração.
+
+    Args:
+        nome (str): Nome da fonte (chave de ESQUEMAS).
+        df (pd.DataFrame): Dados tratados da fonte.
+        ordenar_por (str ou list, opcional): Colunas usadas para ordenar as linhas
+            antes da gravação, o que torna as estatísticas dos row groups seletivas.
+
+    Returns:
+        pathlib.Path ou None: Caminho do arquivo gravado, ou None se nada foi gravado.
+    """
+    if not ATIVO or df is None or df.empty:
+        return None
+    destino = caminho(nome)
+    try:
+        if ordenar_por is not None:
+            df = df.sort_values(ordenar_por)
+        tabela = _para_tabela(nome, df)
+        with arquivos.escrita_atomica(destino) as temporario:
+            pq.write_table(tabela, temporario, row_group_size=LINHAS_POR_GRUPO, compression='zstd')
+        print(f"[staging] '{nome}' gravado com {tabela.num_rows} linhas em {destino.name}.")
+        return destino
+    except (pa.ArrowException, OSError, ValueError, TypeError) as e:
+        print(f"[staging] AVISO: não foi possível gravar '{nome}': {e}")
+        return None
+
+
+class EscritorStaging:
+    """
+    Grava uma fonte em Parquet bloco a bloco (um row group por bloco), para dados
+    que não cabem em memória de uma só vez, como as linhas de escolas do censo.
+    O arquivo final só substitui o anterior quando o escritor é fechado sem erro.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.esquema = ESQUEMAS[nome]
+        self.destino = caminho(nome)
+        self.linhas = 0
+        self._escrita = None
+        self._escritor = None
+
+    def __enter__(self):
+        if ATIVO:
+            self._escrita = arquivos.escrita_atomica(self.destino)
+            self._escritor = pq.ParquetWriter(self._escrita.__enter__(), self.esquema, compression='zstd')
+        return self
+
+    def escrever(self, df):
+        if self._escritor is None:
+            return
+        tabela = _para_tabela(self.nome, df)
+        self._escritor.write_table(tabela)
+        self.linhas += tabela.num_rows
+
+    def __exit__(self, tipo_erro, erro, rastreamento):
+        if self._escritor is None:
+            return False
+        self._escritor.close()
+        # escrita_atomica troca o arquivo se não houve erro e apaga o temporário se houve
+        self._escrita.__exit__(tipo_erro, erro, rastreamento)
+        if tipo_erro is None:
+            print(f"[staging] '{self.nome}' gravado com {self.linhas} linhas em {self.destino.name}.")
+        return False
+
+
+def carregar(nome, colunas=None, filtros=None):
+    """
+    Lê uma fonte do staging, carregando apenas as colunas e row groups necessários.
+
+    Args:
+        nome (str): Nome da fonte (chave de ESQUEMAS).
+        colunas (list, opcional): Colunas a carregar (as demais não são lidas do disco).
+        filtros (list, opcional): Filtros no formato do pyarrow, ex.:
+            [('CO_MUNICIPIO', 'in', [2504009, 2507507])]. Row groups cujas
+            estatísticas não satisfazem o filtro são descartados sem leitura.
+
+    Returns:
+        pd.DataFrame: Os dados pedidos, ou um DataFrame vazio se a fonte não estiver no staging.
+    """
+    arquivo = caminho(nome)
+    if not arquivo.exists():
+        print(f"[staging] AVISO: a fonte '{nome}' ainda não foi gravada no staging.")
+        return pd.DataFrame()
+    tabela = pq.read_table(arquivo, columns=colunas, filters=filtros)
+    return tabela.to_pandas()
@@ -1,116 +1,225 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
 import pandas as pd
 # Assumindo que todas as suas funções de extração estão em um único 'extract.py'
 import extract 
+import cache
+import instrumentacao
+import staging
+import indice_municipios
 
-def criar_base_municipios_atuacao():
+
+def _obter_fonte(nome, funcao_extracao, usar_staging, colunas=None, filtros=None):
+    """
+    Lê a fonte do staging (apenas as colunas/linhas necessárias) quando pedido e
+    disponível; caso contrário, executa a função de extração correspondente.
+    """
+    if usar_staging and staging.existe(nome):
+        print(f"-> Fonte '{nome}' carregada do staging, sem nova extração.")
+        return staging.carregar(nome, colunas=colunas, filtros=filtros)
+    return funcao_extracao()
+
+@instrumentacao.instrumentar('transform')
+def criar_base_municipios_atuacao(usar_staging=False):
     """
     Cria a base de dados mestre com os municípios de atuação do Instituto,
     cruzando os dados do IA com a base oficial de municípios do IBGE (DTB).
-    Esta função é baseada no seu script 'transform.py' original.
+
+    O cruzamento usa o índice persistido de nomes de municípios (indice_municipios),
+    construído uma vez por edição da DTB, em vez de baixar e normalizar a DTB a
+    cada execução. Linhas do IA sem correspondência ou ambíguas são reportadas.
+
+    Args:
+        usar_staging (bool): Se True, reaproveita os dados do IA gravados no staging
+                             em vez de extraí-los novamente.
 
     Returns:
         pd.DataFrame: DataFrame com a lista única de municípios de atuação.
     """
     print("--- ETAPA 1: Criando a base de municípios de atuação do Instituto ---")
-    df_ia = extract.ler_ia()
-    df_dtb = extract.ler_dtb()
+    df_ia = _obter_fonte('ia', extract.ler_ia, usar_staging)
+    indice = indice_municipios.atualizar_indice()
 
-    if df_ia.empty or df_dtb.empty:
-        print("ERRO: DataFrame do IA ou DTB está vazio. Não é possível continuar.")
+    if df_ia.empty or not indice['municipios']:
+        print("ERRO: DataFrame do IA ou índice da DTB está vazio. Não é possível continuar.")
         return pd.DataFrame()
 
-    # Função interna para replicar a formatação do seu script
-    def formatar_nome(df, coluna, novo_nome="ds_formatada"):
-        df[novo_nome] = (df[coluna].str.upper()
-                           .str.replace("[-.!?'`()]", "", regex=True)
-                           .str.replace("- MIXING CENTER", "")
-                           .str.strip()
-                           .str.replace(" ", ""))
-        return df
-
-    df_ia = formatar_nome(df=df_ia, coluna='ds_mun')
-    df_ia['ds_uf'] = df_ia['sg_uf'].map({"PB": "Paraíba", "PE": "Pernambuco",
-                                       "MG": "Minas Gerais", "SP": "São Paulo"})
-    print("-> Dados do Instituto (IA) formatados.")
-
-    data_m = pd.merge(df_ia, df_dtb, how='inner', on=['ds_formatada', 'ds_uf'],
-                      suffixes=['_ia', '_dtb'])
-    print(f"-> Merge entre IA e DTB concluído. {len(data_m)} registros de atuação encontrados.")
-    
-    # ##################################################################
-    # CORREÇÃO APLICADA AQUI 
-    # Renomeia 'id_mundv' (que veio do dtb) diretamente para 'cod_municipio'
-    # e 'ds_mun_dtb' para 'nome_municipio', pois não há sufixo no 'id_mundv'.
-    data_m.rename(columns={
-        'id_mundv': 'cod_municipio', 
-        'ds_mun_dtb': 'nome_municipio'
-    }, inplace=True)
-    # ##################################################################
+    data_m, relatorio = indice_municipios.casar_municipios(df_ia, indice)
+    print(f"-> Cruzamento entre IA e DTB concluído. {len(data_m)} registros de atuação encontrados.")
+    indice_municipios.imprimir_relatorio_casamento(relatorio)
     
     municipios_unicos = data_m[['cod_municipio', 'nome_municipio', 'ds_uf']].drop_duplicates().reset_index(drop=True)
     print(f"-> Base final com {len(municipios_unicos)} municípios de atuação únicos.")
     
     return municipios_unicos
 
-def criar_base_de_analise_completa():
+# Fontes das 5 variáveis de análise: função de extração e renomeação das colunas usadas
+# (as chaves de cada dicionário também são as únicas colunas lidas do staging)
+FONTES_VARIAVEIS = {
+    'saeb': (extract.pt_mt_saeb, {'Codigo_Municipio': 'cod_municipio', 'Nota_Media_SAEB': 'nota_saeb'}),
+    'aprovacao': (extract.aprov_ideb, {'cod_municipio': 'cod_municipio', 'taxa_aprovacao': 'taxa_aprovacao'}),
+    'infraestrutura': (extract.gerar_indice_infraestrutura_municipal, {'Código do Município': 'cod_municipio', 'IQIE': 'iqie_infraestrutura'}),
+    'inse': (extract.processar_inse, {'CO_MUNICIPIO': 'cod_municipio', 'MEDIA_INSE': 'inse_socioeconomico'}),
+    'afd': (extract.extrair_afd, {'cod_municipio': 'cod_municipio', 'media_percentual_formacao_adequada': 'formacao_docente'}),
+}
+
+
+def _executar_tarefa(nome, funcao, inicios):
+    """Executa uma tarefa de extração medindo o tempo e capturando qualquer erro."""
+    inicios[nome] = time.perf_counter()
+    try:
+        resultado, erro = funcao(), None
+    except Exception as e:
+        resultado, erro = None, e
+    return resultado, time.perf_counter() - inicios[nome], erro
+
+
+def executar_extracoes(tarefas, paralelo=True, max_workers=6, timeout_por_fonte=None):
+    """
+    Executa as tarefas de extração, de forma concorrente ou sequencial, isolando falhas.
+
+    Cada tarefa roda em uma thread de um pool limitado (o trabalho é quase todo
+    download e leitura de arquivos). Uma fonte que falha, retorna vazio ou estoura
+    o timeout é registrada como falha, sem descartar as demais.
+
+    Args:
+        tarefas (dict): Nome da fonte -> função sem argumentos que retorna um DataFrame.
+        paralelo (bool): Se False, as tarefas rodam uma após a outra (comportamento antigo).
+        max_workers (int): Tamanho máximo do pool de threads.
+        timeout_por_fonte (float, opcional): Tempo máximo, em segundos, de cada fonte
+            a partir do início da sua execução. Só é aplicado no modo paralelo.
+
+    Returns:
+        tuple: (dict nome -> DataFrame ou None, pd.DataFrame com status e tempo por fonte)
+    """
+    resultados, linhas_relatorio, inicios = {}, [], {}
+    inicio_total = time.perf_counter()
+
+    def registrar(nome, resultado, tempo, erro):
+        if isinstance(erro, TimeoutError):
+            status = 'timeout'
+        elif erro is not None:
+            status = f'erro: {erro}'
+        elif resultado is None or resultado.empty:
+            status = 'vazio'
+        else:
+            status = 'ok'
+        resultados[nome] = resultado if status == 'ok' else None
+        linhas_relatorio.append({'fonte': nome, 'status': status, 'tempo_s': round(tempo, 2),
+                                 'linhas': 0 if resultados[nome] is None else len(resultado)})
+
+    if not paralelo:
+        for nome, funcao in tarefas.items():
+            registrar(nome, *_executar_tarefa(nome, funcao, inicios))
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extracao')
+        futuros = {executor.submit(_executar_tarefa, nome, funcao, inicios): nome for nome, funcao in tarefas.items()}
+        pendentes = set(futuros)
+        while pendentes:
+            concluidos, pendentes = wait(pendentes, timeout=0.5, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                registrar(futuros[futuro], *futuro.result())
+            if timeout_por_fonte is None:
+                continue
+            agora = time.perf_counter()
+            for futuro in list(pendentes):
+                nome = futuros[futuro]
+                if nome in inicios and agora - inicios[nome] > timeout_por_fonte:
+                    # A thread não pode ser interrompida: o resultado dela é apenas descartado
+                    futuro.cancel()
+                    pendentes.discard(futuro)
+                    registrar(nome, None, agora - inicios[nome], TimeoutError())
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    tempo_total = time.perf_counter() - inicio_total
+    relatorio = pd.DataFrame(linhas_relatorio, columns=['fonte', 'status', 'tempo_s', 'linhas'])
+    print("\n--- Relatório de extração por fonte ---")
+    print(relatorio.to_string(index=False))
+    print(f"Tempo total: {tempo_total:.2f}s (soma das fontes: {relatorio['tempo_s'].sum():.2f}s)")
+    return resultados, relatorio
+
+@instrumentacao.instrumentar('transform')
+def criar_base_de_analise_completa(usar_staging=False, paralelo=True, max_workers=6, timeout_por_fonte=None):
     """
     Orquestra todo o processo de transformação:
     1. Cria a base de municípios de atuação.
     2. Consolida as 5 variáveis para a análise fatorial.
     3. Une as duas bases com prioridade para os municípios de atuação (left merge).
+
+    As extrações das etapas 1 e 2 são independentes e, por padrão, rodam em paralelo.
+
+    Args:
+        usar_staging (bool): Se True, as fontes já gravadas no staging (Parquet) são
+                             relidas do disco em vez de baixadas e processadas de novo.
+        paralelo (bool): Se True, executa as extrações em um pool de threads.
+        max_workers (int): Número máximo de extrações simultâneas.
+        timeout_por_fonte (float, opcional): Limite de tempo, em segundos, por fonte.
     
+    Returns:
+        pd.DataFrame: O DataFrame final, pronto para a análise.
+    """
+    # --- ETAPAS 1 e 2: Extração da base de atuação e das 5 variáveis ---
+    tarefas = {'municipios_atuacao': lambda: criar_base_municipios_atuacao(usar_staging)}
+    for nome, (funcao_extracao, renomear) in FONTES_VARIAVEIS.items():
+        tarefas[nome] = partial(_obter_fonte, nome, funcao_extracao, usar_staging, colunas=list(renomear))
+    resultados, _ = executar_extracoes(tarefas, paralelo, max_workers, timeout_por_fonte)
+    df_municipios_atuacao = resultados.pop('municipios_atuacao')
+    return consolidar_base_de_analise(df_municipios_atuacao, resultados)
+
+@instrumentacao.instrumentar('transform')
+def consolidar_base_de_analise(df_municipios_atuacao, fontes):
+    """
+    Executa as etapas 2 e 3 sobre dados já extraídos: padroniza e une as 5
+    variáveis e depois faz o left merge com a base de municípios de atuação.
+
+    Args:
+        df_municipios_atuacao (pd.DataFrame): Saída de criar_base_municipios_atuacao().
+        fontes (dict): Nome da fonte (chave de FONTES_VARIAVEIS) -> DataFrame extraído,
+                       ou None se a extração falhou.
+
     Returns:
         pd.DataFrame: O DataFrame final, pronto para a análise.
     """
     # --- ETAPA 1: Obter a lista de municípios prioritários ---
-    df_municipios_atuacao = criar_base_municipios_atuacao()
-    if df_municipios_atuacao.empty:
+    if df_municipios_atuacao is None or df_municipios_atuacao.empty:
         return pd.DataFrame() # Retorna DF vazio se a base prioritária falhar
 
     # --- ETAPA 2: Consolidar as 5 variáveis de análise ---
     print("\n--- ETAPA 2: Consolidando as 5 variáveis para análise fatorial ---")
-    
-    # Extração
-    df_saeb = extract.pt_mt_saeb()
-    df_aprovacao = extract.aprov_ideb()
-    df_infra = extract.gerar_indice_infraestrutura_municipal()
-    df_nse = extract.processar_inse()
-    df_formacao = extract.extrair_afd()
-
-    # Padronização de colunas
-    df_saeb.rename(columns={'Codigo_Municipio': 'cod_municipio', 'Nota_Media_SAEB': 'nota_saeb'}, inplace=True)
-    df_aprovacao.rename(columns={'cod_municipio': 'cod_municipio', 'taxa_aprovacao': 'taxa_aprovacao'}, inplace=True)
-    df_infra.rename(columns={'Código do Município': 'cod_municipio', 'IQIE': 'iqie_infraestrutura'}, inplace=True)
-    if df_nse is not None:
-        df_nse.rename(columns={'CO_MUNICIPIO': 'cod_municipio', 'MEDIA_INSE': 'inse_socioeconomico'}, inplace=True)
-    else:
-        print("ERRO: O DataFrame retornado por extract.processar_inse() está vazio ou é None.")
-        return pd.DataFrame()
-    if df_formacao is not None:
-        df_formacao.rename(columns={'cod_municipio': 'cod_municipio', 'media_percentual_formacao_adequada': 'formacao_docente'}, inplace=True)
-    else:
-        print("ERRO: O DataFrame retornado por extract.extrair_afd() está vazio ou é None.")
+
+    # Padronização de colunas (fontes que falharam ficam de fora, sem descartar as demais)
+    dfs_padronizados = []
+    nomes_padronizados = []
+    variaveis_ausentes = []
+    for nome, (funcao_extracao, renomear) in FONTES_VARIAVEIS.items():
+        df_fonte = fontes.get(nome)
+        if df_fonte is None or df_fonte.empty:
+            print(f"ERRO: O DataFrame retornado por extract.{funcao_extracao.__name__}() está vazio ou é None.")
+            variaveis_ausentes.append(list(renomear.values())[-1])
+            continue
+        dfs_padronizados.append(df_fonte[list(renomear)].rename(columns=renomear))
+        nomes_padronizados.append(nome)
+
+    if not dfs_padronizados:
         return pd.DataFrame()
 
     # Consolidação (Merge) das variáveis
-    dfs_padronizados = [
-        df_saeb[['cod_municipio', 'nota_saeb']],
-        df_aprovacao[['cod_municipio', 'taxa_aprovacao']],
-        df_infra[['cod_municipio', 'iqie_infraestrutura']],
-        df_nse[['cod_municipio', 'inse_socioeconomico']],
-        df_formacao[['cod_municipio', 'formacao_docente']]
-    ]
-    
     df_variaveis_analise = dfs_padronizados[0]
-    for df_a_juntar in dfs_padronizados[1:]:
-        df_variaveis_analise = pd.merge(df_variaveis_analise, df_a_juntar, on='cod_municipio', how='inner')
+    for df_a_juntar, nome in zip(dfs_padronizados[1:], nomes_padronizados[1:]):
+        df_variaveis_analise = instrumentacao.mesclar(f'transform.merge_{nome}', df_variaveis_analise, df_a_juntar,
+                                                      on='cod_municipio', how='inner')
+    for variavel in variaveis_ausentes:
+        df_variaveis_analise[variavel] = float('nan')
     
-    print(f"-> Consolidação das 5 variáveis concluída. {len(df_variaveis_analise)} municípios com dados completos.")
+    print(f"-> Consolidação de {len(dfs_padronizados)} de 5 variáveis concluída. "
+          f"{len(df_variaveis_analise)} municípios com dados completos.")
 
     # --- ETAPA 3: UNIÃO FINAL COM PRIORIDADE (LEFT MERGE) ---
     print("\n--- ETAPA 3: Unindo a base de atuação com as variáveis de análise ---")
     
-    df_final_para_analise = pd.merge(
+    df_final_para_analise = instrumentacao.mesclar(
+        'transform.merge_atuacao',
         df_municipios_atuacao,
         df_variaveis_analise,
         on='cod_municipio',
@@ -136,4 +245,6 @@ if __name__ == "__main__":
         print(df_final.head())
         
         print("\nVerificação de valores nulos (NaN) no DataFrame final:")
-        print(df_final.isnull().sum())
\ No newline at end of file
+        print(df_final.isnull().sum())
+
+    cache.imprimir_relatorio_cache()
\ No newline at end of file
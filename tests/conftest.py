@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos de src/ se importam pelo nome (import iqe), como nos scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
@@ -0,0 +1,67 @@
+import json
+
+import pandas as pd
+
+import api
+
+
+def _servidor(tmp_path):
+    df = pd.DataFrame({'cod_municipio': [2504009, 2507507], 'nome_municipio': ['Campina Grande', 'João Pessoa'],
+                       'IQE': [7.2, 6.8], 'taxa_aprovacao': [95.5, 93.1]})
+    modelo = {'variaveis': ['taxa_aprovacao'], 'medias': [94.0], 'desvios': [1.5], 'pesos': [1.0],
+              'cargas': [1.0], 'minimo': -1.0, 'maximo': 1.0}
+    api.publicar_dados_api(df, modelo, diretorio=tmp_path)
+    return api.ServidorAPI(diretorio=tmp_path, intervalo_verificacao=None)
+
+
+def _status(servidor, if_none_match, accept_encoding=''):
+    bruto = servidor._http('GET', '/pesos', {'if-none-match': if_none_match, 'accept-encoding': accept_encoding}, False)
+    return int(bruto.split(b' ', 2)[1])
+
+
+def test_if_none_match_compara_etags_exatos(tmp_path):
+    servidor = _servidor(tmp_path)
+    etag = servidor.resposta('/pesos').etag
+    assert _status(servidor, f'"{etag}"') == 304
+    assert _status(servidor, f'W/"{etag}"') == 304
+    assert _status(servidor, f'"outro", W/"{etag}-gzip"') == 304
+    assert _status(servidor, '*') == 304
+    assert _status(servidor, '') == 200
+    # Trechos ou prefixos do ETag não revalidam
+    assert _status(servidor, etag) == 200
+    assert _status(servidor, f'"{etag[:8]}"') == 200
+    assert _status(servidor, f'"x{etag}"') == 200
+    assert _status(servidor, f'"{etag}x", "lixo"') == 200
+
+
+def test_etag_corresponde():
+    assert api._etag_corresponde(' "a" ,"b"', ('b',))
+    assert not api._etag_corresponde('"ab"', ('a', 'b'))
+    assert not api._etag_corresponde('W/a', ('a',))
+
+
+def test_parametros_ignorados_nao_criam_respostas(tmp_path):
+    servidor = _servidor(tmp_path)
+    for i in range(50):
+        servidor.resposta(f'/municipios?lixo={i}')
+        servidor.resposta(f'/ranking?limite=1&lixo={i}')
+    assert len(servidor.loja.respostas) == 2
+
+
+def test_limite_acima_do_total_retorna_todos(tmp_path):
+    servidor = _servidor(tmp_path)
+    resposta = servidor.resposta('/ranking?limite=10000')
+    assert resposta.status == 200
+    assert len(json.loads(resposta.corpo)['municipios']) == 2
+    assert servidor.resposta('/ranking?limite=0').status == 400
+
+
+def test_respostas_limitadas_em_bytes(tmp_path, monkeypatch):
+    servidor = _servidor(tmp_path)
+    tamanho = servidor.resposta('/ranking?limite=1').tamanho
+    monkeypatch.setattr(api, 'MAXIMO_BYTES_RESPOSTAS', 3 * tamanho)
+    for uf in ['PB', 'pb', 'Pb', 'pB']:
+        servidor.resposta(f'/ranking?limite=1&uf={uf}')
+    assert servidor.loja.bytes_respostas <= 3 * tamanho
+    assert ('/ranking', (('limite', '1'),)) not in servidor.loja.respostas
+    assert ('/ranking', (('uf', 'pB'), ('limite', '1'))) in servidor.loja.respostas
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import arquivos
+import staging
+
+
+def test_grava_e_substitui(tmp_path):
+    destino = tmp_path / 'sub' / 'dados.json'
+    arquivos.gravar_json(destino, {'a': 1})
+    arquivos.gravar_atomico(destino, '{"a": 2}')
+    assert destino.read_text(encoding='utf-8') == '{"a": 2}'
+    assert [p.name for p in destino.parent.iterdir()] == ['dados.json']
+
+
+def test_falha_preserva_o_anterior_e_apaga_o_temporario(tmp_path):
+    destino = tmp_path / 'dados.bin'
+    destino.write_bytes(b'anterior')
+    with pytest.raises(RuntimeError):
+        with arquivos.escrita_atomica(destino) as temporario:
+            temporario.write_bytes(b'pela metade')
+            raise RuntimeError('falha no meio da escrita')
+    assert destino.read_bytes() == b'anterior'
+    assert [p.name for p in tmp_path.iterdir()] == ['dados.bin']
+
+
+def test_sufixo_npz(tmp_path):
+    destino = tmp_path / 'atributos.npz'
+    with arquivos.escrita_atomica(destino, sufixo='.npz') as temporario:
+        np.savez(temporario, x=np.arange(3))
+    with np.load(destino) as dados:
+        assert dados['x'].tolist() == [0, 1, 2]
+    assert [p.name for p in tmp_path.iterdir()] == ['atributos.npz']
+
+
+def test_escritor_staging_descarta_o_temporario_em_erro(tmp_path, monkeypatch):
+    monkeypatch.setattr(staging, 'DIRETORIO_STAGING', tmp_path)
+    monkeypatch.setattr(staging, 'ATIVO', True)
+    bloco = pd.DataFrame({'Código do Município': [2507507], 'Nome do Município': ['João Pessoa'], 'IQIE': [0.5]})
+    with staging.EscritorStaging('infraestrutura') as escritor:
+        escritor.escrever(bloco)
+    assert staging.carregar('infraestrutura')['IQIE'].tolist() == [0.5]
+
+    with pytest.raises(RuntimeError):
+        with staging.EscritorStaging('infraestrutura') as escritor:
+            escritor.escrever(bloco.assign(IQIE=0.9))
+            raise RuntimeError('falha no meio do censo')
+    assert staging.carregar('infraestrutura')['IQIE'].tolist() == [0.5]
+    assert [p.name for p in tmp_path.iterdir()] == ['infraestrutura.parquet']
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import cache
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+import servidor  # noqa: E402
+
+URL = 'https://dados.exemplo.gov.br/arquivos/fonte.bin'
+CONTEUDO = bytes(range(256)) * 4096  # 1 MB
+
+
+@pytest.fixture
+def espelho(tmp_path, monkeypatch):
+    """Servidor local de benchmarks/servidor.py no papel do site de origem, com cache em tmp_path."""
+    arquivo = tmp_path / 'servidor' / 'dados.exemplo.gov.br' / 'arquivos' / 'fonte.bin'
+    arquivo.parent.mkdir(parents=True)
+    arquivo.write_bytes(CONTEUDO)
+    requisicoes = []
+    original = servidor.ManipuladorFixtures.do_GET
+
+    def registrar(manipulador):
+        requisicoes.append({nome: manipulador.headers.get(nome) for nome in ('Range', 'If-Range', 'If-None-Match')})
+        original(manipulador)
+
+    monkeypatch.setattr(servidor.ManipuladorFixtures, 'do_GET', registrar)
+    monkeypatch.setattr(cache, 'DIRETORIO_CACHE', tmp_path / 'cache')
+    monkeypatch.setattr(cache, 'MODO_OFFLINE', False)
+    servidor_local, url_base = servidor.iniciar_servidor(tmp_path / 'servidor')
+    monkeypatch.setattr(cache, 'ESPELHO', url_base)
+    cache.zerar_estatisticas()
+    yield arquivo, requisicoes, servidor_local
+    servidor_local.shutdown()
+
+
+def _etag(arquivo):
+    estado = os.stat(arquivo)
+    return f'"{estado.st_size:x}-{int(estado.st_mtime_ns):x}"'
+
+
+def test_revalidacao_com_etag(espelho):
+    arquivo, requisicoes, _ = espelho
+    primeiro = cache.baixar(URL, 'teste')
+    assert primeiro.read_bytes() == CONTEUDO
+    assert primeiro.name == hashlib.sha256(CONTEUDO).hexdigest()
+
+    assert cache.baixar(URL, 'teste') == primeiro
+    assert requisicoes[-1]['If-None-Match'] == _etag(arquivo)
+    assert cache.estatisticas_cache()['teste'] == {'hits': 1, 'misses': 1, 'revalidados': 1}
+
+    # Arquivo novo no servidor: o ETag muda e o download é refeito
+    arquivo.write_bytes(CONTEUDO[::-1])
+    os.utime(arquivo, ns=(os.stat(arquivo).st_atime_ns, os.stat(arquivo).st_mtime_ns + 10**9))
+    assert cache.baixar(URL, 'teste').read_bytes() == CONTEUDO[::-1]
+
+
+def test_servidor_fora_do_ar_usa_a_copia_local(espelho):
+    _, requisicoes, servidor_local = espelho
+    caminho = cache.baixar(URL, 'teste')
+    servidor_local.shutdown()
+    servidor_local.server_close()
+    assert cache.baixar(URL, 'teste', timeout=2) == caminho
+    assert cache.estatisticas_cache()['teste']['hits'] == 1
+
+    cache.definir_modo_offline(True)
+    assert cache.baixar(URL, 'teste') == caminho
+    with pytest.raises(cache.CacheIndisponivel):
+        cache.baixar(URL.replace('fonte', 'outra'), 'teste')
+    assert len(requisicoes) == 1
+
+
+def _interromper(arquivo, ate, validador):
+    """Deixa no cache o que um download interrompido após 'ate' bytes deixaria."""
+    parcial = cache._caminho_parcial(cache._aplicar_espelho(URL))
+    parcial.parent.mkdir(parents=True, exist_ok=True)
+    parcial.write_bytes(arquivo.read_bytes()[:ate])
+    parcial.with_suffix('.json').write_text(json.dumps({'url': URL, 'validador': validador}))
+    return parcial
+
+
+def test_retoma_download_interrompido(espelho):
+    arquivo, requisicoes, _ = espelho
+    parcial = _interromper(arquivo, 300_000, _etag(arquivo))
+    caminho = cache.baixar(URL, 'teste')
+    assert caminho.read_bytes() == CONTEUDO
+    assert requisicoes == [{'Range': 'bytes=300000-', 'If-Range': _etag(arquivo), 'If-None-Match': None}]
+    assert not parcial.exists()
+
+
+def test_retomada_de_outra_versao_baixa_tudo(espelho):
+    arquivo, requisicoes, _ = espelho
+    _interromper(arquivo, 300_000, '"versao-antiga"')
+    # If-Range não confere: o servidor manda o arquivo inteiro (200) e o trecho antigo é descartado
+    assert cache.baixar(URL, 'teste').read_bytes() == CONTEUDO
+    assert requisicoes[0]['If-Range'] == '"versao-antiga"'
+
+
+def test_intervalo_invalido_416_recomeca(espelho):
+    arquivo, requisicoes, _ = espelho
+    parcial = _interromper(arquivo, len(CONTEUDO), _etag(arquivo))
+    parcial.write_bytes(CONTEUDO + b'sobra')
+    with pytest.raises(cache.DownloadIncompleto):
+        cache.baixar(URL, 'teste')
+    assert not parcial.exists()
+    assert cache.baixar(URL, 'teste').read_bytes() == CONTEUDO
+    assert requisicoes[-1]['Range'] is None
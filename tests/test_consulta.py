@@ -0,0 +1,33 @@
+import json
+
+import pandas as pd
+
+import consulta
+
+
+def _motor():
+    df = pd.DataFrame({
+        'cod_municipio': [2500106, 2504009, 2507507, 2607901],
+        'nome_municipio': ['Água Branca', 'Campina Grande', 'João Pessoa', 'Jaboatão dos Guararapes'],
+        'IQE': [4.5, 7.2, 6.8, 5.1],
+        'taxa_aprovacao': [90.0, 95.5, 93.1, 91.0],
+    })
+    return consulta.MotorConsultas(df)
+
+
+def test_resposta_alterada_nao_contamina_o_cache():
+    motor = _motor()
+    resposta = motor.consultar('top 2 na Paraíba')
+    esperada = json.loads(json.dumps(resposta))
+    resposta['municipios'].clear()
+    resposta['texto'] = 'X'
+    assert motor.consultar('top 2 na Paraíba') == esperada
+    assert motor.info_cache().hits == 1
+
+
+def test_json_do_endpoint_igual_a_consulta():
+    motor = _motor()
+    corpo = motor.consultar_json('posição de Campina Grande')
+    assert isinstance(corpo, bytes)
+    assert json.loads(corpo) == motor.consultar('posição de campina grande')
+    assert json.loads(corpo)['tipo'] == 'posicao'
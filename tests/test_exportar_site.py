@@ -0,0 +1,47 @@
+import json
+
+import pandas as pd
+
+import exportar_site
+import iqe
+
+
+def _iqe(iqe_campina=7.2, saeb_campina=5.0):
+    df = pd.DataFrame({'cod_municipio': [2504009, 2507507, 2600609, 2505105],
+                       'nome_municipio': ['Campina Grande', 'João Pessoa', 'Alagoinha', 'Alagoinha'],
+                       'ds_uf': ['PB', 'PB', 'PE', 'PB'], 'IQE': [iqe_campina, 6.8, 5.0, 4.0]})
+    for variavel in iqe.VARIAVEIS_IQE:
+        df[variavel] = 1.0
+    df.loc[0, 'nota_saeb'] = saeb_campina
+    return df
+
+
+def _detalhes(diretorio):
+    indice = json.loads((diretorio / exportar_site.ARQUIVO_INDICE).read_text(encoding='utf-8'))
+    resumo = json.loads((diretorio / indice['resumo']).read_text(encoding='utf-8'))
+    return resumo, {cod: json.loads((diretorio / relativo).read_text(encoding='utf-8'))
+                    for cod, relativo in zip(resumo['cod'], resumo['detalhe'])}
+
+
+def test_mudanca_de_posicao_so_regrava_o_resumo(tmp_path):
+    exportar_site.exportar_dados_site(_iqe(), textos={}, diretorio=tmp_path)
+    # Campina Grande cai para o último lugar: posições e escala dos demais mudam
+    estatisticas = exportar_site.exportar_dados_site(_iqe(iqe_campina=1.0), textos={}, diretorio=tmp_path)
+    assert estatisticas['gravados'] == 1 and estatisticas['reaproveitados'] == 4
+    resumo, detalhes = _detalhes(tmp_path)
+    assert resumo['cod'][-1] == 2504009 and resumo['posicao'][-1] == 4
+    assert 'posicao' not in detalhes[2504009] and 'iqe' not in detalhes[2504009]
+
+    estatisticas = exportar_site.exportar_dados_site(_iqe(iqe_campina=1.0, saeb_campina=6.0), textos={},
+                                                     diretorio=tmp_path)
+    assert estatisticas['gravados'] == 2
+    assert _detalhes(tmp_path)[1][2504009]['variaveis']['nota_saeb'] == 6.0
+
+
+def test_textos_por_codigo_separam_homonimos(tmp_path):
+    textos = {'2600609': {'contexto': 'Agreste pernambucano'}, '2505105': {'contexto': 'Brejo paraibano'}}
+    exportar_site.exportar_dados_site(_iqe(), textos=textos, diretorio=tmp_path)
+    _, detalhes = _detalhes(tmp_path)
+    assert detalhes[2600609]['contexto'] == 'Agreste pernambucano'
+    assert detalhes[2505105]['contexto'] == 'Brejo paraibano'
+    assert detalhes[2504009]['contexto'] is None
@@ -0,0 +1,75 @@
+import io
+import zipfile
+
+import openpyxl
+import pandas as pd
+
+import extract
+
+
+def _zip_ideb(destino):
+    # Planilha mínima no layout da divulgação: 9 linhas de preâmbulo, cabeçalho e dados
+    colunas = max(extract.COLUNAS_IDEB.values()) + 1
+    cabecalho = [f'COL_{i}' for i in range(colunas)] + ['VL_APROVACAO_2019_SI_4', 'VL_NOTA_MEDIA_2019',
+                                                       'VL_APROVACAO_2021_SI_4', 'VL_NOTA_MEDIA_2021']
+    cabecalho[:3] = ['SG_UF', 'CO_MUNICIPIO', 'NO_MUNICIPIO']
+    livro = openpyxl.Workbook()
+    aba = livro.active
+    for _ in range(9):
+        aba.append(['preâmbulo'])
+    aba.append(cabecalho)
+    for cod, rede, base in [(2500106, 'Estadual', 90), (2500106, 'Municipal', 94), (2500205, 'Municipal', 80)]:
+        linha = [None] * len(cabecalho)
+        linha[:3] = ['PB', cod, f'MUNICIPIO {cod}']
+        linha[extract.COLUNAS_IDEB['taxa_aprovacao']] = base + 5
+        linha[extract.COLUNAS_IDEB['nota_saeb']] = 5.5
+        linha[-4:] = [base, 5.0, '-', 5.2]
+        aba.append(linha)
+    conteudo = io.BytesIO()
+    livro.save(conteudo)
+    with zipfile.ZipFile(destino, 'w') as z:
+        z.writestr(extract.CAMINHO_IDEB_NO_ZIP, conteudo.getvalue())
+    return destino
+
+
+def test_edicoes_historicas_usam_a_leitura_memoizada(tmp_path, monkeypatch):
+    caminho_zip = _zip_ideb(tmp_path / 'ideb.zip')
+    leituras = []
+    ler_excel = pd.read_excel
+    monkeypatch.setattr(extract, '_baixar_ideb', lambda: caminho_zip)
+    monkeypatch.setattr(extract, '_planilhas_ideb', {})
+    monkeypatch.setattr(extract.pd, 'read_excel', lambda *a, **k: leituras.append(1) or ler_excel(*a, **k))
+
+    df_2019 = extract.ler_ideb_edicao(2019).set_index('cod_municipio')
+    df_2021 = extract.ler_ideb_edicao(2021).set_index('cod_municipio')
+    df_2023 = extract.ler_colunas_ideb(['taxa_aprovacao', 'nota_saeb'])
+
+    assert len(leituras) == 1
+    assert df_2019.loc[2500106, 'taxa_aprovacao'] == 92
+    assert df_2019.loc[2500205, 'nota_saeb'] == 5.0
+    assert df_2021['taxa_aprovacao'].isna().all()
+    assert list(df_2023['taxa_aprovacao']) == [95, 99, 85]
+
+
+def test_edicao_ausente_retorna_vazio(tmp_path, monkeypatch):
+    caminho_zip = _zip_ideb(tmp_path / 'ideb.zip')
+    monkeypatch.setattr(extract, '_baixar_ideb', lambda: caminho_zip)
+    monkeypatch.setattr(extract, '_planilhas_ideb', {})
+    assert extract.ler_ideb_edicao(2015).empty
+
+
+def test_cache_do_ia_muda_com_a_versao_do_leitor(tmp_path, monkeypatch):
+    planilha = tmp_path / 'ia.xlsx'
+    planilha.write_bytes(b'mesma planilha')
+    leituras = []
+    monkeypatch.setattr(extract.cache, 'DIRETORIO_CACHE', tmp_path / 'cache')
+    monkeypatch.setattr(extract.staging, 'salvar', lambda *args, **kwargs: None)
+    monkeypatch.setattr(extract, '_ler_abas_ia', lambda caminho: leituras.append(caminho) or [
+        pd.DataFrame({'ds_mun': ['Campina Grande'], 'sg_uf': ['PB'], 'ano_atuacao': [2024]})])
+
+    extract.ler_ia(planilha)
+    extract.ler_ia(planilha)
+    assert len(leituras) == 1
+    monkeypatch.setattr(extract, 'VERSAO_LEITOR_IA', extract.VERSAO_LEITOR_IA + 1)
+    assert extract.ler_ia(planilha)['ds_mun'].tolist() == ['Campina Grande']
+    assert len(leituras) == 2
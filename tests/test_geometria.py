@@ -0,0 +1,65 @@
+import numpy as np
+
+import geometria
+
+
+def _quadrado(x0, y0, lado=1.0, pontos_por_lado=4):
+    cantos = [(x0, y0), (x0 + lado, y0), (x0 + lado, y0 + lado), (x0, y0 + lado), (x0, y0)]
+    anel = []
+    for (xa, ya), (xb, yb) in zip(cantos[:-1], cantos[1:]):
+        for t in np.linspace(0, 1, pontos_por_lado, endpoint=False):
+            anel.append((xa + t * (xb - xa), ya + t * (yb - ya)))
+    anel.append(cantos[0])
+    return {'type': 'Polygon', 'coordinates': [anel]}
+
+
+def _aneis(topologia):
+    """Decodifica os anéis de cada geometria (deltas -> pontos da grade), como o topojson-client."""
+    arcos = [np.cumsum(np.array(arco), axis=0) for arco in topologia['arcs']]
+    aneis = {}
+    for objeto in topologia['objects'][geometria.NOME_OBJETO]['geometries']:
+        anel = []
+        for referencia in objeto['arcs'][0]:
+            pontos = arcos[referencia] if referencia >= 0 else arcos[~referencia][::-1]
+            anel.extend(pontos[1:] if anel else pontos)
+        aneis[objeto['id']] = np.array(anel)
+    return aneis
+
+
+def _vizinhos():
+    # Dois quadrados lado a lado; na grade de 101 pontos, a fronteira comum fica em x = 50
+    return {1: _quadrado(0, 0), 2: _quadrado(1, 0)}
+
+
+def test_fronteira_compartilhada_vira_um_arco():
+    topologia = geometria._Topologia(_vizinhos(), quantizacao=101)
+    referencias = [referencia for anel in topologia.referencias for referencia in anel]
+    usos = np.bincount([r if r >= 0 else ~r for r in referencias], minlength=topologia.n_arcos)
+    # Um arco para a fronteira comum (usado pelos dois anéis, em sentidos opostos) e um para o resto de cada um
+    assert topologia.n_arcos == 3
+    assert sorted(usos.tolist()) == [1, 1, 2]
+    compartilhado = int(np.argmax(usos))
+    assert sorted(r >= 0 for r in referencias if (r if r >= 0 else ~r) == compartilhado) == [False, True]
+
+
+def test_aneis_fechados_e_encaixados_em_qualquer_tolerancia():
+    topologia = geometria._Topologia(_vizinhos(), quantizacao=101)
+    for tolerancia in (0, 0.01, 10):
+        mapa, _ = topologia.topojson(tolerancia, {})
+        aneis = _aneis(mapa)
+        for anel in aneis.values():
+            assert np.array_equal(anel[0], anel[-1])
+            assert len(anel) >= 4
+        # Os pontos da fronteira comum (x = 1) são os mesmos nos dois anéis
+        fronteira = [{tuple(p) for p in anel if p[0] == 50} for anel in aneis.values()]
+        assert fronteira[0] == fronteira[1]
+        assert {(50, 0), (50, 100)} <= fronteira[0]
+
+
+def test_simplificacao_preserva_os_cantos():
+    topologia = geometria._Topologia({1: _quadrado(0, 0, pontos_por_lado=10)}, quantizacao=101)
+    mapa, n_pontos = topologia.topojson(1, {})
+    anel = _aneis(mapa)[1]
+    # Pontos intermediários dos lados retos saem; os quatro cantos ficam
+    assert {tuple(p) for p in anel} == {(0, 0), (100, 0), (100, 100), (0, 100)}
+    assert n_pontos == 5
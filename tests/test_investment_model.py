@@ -0,0 +1,99 @@
+import itertools
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+
+import investment_model
+
+
+def _curvas(n, n_niveis, semente):
+    # Curvas crescentes com trechos convexos e côncavos, como as de um modelo de árvores
+    rng = np.random.default_rng(semente)
+    incrementos = rng.exponential(size=(n, n_niveis)) * (rng.random((n, n_niveis)) < 0.6)
+    ganhos = np.concatenate([np.zeros((n, 1)), np.cumsum(incrementos, axis=1)], axis=1)
+    return ganhos, np.linspace(0, 1000, n_niveis + 1)
+
+
+def _forca_bruta(ganhos, niveis, orcamento):
+    melhor = 0.0
+    for escolha in itertools.product(range(ganhos.shape[1]), repeat=len(ganhos)):
+        if niveis[list(escolha)].sum() <= orcamento + 1e-9:
+            melhor = max(melhor, ganhos[np.arange(len(ganhos)), escolha].sum())
+    return melhor
+
+
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('metodo', [investment_model._alocar_guloso, investment_model._alocar_dp])
+def test_alocacao_respeita_o_orcamento(metodo, semente):
+    ganhos, niveis = _curvas(30, 20, semente)
+    escolhido = metodo(ganhos, niveis, 3_333)
+    assert niveis[escolhido].sum() <= 3_333 + 1e-9
+
+
+@pytest.mark.parametrize('n', [3, 4])
+@pytest.mark.parametrize('semente', range(4))
+def test_dp_igual_a_forca_bruta(n, semente):
+    ganhos, niveis = _curvas(n, 6, semente)
+    for orcamento in (0, 250, 900, 1_700, 4_000):
+        escolhido = investment_model._alocar_dp(ganhos, niveis, orcamento)
+        obtido = ganhos[np.arange(n), escolhido].sum()
+        assert obtido == pytest.approx(_forca_bruta(ganhos, niveis, orcamento))
+
+
+def test_guloso_nao_supera_dp():
+    ganhos, niveis = _curvas(8, 10, 0)
+    guloso = investment_model._alocar_guloso(ganhos, niveis, 2_500)
+    dp = investment_model._alocar_dp(ganhos, niveis, 2_500)
+    linhas = np.arange(len(ganhos))
+    assert ganhos[linhas, guloso].sum() <= ganhos[linhas, dp].sum() + 1e-9
+
+
+def test_envoltoria_concava_fica_acima_da_curva():
+    ganhos, niveis = _curvas(10, 15, 1)
+    trechos = investment_model._envoltoria_concava(ganhos, niveis)
+    por_municipio = {}
+    for i, de, para, inclinacao in trechos:
+        por_municipio.setdefault(i, []).append((de, para, inclinacao))
+    for i, lista in por_municipio.items():
+        inclinacoes = [inclinacao for _, _, inclinacao in lista]
+        assert inclinacoes == sorted(inclinacoes, reverse=True)
+        assert lista[0][0] == 0
+        for (_, fim, _), (inicio, _, _) in zip(lista, lista[1:]):
+            assert fim == inicio
+        for de, para, inclinacao in lista:
+            reta = ganhos[i, de] + inclinacao * (niveis[de:para + 1] - niveis[de])
+            assert (reta >= ganhos[i, de:para + 1] - 1e-9).all()
+
+
+def test_curvas_pelas_arvores_iguais_a_predict():
+    rng = np.random.default_rng(0)
+    features = list(investment_model.COLUNAS_ATRIBUTOS_ATUAIS.values()) + ['valor_investido']
+    X = pd.DataFrame(rng.normal(size=(2_000, len(features))), columns=features)
+    X['valor_investido'] = rng.uniform(0, 500_000, len(X))
+    y = 0.3 * X['iqe_anterior'] + np.sqrt(X['valor_investido']) / 1_000 + rng.normal(scale=0.1, size=len(X))
+    # Nulos nos atributos exercitam o default_left das divisões
+    X.loc[rng.random(len(X)) < 0.1, 'nota_saeb_anterior'] = np.nan
+    model = lgb.LGBMRegressor(n_estimators=40, random_state=0, verbose=-1).fit(X, y)
+
+    atributos = rng.normal(size=(50, len(features)))
+    atributos[::7, features.index('nota_saeb_anterior')] = np.nan
+    niveis = np.linspace(0, 500_000, 41)
+    coluna = features.index('valor_investido')
+    curvas = investment_model._curvas_pelas_arvores(model.booster_, atributos, coluna, niveis)
+
+    em_grade = np.repeat(atributos, len(niveis), axis=0)
+    em_grade[:, coluna] = np.tile(niveis, len(atributos))
+    esperado = model.predict(pd.DataFrame(em_grade, columns=features)).reshape(len(atributos), len(niveis))
+    assert np.abs(curvas - esperado).max() < 1e-9
+
+
+def test_historico_prefere_o_parquet(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    pd.DataFrame({'iqe_anterior': [5.0]}).to_csv(investment_model.ARQUIVO_HISTORICO_CSV, index=False)
+    assert investment_model.caminho_dados_historicos() == investment_model.ARQUIVO_HISTORICO_CSV
+    pd.DataFrame({'iqe_anterior': [6.0, 7.0]}).to_parquet(investment_model.ARQUIVO_HISTORICO_PARQUET)
+    assert investment_model.caminho_dados_historicos() == investment_model.ARQUIVO_HISTORICO_PARQUET
+    assert investment_model.carregar_dados_historicos()['iqe_anterior'].tolist() == [6.0, 7.0]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import iqe
+
+
+def _base(n, semente=0):
+    # Cinco variáveis contínuas correlacionadas por um fator comum
+    rng = np.random.default_rng(semente)
+    fator = rng.normal(size=n)
+    return pd.DataFrame({variavel: fator * 0.8 + rng.normal(scale=0.6, size=n) for variavel in iqe.VARIAVEIS_IQE})
+
+
+@pytest.mark.parametrize('n', [10, 11, 12])
+def test_bootstrap_com_poucos_municipios(n):
+    # Com tão poucos municípios, parte das reamostras tem correlação singular
+    df_pesos, df_municipios = iqe.bootstrap_iqe(_base(n), n_reamostras=1000, paralelo=False)
+    assert np.isfinite(df_pesos[['peso_ic_inferior', 'peso_ic_superior']].to_numpy()).all()
+    assert np.isfinite(df_municipios[['IQE_ic_inferior', 'IQE_ic_superior']].to_numpy()).all()
+    assert (df_pesos['peso_ic_inferior'] <= df_pesos['peso_ic_superior']).all()
+
+
+def test_bootstrap_com_variavel_empatada():
+    df = _base(12)
+    df['formacao_docente'] = (df['formacao_docente'] > 0).astype(float)
+    df_pesos, _ = iqe.bootstrap_iqe(df, n_reamostras=500, paralelo=False)
+    assert np.isfinite(df_pesos['peso_ic_superior']).all()
+
+
+def test_bootstrap_com_variavel_constante():
+    df = _base(12)
+    df['nota_saeb'] = 1.0
+    with pytest.raises(ValueError):
+        iqe.bootstrap_iqe(df, n_reamostras=20, paralelo=False)
+
+
+def test_cargas_um_fator_com_matriz_singular():
+    cargas = iqe.cargas_um_fator(np.ones((2, 5, 5)))
+    assert np.isfinite(cargas).all()
+
+
+def test_degeneradas_sao_sorteadas_de_novo():
+    valores = _base(10).to_numpy()
+    pesos, _, _, sorteadas_de_novo, descartadas = iqe._lote_bootstrap(valores, 200, np.random.SeedSequence(0))
+    assert sorteadas_de_novo > 0
+    assert len(pesos) == 200 - descartadas
+    assert np.allclose(pesos.sum(axis=1), 1)
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import load
+
+
+def _iqe(n=30):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'nome_municipio': [f'Município {i}' for i in range(n)], 'IQE': rng.uniform(3, 8, n)})
+    for variavel in load.VARIAVEIS_GRAFICOS:
+        df[variavel] = rng.normal(size=n)
+    return df
+
+
+def test_segunda_renderizacao_reaproveita(tmp_path):
+    primeira = load.renderizar_graficos(_iqe(), diretorio=tmp_path, paralelo=False)
+    assert {figura['status'] for figura in primeira.values()} == {'gerado'}
+    segunda = load.renderizar_graficos(_iqe(), diretorio=tmp_path, paralelo=False)
+    assert {figura['status'] for figura in segunda.values()} == {'reaproveitado'}
+    assert all(Path(arquivo).exists() for figura in segunda.values() for arquivo in figura['arquivos'])
+
+
+def test_importar_nao_carrega_o_pipeline():
+    src = Path(load.__file__).parent
+    codigo = "import sys, load; assert 'pipeline' not in sys.modules"
+    subprocess.run([sys.executable, '-c', codigo], cwd=src, check=True)
@@ -0,0 +1,140 @@
+import pandas as pd
+import pytest
+
+import iqe
+import pipeline
+from test_iqe import _base
+
+
+@pytest.fixture
+def arquivo_modelo(tmp_path, monkeypatch):
+    caminho = tmp_path / 'modelo_iqe.json'
+    monkeypatch.setattr(iqe, 'ARQUIVO_MODELO_IQE', caminho)
+    return caminho
+
+
+def test_modelo_iqe_reaproveita_o_artefato(arquivo_modelo):
+    base = _base(30)
+    modelo = pipeline._modelo_iqe(base, reajustar=False)
+    assert arquivo_modelo.exists()
+    # Um município novo é só pontuado: o IQE dos demais não muda
+    ampliada = pd.concat([base, _base(1, semente=7)], ignore_index=True)
+    assert pipeline._modelo_iqe(ampliada, reajustar=False) == modelo
+    assert pipeline._modelo_iqe(ampliada, reajustar=True)['n_municipios'] == 31
+
+
+def test_modelo_iqe_reajusta_com_outra_versao(arquivo_modelo, monkeypatch):
+    pipeline._modelo_iqe(_base(30), reajustar=False)
+    monkeypatch.setattr(iqe, 'VERSAO_MODELO_IQE', iqe.VERSAO_MODELO_IQE + 1)
+    modelo = pipeline._modelo_iqe(_base(40), reajustar=False)
+    assert modelo['versao'] == iqe.VERSAO_MODELO_IQE and modelo['n_municipios'] == 40
+
+
+def test_modelo_iqe_exige_dez_municipios(arquivo_modelo):
+    assert pipeline._modelo_iqe(_base(9), reajustar=False) is None
+    assert not arquivo_modelo.exists()
+
+
+@pytest.fixture
+def dag(tmp_path, monkeypatch):
+    """Pipeline de brinquedo em tmp_path: entrada -> dobro -> soma, e um ramo independente."""
+    monkeypatch.setattr(pipeline, 'DIRETORIO_PIPELINE', tmp_path / 'pipeline')
+    monkeypatch.setattr(pipeline, 'ESTAGIOS', {})
+    arquivo = tmp_path / 'entrada.txt'
+    arquivo.write_text('3')
+    chamadas = []
+
+    def entrada():
+        chamadas.append('entrada')
+        return int(arquivo.read_text())
+
+    def dobro(entrada, fator):
+        chamadas.append('dobro')
+        return entrada * fator
+
+    def soma(entrada, dobro):
+        chamadas.append('soma')
+        return entrada + dobro
+
+    def independente():
+        chamadas.append('independente')
+        return 'ok'
+
+    pipeline.registrar_estagio('entrada', entrada, entradas=lambda: [arquivo])
+    pipeline.registrar_estagio('dobro', dobro, dependencias=('entrada',), parametros={'fator': 2})
+    pipeline.registrar_estagio('soma', soma, dependencias=('entrada', 'dobro'))
+    pipeline.registrar_estagio('independente', independente)
+    return arquivo, chamadas
+
+
+def _executar(alvos=('soma', 'independente'), **opcoes):
+    return pipeline.executar(list(alvos), paralelo=False, **opcoes)
+
+
+def test_segunda_execucao_reaproveita(dag):
+    _, chamadas = dag
+    assert _executar() == {'soma': 9, 'independente': 'ok'}
+    chamadas.clear()
+    assert _executar() == {'soma': 9, 'independente': 'ok'}
+    assert chamadas == []
+
+
+def test_parametro_reexecuta_so_os_seguintes(dag):
+    _, chamadas = dag
+    _executar()
+    chamadas.clear()
+    assert _executar(parametros={'dobro': {'fator': 3}})['soma'] == 12
+    assert sorted(chamadas) == ['dobro', 'soma']
+
+
+def test_arquivo_de_entrada_reexecuta_so_os_seguintes(dag):
+    arquivo, chamadas = dag
+    _executar()
+    chamadas.clear()
+    arquivo.write_text('5')
+    assert _executar()['soma'] == 15
+    assert sorted(chamadas) == ['dobro', 'entrada', 'soma']
+
+
+def test_mesma_saida_nao_invalida_os_seguintes(dag):
+    arquivo, chamadas = dag
+    _executar()
+    chamadas.clear()
+    arquivo.write_text('3\n')  # Outro conteúdo, mesmo valor lido
+    _executar()
+    assert chamadas == ['entrada']
+
+
+def test_forcar(dag):
+    _, chamadas = dag
+    _executar()
+    chamadas.clear()
+    _executar(forcar=['dobro'])
+    assert chamadas == ['dobro']
+    chamadas.clear()
+    _executar(forcar=['*'])
+    assert sorted(chamadas) == ['dobro', 'entrada', 'independente', 'soma']
+
+
+def test_falha_ignora_os_dependentes(dag):
+    arquivo, chamadas = dag
+    arquivo.write_text('não é número')
+    assert _executar() == {'soma': None, 'independente': 'ok'}
+    assert 'dobro' not in chamadas and 'soma' not in chamadas
+    # Corrigida a entrada, o que falhou roda de novo
+    arquivo.write_text('3')
+    assert _executar()['soma'] == 9
+
+
+def test_tolerar_falhas_recebe_none(dag):
+    arquivo, _ = dag
+    recebidos = []
+
+    def relatorio(entrada):
+        recebidos.append(entrada)
+        return 'parcial'
+
+    pipeline.registrar_estagio('relatorio', relatorio, dependencias=('entrada',), tolerar_falhas=True)
+    arquivo.write_text('não é número')
+    assert _executar(['relatorio']) == {'relatorio': 'parcial'}
+    assert recebidos == [None]
@@ -0,0 +1,70 @@
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+import pytest
+
+import investment_model
+import preditor
+
+FEATURES = list(investment_model.COLUNAS_ATRIBUTOS_ATUAIS.values()) + ['valor_investido']
+
+
+def _modelo(semente, n_estimators=30):
+    rng = np.random.default_rng(semente)
+    X = pd.DataFrame(rng.normal(size=(1_000, len(FEATURES))), columns=FEATURES)
+    X['valor_investido'] = rng.uniform(0, 500_000, len(X))
+    y = 0.3 * X['iqe_anterior'] + np.sqrt(X['valor_investido']) / 1_000 + rng.normal(scale=0.1, size=len(X))
+    return lgb.LGBMRegressor(n_estimators=n_estimators, random_state=semente, verbose=-1).fit(X, y)
+
+
+@pytest.fixture
+def publicado(tmp_path):
+    """Modelo e atributos de 100 municípios (mais que o limite de 64 do caminho de linha única)."""
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.normal(size=(100, len(investment_model.COLUNAS_ATRIBUTOS_ATUAIS))),
+                      columns=list(investment_model.COLUNAS_ATRIBUTOS_ATUAIS))
+    df.insert(0, 'cod_municipio', np.arange(2500000, 2500100))
+    model = _modelo(0)
+    preditor.publicar_modelo(model, diretorio=tmp_path)
+    preditor.publicar_atributos(df, model.feature_name_, diretorio=tmp_path)
+    return model, df['cod_municipio'].to_numpy()
+
+
+def _esperado(model, diretorio, codigos, investimentos):
+    """model.predict nas mesmas linhas float32 que o Preditor monta."""
+    with np.load(diretorio / preditor.ARQUIVO_ATRIBUTOS) as dados:
+        posicao = {codigo: i for i, codigo in enumerate(dados['codigos'].tolist())}
+        matriz = dados['atributos'][[posicao[codigo] for codigo in codigos]]
+    matriz[:, FEATURES.index('valor_investido')] = investimentos
+    return model.predict(pd.DataFrame(matriz, columns=FEATURES))
+
+
+@pytest.mark.parametrize('api_c', [True, False])
+def test_predicoes_iguais_a_predict(tmp_path, publicado, monkeypatch, api_c):
+    monkeypatch.setattr(preditor, 'API_C_DISPONIVEL', preditor.API_C_DISPONIVEL and api_c)
+    model, codigos = publicado
+    consulta = preditor.Preditor(diretorio=tmp_path, intervalo_verificacao=None)
+    investimentos = np.linspace(0, 500_000, len(codigos), dtype='float32')
+    esperado = _esperado(model, tmp_path, codigos, investimentos)
+
+    unicas = [consulta.prever(int(codigo), float(investimento)) for codigo, investimento in zip(codigos, investimentos)]
+    np.testing.assert_allclose(unicas, esperado, rtol=0, atol=1e-9)
+    # Até 64 pares: linha única; acima disso: uma chamada ao booster
+    np.testing.assert_allclose(consulta.prever_lote(codigos[:40], investimentos[:40]), esperado[:40], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(consulta.prever_lote(codigos, investimentos), esperado, rtol=0, atol=1e-9)
+    with pytest.raises(KeyError):
+        consulta.prever(1, 1.0)
+
+
+def test_recarrega_apos_publicar_modelo(tmp_path, publicado):
+    model, codigos = publicado
+    consulta = preditor.Preditor(diretorio=tmp_path, intervalo_verificacao=0)
+    antes = consulta.prever_lote(codigos[:10], 100_000)
+    assert not consulta.recarregar()
+
+    novo = _modelo(7, n_estimators=60)
+    preditor.publicar_modelo(novo, diretorio=tmp_path)
+    # intervalo_verificacao=0: a próxima consulta já vê o modelo novo
+    depois = consulta.prever_lote(codigos[:10], 100_000)
+    np.testing.assert_allclose(depois, _esperado(novo, tmp_path, codigos[:10], 100_000), rtol=0, atol=1e-9)
+    assert not np.allclose(antes, depois)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import iqe
+import simulacao
+
+
+def _tabela(n=200, semente=0):
+    rng = np.random.default_rng(semente)
+    fator = rng.normal(size=n)
+    df = pd.DataFrame({variavel: fator + rng.normal(scale=0.7, size=n) for variavel in iqe.VARIAVEIS_IQE})
+    df.insert(0, 'cod_municipio', 2500000 + np.arange(n))
+    df.insert(1, 'nome_municipio', [f'Município {i}' for i in range(n)])
+    return df, iqe.ajustar_modelo_iqe(df)
+
+
+def _repontuar(df, modelo, escala_fixa):
+    """Pontuação completa da tabela, para comparar com o simulador."""
+    original = iqe.pontuar_iqe(df, modelo)['IQE_original'].to_numpy()
+    minimo, maximo = (modelo['minimo'], modelo['maximo']) if escala_fixa else (original.min(), original.max())
+    posicao = (original[None, :] > original[:, None]).sum(axis=1) + 1
+    return (original - minimo) / (maximo - minimo) * 9 + 1, posicao
+
+
+@pytest.mark.parametrize('escala_fixa', [False, True])
+def test_simular_igual_a_nova_pontuacao(escala_fixa):
+    df, modelo = _tabela()
+    simulador = simulacao.SimuladorIQE(df, modelo, escala_fixa=escala_fixa)
+    # Inclui o município de maior IQE, que muda a escala quando cai
+    topo = int(np.argmax(iqe.pontuar_iqe(df, modelo)['IQE_original']))
+    alteracoes = {2500000 + topo: {'taxa_aprovacao': -5}, 'Município 3': {'nota_saeb': 4, 'formacao_docente': 1}}
+    resultado = simulador.simular(alteracoes)
+
+    alterado = df.copy()
+    alterado.loc[topo, 'taxa_aprovacao'] -= 5
+    alterado.loc[3, ['nota_saeb', 'formacao_docente']] += [4, 1]
+    esperado_iqe, esperada_posicao = _repontuar(alterado, modelo, escala_fixa)
+    for linha, i in zip(resultado, [topo, 3]):
+        assert linha['IQE'] == pytest.approx(esperado_iqe[i], abs=1e-12)
+        assert linha['posicao'] == esperada_posicao[i]
+
+
+def test_simular_lote_igual_a_nova_pontuacao():
+    df, modelo = _tabela()
+    simulador = simulacao.SimuladorIQE(df, modelo)
+    municipios = [0, 5, 5, 17]
+    variacoes = [3.0, -2.0, 10.0, -8.0]
+    resultado = simulador.simular_lote([2500000 + i for i in municipios], {'inse_socioeconomico': variacoes})
+    for k, (i, variacao) in enumerate(zip(municipios, variacoes)):
+        alterado = df.copy()
+        alterado.loc[i, 'inse_socioeconomico'] += variacao
+        esperado_iqe, esperada_posicao = _repontuar(alterado, modelo, escala_fixa=False)
+        assert resultado.loc[k, 'IQE'] == pytest.approx(esperado_iqe[i], abs=1e-12)
+        assert resultado.loc[k, 'posicao'] == esperada_posicao[i]
+
+
+def test_aplicar_atualiza_a_tabela():
+    df, modelo = _tabela()
+    simulador = simulacao.SimuladorIQE(df, modelo)
+    simulador.aplicar({'Município 10': {'nota_saeb': 2}})
+    alterado = df.copy()
+    alterado.loc[10, 'nota_saeb'] += 2
+    esperado_iqe, _ = _repontuar(alterado, modelo, escala_fixa=False)
+    tabela = simulador.tabela().set_index('cod_municipio')
+    assert np.allclose(tabela.loc[alterado['cod_municipio'], 'IQE'].to_numpy(), esperado_iqe, atol=1e-12)